@@ -44,6 +44,8 @@ def runSetup():
                 'azure==1.0.3'],
             'encryption': [
                 'pynacl==0.3.0'],
+            'lz4': [
+                'lz4==0.10.1'],
             'google': [
                 'gcs_oauth2_boto_plugin==1.9',
                 botoRequirement],
@@ -63,6 +65,7 @@ def runSetup():
             'console_scripts': [
                 'toil = toil.utils.toilMain:main',
                 '_toil_worker = toil.worker:main',
+                '_toil_fork_server = toil.batchSystems.forkServer:main',
                 'cwltoil = toil.cwl.cwltoil:main [cwl]',
                 'cwl-runner = toil.cwl.cwltoil:main [cwl]',
                 '_toil_mesos_executor = toil.batchSystems.mesos.executor:main [mesos]']})
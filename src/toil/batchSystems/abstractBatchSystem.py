@@ -27,6 +27,7 @@ from bd2k.util.objects import abstractclassmethod
 
 from toil.common import Toil, cacheDirName
 from toil.fileStore import shutdownFileStore
+from toil.sharedFileCache import SharedFileCache
 
 logger = logging.getLogger(__name__)
 
@@ -90,6 +91,18 @@ class AbstractBatchSystem(object):
         """
         raise NotImplementedError()
 
+    def setWakeup(self, wakeup):
+        """
+        Set a wakeup to be signalled whenever a job update becomes available from
+        :meth:`getUpdatedBatchJobs`. This allows the leader to wait for updates from the batch
+        system and for other events, e.g. from the service manager, at the same time. Batch
+        systems that don't override this method raise NotImplementedError, in which case the
+        leader blocks in :meth:`getUpdatedBatchJobs` instead.
+
+        :param toil.lib.threading.Wakeup wakeup: the wakeup to signal
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     def issueBatchJob(self, jobNode):
         """
@@ -110,6 +123,25 @@ class AbstractBatchSystem(object):
         """
         raise NotImplementedError()
 
+    def issueBatchJobs(self, jobNodes, priorities=None):
+        """
+        Issues several jobs to the batch system at once and returns their jobIDs.
+
+        Note to implementors: The default implementation calls :meth:`issueBatchJob` for each
+        job, in the given order, and ignores the priorities. Override this method if the batch
+        system can submit many jobs more efficiently, e.g. as a single array job, or if it queues
+        jobs and can start the jobs with the highest priority first.
+
+        :param list[toil.jobGraph.JobNode] jobNodes: the jobs to issue
+
+        :param list[float] priorities: if given, the priority of each job. Jobs with a higher
+               priority should be started before jobs with a lower priority.
+
+        :return: the unique jobIDs of the newly issued jobs, in the order of jobNodes
+        :rtype: list[int]
+        """
+        return [self.issueBatchJob(jobNode) for jobNode in jobNodes]
+
     @abstractmethod
     def killBatchJobs(self, jobIDs):
         """
@@ -161,6 +193,34 @@ class AbstractBatchSystem(object):
         """
         raise NotImplementedError()
 
+    def getUpdatedBatchJobs(self, maxWait, maxCount=None):
+        """
+        Returns all jobs that have updated their status and are immediately available, blocking
+        only for the first one. This allows the leader to process a burst of finished jobs in a
+        single pass rather than one job per call to :meth:`getUpdatedBatchJob`.
+
+        Note to implementors: The default implementation drains :meth:`getUpdatedBatchJob`
+        without waiting after the first result. Override this method if the batch system can
+        obtain multiple updates more efficiently.
+
+        :param float maxWait: the number of seconds to block, waiting for the first result
+
+        :param int maxCount: the maximum number of results to return, or None for no limit
+
+        :rtype: list[tuple(str, int, float)]
+        :return: A list of (jobID, exitValue, wallTime) tuples as described in
+                 :meth:`getUpdatedBatchJob`. The list is empty if no result became available
+                 within maxWait seconds.
+        """
+        updatedJobs = []
+        updatedJob = self.getUpdatedBatchJob(maxWait)
+        while updatedJob is not None:
+            updatedJobs.append(updatedJob)
+            if maxCount is not None and len(updatedJobs) >= maxCount:
+                break
+            updatedJob = self.getUpdatedBatchJob(0)
+        return updatedJobs
+
     @abstractmethod
     def shutdown(self):
         """
@@ -250,6 +310,32 @@ class BatchSystemSupport(AbstractBatchSystem):
         if disk > self.maxDisk:
             raise InsufficientSystemResources('disk', disk, self.maxDisk)
 
+    def _drainUpdatedJobs(self, updatedJobsQueue, maxWait, maxCount, processFn):
+        """
+        Implements :meth:`getUpdatedBatchJobs` for batch systems that put the updates of their
+        jobs on a queue, blocking only for the first item taken from the queue.
+
+        :param Queue updatedJobsQueue: the queue of updates
+        :param float maxWait: see :meth:`getUpdatedBatchJobs`
+        :param int maxCount: see :meth:`getUpdatedBatchJobs`
+        :param processFn: called with each item taken from the queue, returns the
+               (jobID, exitValue, wallTime) tuple to report for it or None to skip the item
+
+        :rtype: list[tuple(str, int, float)]
+        """
+        updatedJobs = []
+        block = True
+        while maxCount is None or len(updatedJobs) < maxCount:
+            try:
+                item = updatedJobsQueue.get(block=block, timeout=maxWait)
+            except Empty:
+                break
+            block = False
+            updatedJob = processFn(item)
+            if updatedJob is not None:
+                updatedJobs.append(updatedJob)
+        return updatedJobs
+
 
     def setEnv(self, name, value=None):
         """
@@ -316,7 +402,8 @@ class BatchSystemSupport(AbstractBatchSystem):
         shutdownFileStore(workflowDir, info.workflowID)
         if (info.cleanWorkDir == 'always'
             or info.cleanWorkDir in ('onSuccess', 'onError')
-            and workflowDirContents in ([], [cacheDirName(info.workflowID)])):
+            and set(workflowDirContents) <= {cacheDirName(info.workflowID),
+                                             SharedFileCache.dirName(info.workflowID)}):
             shutil.rmtree(workflowDir)
 
 class NodeInfo(object):
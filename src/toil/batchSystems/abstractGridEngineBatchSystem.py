@@ -27,6 +27,7 @@ from six.moves.queue import Empty, Queue
 from bd2k.util.objects import abstractclassmethod
 
 from toil.batchSystems.abstractBatchSystem import BatchSystemSupport
+from toil.lib.threading import WakeupQueue
 
 logger = logging.getLogger(__name__)
 
@@ -48,7 +49,7 @@ class AbstractGridEngineBatchSystem(BatchSystemSupport):
             Abstract worker interface class. All instances are created with five
             initial arguments (below). Note the Queue instances passed are empty.
 
-            :param newJobsQueue: a Queue of new (unsubmitted) jobs
+            :param newJobsQueue: a Queue of lists of new (unsubmitted) jobs
             :param updatedJobsQueue: a Queue of jobs that have been updated
             :param killQueue: a Queue of active jobs that need to be killed
             :param killedJobsQueue: Queue of killed jobs for this worker
@@ -82,7 +83,18 @@ class AbstractGridEngineBatchSystem(BatchSystemSupport):
             if task is None:
                 return str(job)
             else:
-                return str(job) + "." + str(task)
+                return self.getArrayTaskID(job, task)
+
+        def getArrayTaskID(self, batchJobID, task):
+            """
+            Get the batch system-specific ID of a task of an array job
+
+            :param: int batchJobID: batch system ID of the array job
+            :param: int task: index of the task in the array job
+
+            :rtype: string
+            """
+            return str(batchJobID) + "." + str(task)
 
         def forgetJob(self, jobID):
             """
@@ -94,44 +106,86 @@ class AbstractGridEngineBatchSystem(BatchSystemSupport):
             del self.allocatedCpus[jobID]
             del self.batchJobIDs[jobID]
 
-        def createJobs(self, newJob):
+        def createJobs(self, newJobs):
             """
-            Create a new job with the Toil job ID. Implementation-specific; called
-            by AbstractGridEngineWorker.run()
+            Create new jobs with the Toil job IDs. Implementation-specific; called
+            by AbstractGridEngineWorker.run(). Jobs with the same resource requirements
+            are submitted as a single array job if the batch system supports it.
 
-            :param string newJob: Toil job ID
+            :param list newJobs: tuples of Toil job ID, cores, memory and command
             """
             activity = False
-            # Load new job id if present:
-            if newJob is not None:
-                self.waitingJobs.append(newJob)
+            # Load new job ids if present:
+            if newJobs is not None:
+                self.waitingJobs.extend(newJobs)
             # Launch jobs as necessary:
             while (len(self.waitingJobs) > 0
                    and sum(self.allocatedCpus.values()) < int(self.boss.maxCores)):
                 activity = True
-                jobID, cpu, memory, command = self.waitingJobs.pop(0)
+                jobs = self.popArrayJobs()
+                if len(jobs) == 1:
+                    jobID, cpu, memory, command = jobs[0]
 
-                # prepare job submission command
-                subLine = self.prepareSubmission(cpu, memory, jobID, command)
-                logger.debug("Running %r", subLine)
+                    # prepare job submission command
+                    subLine = self.prepareSubmission(cpu, memory, jobID, command)
+                    logger.debug("Running %r", subLine)
 
-                # submit job and get batch system ID
-                batchJobID = self.submitJob(subLine)
-                logger.debug("Submitted job %d", batchJobID)
+                    # submit job and get batch system ID
+                    batchJobID = self.submitJob(subLine)
+                    logger.debug("Submitted job %d", batchJobID)
 
-                # Store dict for mapping Toil job ID to batch job ID
-                # TODO: Note that this currently stores a tuple of (batch system
-                # ID, Task), but the second value is None by default and doesn't
-                # seem to be used
-                self.batchJobIDs[jobID] = (batchJobID, None)
+                    # Store dict for mapping Toil job ID to batch job ID
+                    self.batchJobIDs[jobID] = (batchJobID, None)
+                else:
+                    _, cpu, memory, _ = jobs[0]
+                    jobIDs = [jobID for jobID, _, _, _ in jobs]
+                    commands = [command for _, _, _, command in jobs]
+
+                    # prepare array job submission command and the script run by its tasks
+                    subLine, script = self.prepareArraySubmission(cpu, memory, jobIDs, commands)
+                    logger.debug("Running %r for %i jobs", subLine, len(jobs))
+
+                    # submit array job and get batch system ID
+                    batchJobID = self.submitArrayJob(subLine, script)
+                    logger.debug("Submitted array job %d", batchJobID)
 
-                # Add to queue of running jobs
-                self.runningJobs.add(jobID)
+                    # Store dict for mapping Toil job ID to batch job ID and task, tasks
+                    # are numbered from 1
+                    for task, jobID in enumerate(jobIDs, 1):
+                        self.batchJobIDs[jobID] = (batchJobID, task)
 
-                # Add to allocated resources
-                self.allocatedCpus[jobID] = cpu
+                for jobID, cpu, _, _ in jobs:
+                    # Add to queue of running jobs
+                    self.runningJobs.add(jobID)
+
+                    # Add to allocated resources
+                    self.allocatedCpus[jobID] = cpu
             return activity
 
+        def popArrayJobs(self):
+            """
+            Remove the first waiting job from the waiting jobs along with any other waiting jobs
+            with the same resource requirements that can be submitted with it as one array job.
+
+            :rtype: list
+            """
+            jobs = [self.waitingJobs.pop(0)]
+            if not self.supportsArrayJobs():
+                return jobs
+            _, cpu, memory, _ = jobs[0]
+            allocatedCpus = sum(self.allocatedCpus.values()) + cpu
+            remainingJobs = []
+            for job in self.waitingJobs:
+                if (len(jobs) < self.boss.maxArraySize()
+                    and allocatedCpus < int(self.boss.maxCores)
+                    and job[1:3] == (cpu, memory)):
+                    jobs.append(job)
+                    allocatedCpus += cpu
+                else:
+                    remainingJobs.append(job)
+            self.waitingJobs = remainingJobs
+            return jobs
+
         def killJobs(self):
             """
             Kill any running jobs within worker
@@ -198,15 +252,15 @@ class AbstractGridEngineBatchSystem(BatchSystemSupport):
 
             while True:
                 activity = False
-                newJob = None
+                newJobs = None
                 if not self.newJobsQueue.empty():
                     activity = True
-                    newJob = self.newJobsQueue.get()
-                    if newJob is None:
+                    newJobs = self.newJobsQueue.get()
+                    if newJobs is None:
                         logger.debug('Received queue sentinel.')
                         break
                 activity |= self.killJobs()
-                activity |= self.createJobs(newJob)
+                activity |= self.createJobs(newJobs)
                 activity |= self.checkOnJobs()
                 if not activity:
                     logger.debug('No activity, sleeping for %is', self.boss.sleepSeconds())
@@ -239,6 +293,61 @@ class AbstractGridEngineBatchSystem(BatchSystemSupport):
             """
             raise NotImplementedError()
 
+        def supportsArrayJobs(self):
+            """
+            Whether jobs with the same resource requirements can be submitted as a single array
+            job via prepareArraySubmission() and submitArrayJob().
+
+            :rtype: bool
+            """
+            return False
+
+        def prepareArraySubmission(self, cpu, memory, jobIDs, commands):
+            """
+            Preparation in putting together a command-line string for submitting an array
+            job to the batch system (via submitArrayJob()), and the script run by each of
+            its tasks, which runs the command with the same index as the task. Tasks are
+            numbered from 1.
+
+            :param: string cpu
+            :param: string memory
+            :param: list jobIDs: Toil job IDs of the tasks
+            :param: list commands: the command line string of each task
+
+            :rtype: tuple(list, string)
+            """
+            raise NotImplementedError()
+
+        def submitArrayJob(self, subLine, script):
+            """
+            Wrapper routine for submitting an array job, passing the script to the
+            command line on standard input, then processing the output to get the batch
+            system job ID
+
+            :param: list subLine: the literal command line to be called
+            :param: string script: the script run by each task of the array job
+
+            :rtype: string: batch system job ID, which will be stored internally
+            """
+            raise NotImplementedError()
+
+        @staticmethod
+        def arrayJobScript(taskIDVariable, commands, prologue=''):
+            """
+            Returns a shell script running the command with the same index as the array
+            job task it runs in.
+
+            :param: string taskIDVariable: the environment variable holding the task index
+            :param: list commands: the command line string of each task, for tasks 1 to N
+            :param: string prologue: shell commands to run before the command of the task
+            """
+            cases = ''.join('%i) %s ;;\n' % (task, command)
+                            for task, command in enumerate(commands, 1))
+            return ('#!/bin/bash\n%s'
+                    'case $%s in\n%s'
+                    '*) echo "Unknown task $%s" >&2; exit 1 ;;\n'
+                    'esac\n' % (prologue, taskIDVariable, cases, taskIDVariable))
+
         @abstractmethod
         def getRunningJobIDs(self):
             """
@@ -288,7 +397,7 @@ class AbstractGridEngineBatchSystem(BatchSystemSupport):
 
         self.nextJobID = 0
         self.newJobsQueue = Queue()
-        self.updatedJobsQueue = Queue()
+        self.updatedJobsQueue = WakeupQueue()
         self.killQueue = Queue()
         self.killedJobsQueue = Queue()
         # get the associated worker class here
@@ -309,13 +418,24 @@ class AbstractGridEngineBatchSystem(BatchSystemSupport):
         return False
 
     def issueBatchJob(self, jobNode):
-        self.checkResourceRequest(jobNode.memory, jobNode.cores, jobNode.disk)
-        jobID = self.nextJobID
-        self.nextJobID += 1
-        self.currentJobs.add(jobID)
-        self.newJobsQueue.put((jobID, jobNode.cores, jobNode.memory, jobNode.command))
-        logger.debug("Issued the job command: %s with job id: %s ", jobNode.command, str(jobID))
-        return jobID
+        return self.issueBatchJobs([jobNode])[0]
+
+    def issueBatchJobs(self, jobNodes, priorities=None):
+        # The jobs are submitted in the given order, which the leader sorts by priority
+        newJobs = []
+        for jobNode in jobNodes:
+            self.checkResourceRequest(jobNode.memory, jobNode.cores, jobNode.disk)
+            jobID = self.nextJobID
+            self.nextJobID += 1
+            self.currentJobs.add(jobID)
+            newJobs.append((jobID, jobNode.cores, jobNode.memory, jobNode.command))
+            logger.debug("Issued the job command: %s with job id: %s ", jobNode.command, str(jobID))
+        # Hand the jobs to the worker together so it can submit them as array jobs
+        self.newJobsQueue.put(newJobs)
+        return [jobID for jobID, _, _, _ in newJobs]
+
+    def setWakeup(self, wakeup):
+        self.updatedJobsQueue.wakeup = wakeup
 
     def killBatchJobs(self, jobIDs):
         """
@@ -358,6 +478,15 @@ class AbstractGridEngineBatchSystem(BatchSystemSupport):
         self.currentJobs.remove(jobID)
         return jobID, retcode, None
 
+    def getUpdatedBatchJobs(self, maxWait, maxCount=None):
+        def processItem(item):
+            logger.debug('UpdatedJobsQueue Item: %s', item)
+            jobID, retcode = item
+            self.currentJobs.remove(jobID)
+            return jobID, retcode, None
+
+        return self._drainUpdatedJobs(self.updatedJobsQueue, maxWait, maxCount, processItem)
+
     def shutdown(self):
         """
         Signals worker to shutdown (via sentinel) then cleanly joins the thread
@@ -385,6 +514,13 @@ class AbstractGridEngineBatchSystem(BatchSystemSupport):
     def sleepSeconds(cls):
         return 1
 
+    @classmethod
+    def maxArraySize(cls):
+        """
+        Returns the maximum number of jobs submitted as a single array job
+        """
+        return 1000
+
     @abstractclassmethod
     def obtainSystemConstants(cls):
         """
@@ -0,0 +1,316 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A server process that runs Toil workers in processes forked from it. The server imports
+everything a worker needs once, so that the workers it forks skip the interpreter startup and
+imports a worker started by the batch system pays for each job.
+"""
+
+from __future__ import absolute_import
+
+import errno
+import fcntl
+import itertools
+import logging
+import os
+import random
+import select
+import shlex
+import signal
+import struct
+import subprocess
+import sys
+import time
+import traceback
+from threading import Event, Lock, Thread
+
+# Python 3 compatibility imports
+from six.moves import cPickle
+
+from toil import resolveEntryPoint
+
+log = logging.getLogger(__name__)
+
+_headerFormat = '!I'
+_headerSize = struct.calcsize(_headerFormat)
+
+
+def _writeMessage(fd, message):
+    data = cPickle.dumps(message, cPickle.HIGHEST_PROTOCOL)
+    data = struct.pack(_headerFormat, len(data)) + data
+    while data:
+        data = data[os.write(fd, data):]
+
+
+def _readExactly(fd, size):
+    chunks = []
+    while size > 0:
+        chunk = os.read(fd, size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _readMessage(fd):
+    """
+    Returns the next message written to the given file descriptor by :func:`_writeMessage`, or
+    None if the other end was closed.
+    """
+    header = _readExactly(fd, _headerSize)
+    if header is None:
+        return None
+    data = _readExactly(fd, struct.unpack(_headerFormat, header)[0])
+    if data is None:
+        return None
+    return cPickle.loads(data)
+
+
+def _setCloseOnExec(fd):
+    fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.fcntl(fd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+
+
+class ForkedProcess(object):
+    """
+    A worker forked by the fork server, with the parts of the interface of
+    :class:`subprocess.Popen` the single machine batch system uses.
+    """
+    def __init__(self):
+        self.pid = None
+        self.returncode = None
+        self._started = Event()
+        self._exited = Event()
+
+    def wait(self):
+        self._exited.wait()
+        return self.returncode
+
+
+class ForkServer(object):
+    """
+    Starts and talks to the fork server process. The batch system sends the server the arguments,
+    environment and working directory of a worker, the server forks a process that runs the
+    worker and reports its PID, and later its exit status.
+    """
+    entryPoint = '_toil_fork_server'
+
+    def __init__(self):
+        requestRead, self._requestWrite = os.pipe()
+        self._replyRead, replyWrite = os.pipe()
+        # Only the server gets the other ends of the pipes, so that each end sees the other close
+        for fd in (self._requestWrite, self._replyRead):
+            _setCloseOnExec(fd)
+        try:
+            self._server = subprocess.Popen([resolveEntryPoint(self.entryPoint),
+                                             str(requestRead), str(replyWrite)])
+        finally:
+            os.close(requestRead)
+            os.close(replyWrite)
+        self._lock = Lock()
+        self._requestIDs = itertools.count()
+        # Maps the IDs of the requests to the processes that have not exited yet
+        self._processes = {}
+        self._alive = True
+        self._reader = Thread(target=self._readReplies)
+        self._reader.daemon = True
+        self._reader.start()
+
+    @staticmethod
+    def workerArgs(command):
+        """
+        Returns the arguments of the given command if it runs a worker, None otherwise.
+
+        >>> ForkServer.workerArgs('/venv/bin/_toil_worker file:/js a/b/jobX token')
+        ['/venv/bin/_toil_worker', 'file:/js', 'a/b/jobX', 'token']
+        >>> ForkServer.workerArgs('sleep 10') is None
+        True
+        """
+        args = shlex.split(command)
+        if args and os.path.basename(args[0]) == '_toil_worker':
+            return args
+        return None
+
+    def isAlive(self):
+        return self._alive
+
+    def startWorker(self, args, environment, cwd):
+        """
+        Starts a worker in a process forked by the server.
+
+        :param list[str] args: the command line of the worker, see :meth:`workerArgs`
+        :param dict environment: the complete environment of the worker
+        :param str cwd: the working directory of the worker
+        :rtype: ForkedProcess
+        :raises RuntimeError: if the server has quit
+        """
+        process = ForkedProcess()
+        with self._lock:
+            if not self._alive:
+                raise RuntimeError('The fork server has quit')
+            requestID = next(self._requestIDs)
+            self._processes[requestID] = process
+            _writeMessage(self._requestWrite, (requestID, args, environment, cwd))
+        process._started.wait()
+        if process.pid is None:
+            raise RuntimeError('The fork server has quit')
+        return process
+
+    def _readReplies(self):
+        try:
+            while True:
+                reply = _readMessage(self._replyRead)
+                if reply is None:
+                    break
+                kind, requestID, value = reply
+                if kind == 'started':
+                    process = self._processes[requestID]
+                    process.pid = value
+                    process._started.set()
+                else:
+                    assert kind == 'exited'
+                    with self._lock:
+                        process = self._processes.pop(requestID)
+                    process.returncode = value
+                    process._exited.set()
+        finally:
+            with self._lock:
+                self._alive = False
+                processes, self._processes = self._processes, {}
+            if processes:
+                log.error('The fork server quit with %i workers running', len(processes))
+            for process in processes.values():
+                process.returncode = 1
+                process._started.set()
+                process._exited.set()
+
+    def shutdown(self):
+        """
+        Stops the server. Workers that are still running are left alone.
+        """
+        os.close(self._requestWrite)
+        self._server.wait()
+        self._reader.join()
+        os.close(self._replyRead)
+
+
+def _exitStatus(status):
+    # Like the return code of a subprocess.Popen
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _runWorker(args, environment, cwd, fdsToClose):
+    """
+    Runs a worker in a forked process, never returns.
+    """
+    status = 1
+    try:
+        # The worker was imported by the server, its startup begins with the fork
+        import toil.worker
+        toil.worker._importStartTime = time.time()
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        for fd in fdsToClose:
+            os.close(fd)
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(environment)
+        # Don't share the random state of the server with the other workers
+        random.seed()
+        sys.argv = args
+        from toil.worker import main
+        status = main()
+    except SystemExit as e:
+        status = e.code
+    except:
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            if status is None:
+                status = 0
+            elif not isinstance(status, int):
+                sys.stderr.write('%s\n' % status)
+                status = 1
+            os._exit(status)
+
+
+def serve(requestFd, replyFd):
+    """
+    Forks a worker for each request read from the given file descriptor until it is closed,
+    writing the PID and exit status of each worker to the other one.
+    """
+    # Wake up the loop below whenever a worker exits
+    signalRead, signalWrite = os.pipe()
+    for fd in (signalRead, signalWrite):
+        fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+    def onChildExit(signum, frame):
+        try:
+            os.write(signalWrite, b'x')
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+    signal.signal(signal.SIGCHLD, onChildExit)
+
+    # Maps the PIDs of the running workers to the IDs of their requests
+    workers = {}
+    while True:
+        try:
+            readable, _, _ = select.select([requestFd, signalRead], [], [])
+        except select.error as e:
+            if e.args[0] == errno.EINTR:
+                continue
+            raise
+        if signalRead in readable:
+            try:
+                while os.read(signalRead, 1024):
+                    pass
+            except OSError as e:
+                if e.errno != errno.EAGAIN:
+                    raise
+            while workers:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+                if pid == 0:
+                    break
+                _writeMessage(replyFd, ('exited', workers.pop(pid), _exitStatus(status)))
+        if requestFd in readable:
+            request = _readMessage(requestFd)
+            if request is None:
+                break
+            requestID, args, environment, cwd = request
+            pid = os.fork()
+            if pid == 0:
+                _runWorker(args, environment, cwd,
+                           fdsToClose=(requestFd, replyFd, signalRead, signalWrite))
+            workers[pid] = requestID
+            _writeMessage(replyFd, ('started', requestID, pid))
+
+
+def main():
+    requestFd, replyFd = int(sys.argv[1]), int(sys.argv[2])
+    # Do the imports of the worker once, for all the workers
+    import toil.worker
+    from toil.job import Job
+    from toil.callCache import CallCache
+    from toil.jobStores.fileJobStore import FileJobStore
+    try:
+        import boto
+    except ImportError:
+        pass
+    serve(requestFd, replyFd)
@@ -38,17 +38,19 @@ class GridEngineBatchSystem(AbstractGridEngineBatchSystem):
         """
         def getRunningJobIDs(self):
             times = {}
-            currentjobs = dict((str(self.batchJobIDs[x][0]), x) for x in self.runningJobs)
+            currentjobs = dict((self.getBatchSystemID(x), x) for x in self.runningJobs)
             process = subprocess.Popen(["qstat"], stdout=subprocess.PIPE)
             stdout, stderr = process.communicate()
 
             for currline in stdout.split('\n'):
                 items = currline.strip().split()
                 if items:
-                    if items[0] in currentjobs and items[4] == 'r':
+                    # Running array job tasks have their task ID in the last column
+                    jobid = items[0] if len(items) < 10 else items[0] + '.' + items[9]
+                    if jobid in currentjobs and items[4] == 'r':
                         jobstart = " ".join(items[5:7])
                         jobstart = time.mktime(time.strptime(jobstart, "%m/%d/%Y %H:%M:%S"))
-                        times[currentjobs[items[0]]] = time.time() - jobstart
+                        times[currentjobs[jobid]] = time.time() - jobstart
 
             return times
 
@@ -63,6 +65,23 @@ class GridEngineBatchSystem(AbstractGridEngineBatchSystem):
             result = int(process.stdout.readline().strip().split('.')[0])
             return result
 
+        def supportsArrayJobs(self):
+            return True
+
+        def prepareArraySubmission(self, cpu, memory, jobIDs, commands):
+            qsubline = self.prepareQsub(cpu, memory, jobIDs[0])
+            # The tasks run a script read from standard input rather than a binary
+            qsubline[qsubline.index('-b') + 1] = 'n'
+            qsubline.extend(['-t', '1-' + str(len(jobIDs))])
+            return qsubline, self.arrayJobScript('SGE_TASK_ID', commands)
+
+        def submitArrayJob(self, subLine, script):
+            process = subprocess.Popen(subLine, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            stdout, _ = process.communicate(script)
+            # with -terse, qsub prints the array job ID like '2954103.1-10:1'
+            result = int(stdout.strip().split('.')[0])
+            return result
+
         def getJobExitCode(self, sgeJobID):
             # the task is set as part of the job ID if using getBatchSystemID()
             job, task = (sgeJobID, None)
@@ -13,7 +13,8 @@
 # limitations under the License.
 from __future__ import absolute_import
 
-from Queue import Queue
+import heapq
+import itertools
 from collections import namedtuple
 from functools import total_ordering
 from bisect import bisect
@@ -35,31 +36,33 @@ TaskData = namedtuple('TaskData', (
 class JobQueue(object):
 
     def __init__(self):
-        # mapping of jobTypes to queues of jobs of that type
+        # mapping of jobTypes to priority queues of jobs of that type, each a heap of
+        # (-priority, index, job) tuples so that jobs of equal priority are first in, first out
         self.queues = {}
+        self.jobIndex = itertools.count()
         # list of jobTypes in decreasing resource expense
         self.sortedTypes = []
         self.jobLock = Lock()
 
-    def insertJob(self, job, jobType):
+    def insertJob(self, job, jobType, priority=0):
         with self.jobLock:
             if jobType not in self.queues:
                 index = bisect(self.sortedTypes, jobType)
                 self.sortedTypes.insert(index, jobType)
-                self.queues[jobType] = Queue()
-            self.queues[jobType].put(job)
+                self.queues[jobType] = []
+            heapq.heappush(self.queues[jobType], (-priority, next(self.jobIndex), job))
 
     def sorted(self):
         return list(self.sortedTypes)
 
     def jobIDs(self):
         with self.jobLock:
-            return [job.jobID for queue in self.queues.values() for job in list(queue.queue)]
+            return [job.jobID for queue in self.queues.values() for _, _, job in queue]
 
     def nextJobOfType(self, jobType):
         with self.jobLock:
-            job = self.queues[jobType].get(block=False)
-            if self.queues[jobType].empty():
+            _, _, job = heapq.heappop(self.queues[jobType])
+            if not self.queues[jobType]:
                 del self.queues[jobType]
                 self.sortedTypes.remove(jobType)
             return job
@@ -68,7 +71,7 @@ class JobQueue(object):
         # without a lock we could get a false negative from this method
         # if it were called while nextJobOfType was executing
         with self.jobLock:
-            return self.queues.get(jobType, Queue()).empty()
+            return not self.queues.get(jobType)
 
 
 @total_ordering
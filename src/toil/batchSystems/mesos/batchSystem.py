@@ -26,7 +26,7 @@ from struct import unpack
 import itertools
 
 # Python 3 compatibility imports
-from six.moves.queue import Empty, Queue
+from six.moves.queue import Empty
 from six import iteritems, itervalues
 
 import mesos.interface
@@ -39,6 +39,7 @@ from toil.batchSystems.abstractBatchSystem import (AbstractScalableBatchSystem,
                                                    BatchSystemSupport,
                                                    NodeInfo)
 from toil.batchSystems.mesos import ToilJob, ResourceRequirement, TaskData, JobQueue
+from toil.lib.threading import WakeupQueue
 
 log = logging.getLogger(__name__)
 
@@ -107,7 +108,7 @@ class MesosBatchSystem(BatchSystemSupport,
         self.taskResources = {}
 
         # Queue of jobs whose status has been updated, according to Mesos
-        self.updatedJobsQueue = Queue()
+        self.updatedJobsQueue = WakeupQueue()
 
         # The Mesos driver used by this scheduler
         self.driver = None
@@ -142,11 +143,12 @@ class MesosBatchSystem(BatchSystemSupport,
     def setUserScript(self, userScript):
         self.userScript = userScript
 
-    def issueBatchJob(self, jobNode):
+    def issueBatchJob(self, jobNode, priority=0):
         """
         Issues the following command returning a unique jobID. Command is the string to run, memory
         is an int giving the number of bytes the job needs to run in and cores is the number of cpus
         needed for the job and error-file is the path of the file to place any std-err/std-out in.
+        Queued jobs of the same type with a higher priority are launched first.
         """
         self.checkResourceRequest(jobNode.memory, jobNode.cores, jobNode.disk)
         jobID = next(self.unusedJobID)
@@ -162,11 +164,20 @@ class MesosBatchSystem(BatchSystemSupport,
 
         # TODO: round all elements of resources
 
-        self.jobQueues.insertJob(job, jobType)
+        self.jobQueues.insertJob(job, jobType, priority)
         self.taskResources[jobID] = job.resources
         log.debug("... queued")
         return jobID
 
+    def issueBatchJobs(self, jobNodes, priorities=None):
+        if priorities is None:
+            priorities = [0] * len(jobNodes)
+        return [self.issueBatchJob(jobNode, priority)
+                for jobNode, priority in zip(jobNodes, priorities)]
+
+    def setWakeup(self, wakeup):
+        self.updatedJobsQueue.wakeup = wakeup
+
     def killBatchJobs(self, jobIDs):
         # FIXME: probably still racy
         assert self.driver is not None
@@ -218,6 +229,21 @@ class MesosBatchSystem(BatchSystemSupport,
             else:
                 log.debug('Job %s ended naturally before it could be killed.', jobId)
 
+    def getUpdatedBatchJobs(self, maxWait, maxCount=None):
+        def processItem(item):
+            jobId, exitValue, wallTime = item
+            try:
+                self.intendedKill.remove(jobId)
+            except KeyError:
+                log.debug('Job %s ended with status %i, took %s seconds.', jobId, exitValue,
+                          '???' if wallTime is None else str(wallTime))
+                return item
+            else:
+                log.debug('Job %s ended naturally before it could be killed.', jobId)
+                return None
+
+        return self._drainUpdatedJobs(self.updatedJobsQueue, maxWait, maxCount, processItem)
+
     def getWaitDuration(self):
         """
         Gets the period of time to wait (floating point, in seconds) between checking for
@@ -319,7 +345,7 @@ class MesosBatchSystem(BatchSystemSupport,
         return cores, memory, disk, preemptable
 
     def _prepareToRun(self, jobType, offer):
-        # Get the first element to insure FIFO
+        # Get the job with the highest priority, first in, first out among equal priorities
         job = self.jobQueues.nextJobOfType(jobType)
         task = self._newMesosTask(job, offer)
         return task
@@ -31,6 +31,7 @@ from bd2k.util.processes import which
 
 from toil.batchSystems.abstractBatchSystem import BatchSystemSupport
 from toil.lib.bioio import getTempFile
+from toil.lib.threading import WakeupQueue
 
 logger = logging.getLogger(__name__)
 
@@ -75,7 +76,7 @@ class ParasolBatchSystem(BatchSystemSupport):
         self.cpuUsageQueue = Queue()
 
         # Also stores finished job IDs, but is read by getUpdatedJobIDs().
-        self.updatedJobsQueue = Queue()
+        self.updatedJobsQueue = WakeupQueue()
 
         # Use this to stop the worker when shutting down
         self.running = True
@@ -188,6 +189,9 @@ class ParasolBatchSystem(BatchSystemSupport):
     def __environment(self):
         return (k + '=' + (os.environ[k] if v is None else v) for k, v in self.environment.items())
 
+    def setWakeup(self, wakeup):
+        self.updatedJobsQueue.wakeup = wakeup
+
     def killBatchJobs(self, jobIDs):
         """Kills the given jobs, represented as Job ids, then checks they are dead by checking
         they are not in the list of issued jobs.
@@ -274,6 +278,19 @@ class ParasolBatchSystem(BatchSystemSupport):
             else:
                 return jobID, status, wallTime
 
+    def getUpdatedBatchJobs(self, maxWait, maxCount=None):
+        def processItem(item):
+            jobID, status, wallTime = item
+            try:
+                self.runningJobs.remove(jobID)
+            except KeyError:
+                # We tried to kill this job, but it ended by itself instead, so skip it.
+                return None
+            else:
+                return jobID, status, wallTime
+
+        return self._drainUpdatedJobs(self.updatedJobsQueue, maxWait, maxCount, processItem)
+
     @classmethod
     def getRescueBatchJobFrequency(cls):
         """
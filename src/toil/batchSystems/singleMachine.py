@@ -14,6 +14,7 @@
 
 from __future__ import absolute_import
 from contextlib import contextmanager
+import itertools
 import logging
 import multiprocessing
 import os
@@ -24,11 +25,13 @@ from threading import Thread
 from threading import Lock, Condition
 
 # Python 3 compatibility imports
-from six.moves.queue import Empty, Queue
+from six.moves.queue import Empty, PriorityQueue
 from six.moves import xrange
 
 import toil
 from toil.batchSystems.abstractBatchSystem import BatchSystemSupport, InsufficientSystemResources
+from toil.batchSystems.forkServer import ForkServer
+from toil.lib.threading import WakeupQueue
 
 log = logging.getLogger(__name__)
 
@@ -87,10 +90,12 @@ class SingleMachineBatchSystem(BatchSystemSupport):
         """
         :type: dict[str,toil.job.JobNode]
         """
-        # A queue of jobs waiting to be executed. Consumed by the workers.
-        self.inputQueue = Queue()
+        # A priority queue of jobs waiting to be executed, as (-priority, index, args) tuples.
+        # Consumed by the workers.
+        self.inputQueue = PriorityQueue()
+        self.inputIndex = itertools.count()
         # A queue of finished jobs. Produced by the workers.
-        self.outputQueue = Queue()
+        self.outputQueue = WakeupQueue()
         # A dictionary mapping IDs of currently running jobs to their Info objects
         self.runningJobs = {}
         """
@@ -110,6 +115,11 @@ class SingleMachineBatchSystem(BatchSystemSupport):
         self.coreFractions = ResourcePool(self.numWorkers, 'cores', self.acquisitionTimeout)
         # A lock to work around the lack of thread-safety in Python's subprocess module
         self.popenLock = Lock()
+        # The server that forks the workers, if they aren't started as new processes
+        self.forkServer = None
+        if config.singleMachineForkServer:
+            with self.popenLock:
+                self.forkServer = ForkServer()
         # A pool representing available memory in bytes
         self.memory = ResourcePool(self.maxMemory, 'memory', self.acquisitionTimeout)
         # A pool representing the available space in bytes
@@ -128,7 +138,7 @@ class SingleMachineBatchSystem(BatchSystemSupport):
 
     def worker(self, inputQueue):
         while True:
-            args = inputQueue.get()
+            _, _, args = inputQueue.get()
             if args is None:
                 log.debug('Received queue sentinel.')
                 break
@@ -145,10 +155,7 @@ class SingleMachineBatchSystem(BatchSystemSupport):
                         with self.coreFractions.acquisitionOf(coreFractions):
                             with self.disk.acquisitionOf(jobDisk):
                                 startTime = time.time() #Time job is started
-                                with self.popenLock:
-                                    popen = subprocess.Popen(jobCommand,
-                                                             shell=True,
-                                                             env=dict(os.environ, **environment))
+                                popen = self._startJob(jobCommand, environment)
                                 statusCode = None
                                 info = Info(time.time(), popen, killIntended=False)
                                 try:
@@ -184,9 +191,29 @@ class SingleMachineBatchSystem(BatchSystemSupport):
                     break
         log.debug('Exiting worker thread normally.')
 
-    def issueBatchJob(self, jobNode):
+    def _startJob(self, jobCommand, environment):
         """
-        Adds the command and resources to a queue to be run.
+        Starts a process running the given command, forked by the fork server if the command runs
+        a worker and the server is used.
+
+        :rtype: subprocess.Popen|toil.batchSystems.forkServer.ForkedProcess
+        """
+        environment = dict(os.environ, **environment)
+        if self.forkServer is not None and self.forkServer.isAlive():
+            args = ForkServer.workerArgs(jobCommand)
+            if args is not None:
+                try:
+                    return self.forkServer.startWorker(args, environment, os.getcwd())
+                except RuntimeError:
+                    log.warn('Starting the worker as a new process since the fork server has '
+                             'quit.')
+        with self.popenLock:
+            return subprocess.Popen(jobCommand, shell=True, env=environment)
+
+    def issueBatchJob(self, jobNode, priority=0):
+        """
+        Adds the command and resources to a queue to be run. Queued jobs with a higher priority
+        are run first.
         """
         # Round cores to minCores and apply scale
         cores = math.ceil(jobNode.cores * self.scale / self.minCores) * self.minCores
@@ -205,10 +232,20 @@ class SingleMachineBatchSystem(BatchSystemSupport):
             jobID = self.jobIndex
             self.jobIndex += 1
         self.jobs[jobID] = jobNode.command
-        self.inputQueue.put((jobNode.command, jobID, cores, jobNode.memory,
-                             jobNode.disk, self.environment.copy()))
+        self.inputQueue.put((-priority, next(self.inputIndex),
+                             (jobNode.command, jobID, cores, jobNode.memory,
+                              jobNode.disk, self.environment.copy())))
         return jobID
 
+    def issueBatchJobs(self, jobNodes, priorities=None):
+        if priorities is None:
+            priorities = [0] * len(jobNodes)
+        return [self.issueBatchJob(jobNode, priority)
+                for jobNode, priority in zip(jobNodes, priorities)]
+
+    def setWakeup(self, wakeup):
+        self.outputQueue.wakeup = wakeup
+
     def killBatchJobs(self, jobIDs):
         """
         Kills jobs by ID
@@ -240,10 +277,13 @@ class SingleMachineBatchSystem(BatchSystemSupport):
         # Remove reference to inputQueue (raises exception if inputQueue is used after method call)
         inputQueue = self.inputQueue
         self.inputQueue = None
+        # The sentinels sort after all jobs
         for i in xrange(self.numWorkers):
-            inputQueue.put(None)
+            inputQueue.put((float('inf'), next(self.inputIndex), None))
         for thread in self.workerThreads:
             thread.join()
+        if self.forkServer is not None:
+            self.forkServer.shutdown()
         BatchSystemSupport.workerCleanup(self.workerCleanupInfo)
 
     def getUpdatedBatchJob(self, maxWait):
@@ -259,6 +299,18 @@ class SingleMachineBatchSystem(BatchSystemSupport):
         log.debug("Ran jobID: %s with exit value: %i", jobID, exitValue)
         return jobID, exitValue, wallTime
 
+    def getUpdatedBatchJobs(self, maxWait, maxCount=None):
+        """
+        Returns all finished jobs in the output queue, only waiting for the first one.
+        """
+        def processItem(item):
+            jobID, exitValue, wallTime = item
+            self.jobs.pop(jobID)
+            log.debug("Ran jobID: %s with exit value: %i", jobID, exitValue)
+            return item
+
+        return self._drainUpdatedJobs(self.outputQueue, maxWait, maxCount, processItem)
+
     @classmethod
     def getRescueBatchJobFrequency(cls):
         """
@@ -36,8 +36,9 @@ class SlurmBatchSystem(AbstractGridEngineBatchSystem):
         def getRunningJobIDs(self):
             # Should return a dictionary of Job IDs and number of seconds
             times = {}
-            currentjobs = dict((str(self.batchJobIDs[x][0]), x) for x in self.runningJobs)
+            currentjobs = dict((self.getBatchSystemID(x), x) for x in self.runningJobs)
             # currentjobs is a dictionary that maps a slurm job id (string) to our own internal job id
+            # slurm reports array job tasks as jobid_taskid, matching getArrayTaskID
             # squeue arguments:
             # -h for no header
             # --format to get jobid i, state %t and time days-hours:minutes:seconds
@@ -60,6 +61,28 @@ class SlurmBatchSystem(AbstractGridEngineBatchSystem):
         def prepareSubmission(self, cpu, memory, jobID, command):
             return self.prepareSbatch(cpu, memory, jobID) + ['--wrap={}'.format(command)]
 
+        def supportsArrayJobs(self):
+            return True
+
+        def prepareArraySubmission(self, cpu, memory, jobIDs, commands):
+            subLine = self.prepareSbatch(cpu, memory, jobIDs[0]) + ['--array=1-{}'.format(len(jobIDs))]
+            return subLine, self.arrayJobScript('SLURM_ARRAY_TASK_ID', commands)
+
+        def submitArrayJob(self, subLine, script):
+            process = subprocess.Popen(subLine, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT)
+            output, _ = process.communicate(script)
+            if process.returncode != 0:
+                logger.error("sbatch command failed with code %d: %s", process.returncode, output)
+                raise subprocess.CalledProcessError(process.returncode, subLine, output)
+            # sbatch prints a line like 'Submitted batch job 2954103'
+            result = int(output.strip().split()[-1])
+            logger.debug("sbatch submitted array job %d", result)
+            return result
+
+        def getArrayTaskID(self, batchJobID, task):
+            return '{}_{}'.format(batchJobID, task)
+
         def submitJob(self, subLine):
             try:
                 output = subprocess.check_output(subLine, stderr=subprocess.STDOUT)
@@ -75,7 +98,7 @@ class SlurmBatchSystem(AbstractGridEngineBatchSystem):
                 raise e
 
         def getJobExitCode(self, slurmJobID):
-            logger.debug("Getting exit code for slurm job %d", int(slurmJobID))
+            logger.debug("Getting exit code for slurm job %s", slurmJobID)
             
             state, rc = self._getJobDetailsFromSacct(slurmJobID)
             
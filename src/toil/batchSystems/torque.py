@@ -43,8 +43,9 @@ class TorqueBatchSystem(AbstractGridEngineBatchSystem):
         """
         def getRunningJobIDs(self):
             times = {}
-            currentjobs = dict((str(self.batchJobIDs[x][0]), x) for x in self.runningJobs)
-            process = subprocess.Popen(["qstat"], stdout=subprocess.PIPE)
+            currentjobs = dict((self.getBatchSystemID(x), x) for x in self.runningJobs)
+            # -t lists the tasks of array jobs, as jobid[taskid]
+            process = subprocess.Popen(["qstat", "-t"], stdout=subprocess.PIPE)
             stdout, stderr = process.communicate()
 
             # qstat supports XML output which is more comprehensive, but PBSPro does not support it 
@@ -78,6 +79,24 @@ class TorqueBatchSystem(AbstractGridEngineBatchSystem):
             result = int(so.strip().split('.')[0])
             return result
 
+        def supportsArrayJobs(self):
+            return True
+
+        def prepareArraySubmission(self, cpu, memory, jobIDs, commands):
+            qsubline = self.prepareQsub(cpu, memory, jobIDs[0]) + ['-t', '1-' + str(len(jobIDs))]
+            return qsubline, self.arrayJobScript('PBS_ARRAYID', commands,
+                                                 prologue='cd $PBS_O_WORKDIR\n\n')
+
+        def submitArrayJob(self, subLine, script):
+            process = subprocess.Popen(subLine, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            so, se = process.communicate(script)
+            # qsub prints the array job ID like '2954103[].server'
+            result = int(so.strip().split('.')[0].split('[')[0])
+            return result
+
+        def getArrayTaskID(self, batchJobID, task):
+            return '{}[{}]'.format(batchJobID, task)
+
         def getJobExitCode(self, torqueJobID):
             args = ["qstat", "-f", str(torqueJobID)]
 
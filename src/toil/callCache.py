@@ -0,0 +1,241 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import hashlib
+import logging
+import shutil
+from functools import partial
+from io import BytesIO
+
+# Python 3 compatibility imports
+from six import iteritems
+from six.moves import cPickle
+
+from toil.common import Config, Toil
+from toil.fileStore import FileID
+from toil.job import Job, Promise, ServiceJob
+from toil.jobStores.abstractJobStore import JobStoreExistsException, NoSuchFileException
+from toil.resource import ModuleDescriptor
+
+logger = logging.getLogger( __name__ )
+
+
+class UncacheableError(Exception):
+    """
+    Raised if the inputs or the return value of a job can't be stored in the call cache.
+    """
+    def __init__(self, message):
+        super(UncacheableError, self).__init__(message)
+
+
+class _HashingFile(object):
+    """
+    A file-like object that feeds everything written to it into a hash.
+    """
+    def __init__(self, digest):
+        self.digest = digest
+
+    def write(self, data):
+        self.digest.update(data)
+
+
+class CallCache(object):
+    """
+    Memoises the return values of jobs in a job store that is shared between workflows, e.g. one
+    per user, so that a workflow that is run again does not re-run the jobs whose inputs are
+    unchanged.
+
+    A job is identified by a hash of its pickled state, leaving out the attributes that are only
+    set while the workflow runs. Promises are resolved when the job is loaded, so the hash covers
+    the promised values. Files are covered by the hash of their content and modules, like the one
+    defining the job, by their content hash, see :attr:`toil.resource.ModuleDescriptor.contentHash`.
+
+    The return value of a job is stored with copies of the files it references. On a hit, these
+    files are copied into the workflow's job store and the return value is restored instead of
+    running the job. Only jobs that neither add successors nor services and whose return value is
+    not a promise are stored. Any other side effects of a job, e.g. files it exports or messages
+    it logs to the leader, are not repeated on a hit, which is why call caching must be enabled
+    explicitly.
+    """
+    recordFileName = 'callCache.%s'
+
+    # The attributes of jobs that are not part of their identity
+    runtimeAttributes = frozenset(('_config', '_rvs', '_promiseJobStore', '_fileStore',
+                                   '_children', '_followOns', '_services', '_directPredecessors'))
+
+    def __init__(self, jobStore):
+        """
+        :param toil.jobStores.abstractJobStore.AbstractJobStore jobStore: the job store holding
+               the cache
+        """
+        self.jobStore = jobStore
+        self.hits = 0
+        self.misses = 0
+        self._moduleHashes = {}
+
+    @classmethod
+    def createStore(cls, locator):
+        """
+        Creates the job store holding the cache at the given location, unless it exists already.
+        Should only be called on the leader.
+
+        :param str locator:
+        """
+        config = Config()
+        config.jobStore = locator
+        try:
+            Toil.getJobStore(locator).initialize(config)
+        except JobStoreExistsException:
+            pass
+        else:
+            logger.info('Created the call cache at %s', locator)
+
+    @classmethod
+    def open(cls, locator):
+        """
+        Returns the call cache in the job store at the given location, or None if it can't be
+        used, in which case the jobs are run as usual.
+
+        :param str locator:
+        :rtype: CallCache|None
+        """
+        try:
+            return cls(Toil.resumeJobStore(locator))
+        except Exception:
+            logger.warn('Not using the call cache at %s', locator, exc_info=True)
+            return None
+
+    def run(self, job, jobGraph, fileStore):
+        """
+        Returns the return value of the given job, taking it from the cache if the job was run
+        with the same inputs before. Otherwise the job is run and its return value is stored.
+
+        :param toil.job.Job job:
+        :param toil.jobGraph.JobGraph jobGraph: the jobGraph of the job
+        :param toil.fileStore.FileStore fileStore:
+        """
+        if isinstance(job, ServiceJob):
+            return job._run(jobGraph, fileStore)
+        try:
+            key = self.getKey(job, fileStore)
+        except (UncacheableError, cPickle.PicklingError, TypeError) as e:
+            logger.debug('Not caching job %s: %s', job, e)
+            return job._run(jobGraph, fileStore)
+        try:
+            returnValues = self._load(key, fileStore)
+        except NoSuchFileException:
+            logger.debug('Call cache miss for job %s with key %s', job, key)
+        else:
+            logger.debug('Call cache hit for job %s with key %s', job, key)
+            self.hits += 1
+            return returnValues
+        self.misses += 1
+        returnValues = job._run(jobGraph, fileStore)
+        if Job._isLeafVertex(job):
+            try:
+                self._store(key, returnValues, fileStore)
+            except (UncacheableError, cPickle.PicklingError, TypeError) as e:
+                logger.debug('Not caching the return value of job %s: %s', job, e)
+        return returnValues
+
+    def getKey(self, job, fileStore):
+        """
+        Returns the key of the given job in the cache.
+
+        :param toil.job.Job job:
+        :param toil.fileStore.FileStore fileStore: used to read the files the job references
+        :rtype: str
+        """
+        state = sorted((name, value) for name, value in iteritems(job.__getstate__())
+                       if name not in self.runtimeAttributes)
+        digest = hashlib.sha256()
+        pickler = cPickle.Pickler(_HashingFile(digest), cPickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = partial(self._inputID, fileStore)
+        pickler.dump((type(job).__module__, type(job).__name__, state))
+        return digest.hexdigest()
+
+    def _inputID(self, fileStore, obj):
+        if isinstance(obj, FileID):
+            digest = hashlib.sha256()
+            with fileStore.readGlobalFileStream(obj) as fileHandle:
+                for data in iter(partial(fileHandle.read, 1024 * 1024), b''):
+                    digest.update(data)
+            return 'file:' + digest.hexdigest()
+        elif isinstance(obj, ModuleDescriptor):
+            try:
+                contentHash = self._moduleHashes[obj]
+            except KeyError:
+                contentHash = self._moduleHashes[obj] = obj.contentHash
+            return 'module:%s:%s' % (obj.name, contentHash)
+        elif isinstance(obj, Promise):
+            raise UncacheableError('The job references an unresolved promise')
+        else:
+            return None
+
+    def _store(self, key, returnValues, fileStore):
+        """
+        Copies the files referenced by the given return value into the cache, followed by the
+        return value itself.
+        """
+        def outputID(obj):
+            if isinstance(obj, FileID):
+                with fileStore.readGlobalFileStream(obj) as src:
+                    with self.jobStore.writeFileStream() as (dst, cachedFileID):
+                        shutil.copyfileobj(src, dst)
+                return 'file', cachedFileID, obj.size
+            elif isinstance(obj, Promise):
+                raise UncacheableError('The return value is a promise')
+            else:
+                return None
+
+        # Pickle the return value before writing it, so that no record is left if it can't be
+        record = BytesIO()
+        pickler = cPickle.Pickler(record, cPickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = outputID
+        pickler.dump(returnValues)
+        with self.jobStore.writeSharedFileStream(self.recordFileName % key) as fileHandle:
+            fileHandle.write(record.getvalue())
+
+    def _load(self, key, fileStore):
+        """
+        Restores the return value stored under the given key, copying the files it references
+        into the workflow's job store.
+
+        :raises NoSuchFileException: if the key is not in the cache
+        """
+        fileIDs = []
+
+        def outputValue(pid):
+            _, cachedFileID, size = pid
+            with self.jobStore.readFileStream(cachedFileID) as src:
+                with fileStore.writeGlobalFileStream() as (dst, fileID):
+                    fileIDs.append(fileID)
+                    shutil.copyfileobj(src, dst)
+            return FileID(fileID, size)
+
+        try:
+            with self.jobStore.readSharedFileStream(self.recordFileName % key) as fileHandle:
+                unpickler = cPickle.Unpickler(fileHandle)
+                unpickler.persistent_load = outputValue
+                return unpickler.load()
+        except Exception as e:
+            for fileID in fileIDs:
+                fileStore.jobStore.deleteFile(fileID)
+            if isinstance(e, NoSuchFileException):
+                raise
+            # The record was only partially written
+            logger.warn('Ignoring the unreadable call cache entry %s', key, exc_info=True)
+            raise NoSuchFileException(self.recordFileName % key)
@@ -33,6 +33,7 @@ from bd2k.util.humanize import bytes2human
 from toil import logProcessContext
 from toil.lib.bioio import addLoggingOptions, getLogLevelString, setLoggingFromOptions
 from toil.realtimeLogger import RealtimeLogger
+from toil.sharedFileCache import SharedFileCache
 
 logger = logging.getLogger(__name__)
 
@@ -71,6 +72,7 @@ class Config(object):
         self.batchSystem = "singleMachine"
         self.disableHotDeployment = False
         self.scale = 1
+        self.singleMachineForkServer = False
         self.mesosMasterAddress = 'localhost:5050'
         self.parasolCommand = "parasol"
         self.parasolMaxBatches = 10000
@@ -105,11 +107,14 @@ class Config(object):
         self.maxCores = sys.maxint
         self.maxMemory = sys.maxint
         self.maxDisk = sys.maxint
+        self.learnRequirements = False
 
         #Retrying/rescuing jobs
         self.retryCount = 0
         self.maxJobDuration = sys.maxint
         self.rescueJobsFrequency = 3600
+        self.snapshotFrequency = 0
+        self.speculativeExecution = 0
 
         #Misc
         self.disableCaching = False
@@ -120,10 +125,19 @@ class Config(object):
         self.cseKey = None
         self.servicePollingInterval = 60
         self.useAsync = True
+        self.leaderIOThreads = 8
+        self.callCache = None
+        self.workerFanOut = 0
+        self.chainCheckpointInterval = 0.0
+        # None leaves the choice to the job store, see AbstractJobStore.defaultCompression
+        self.serialisationCompression = None
+        self.serialisationCompressionThreshold = 16 * 1024
+        self.disableJobGraphValidation = False
 
         #Debug options
         self.badWorker = 0.0
         self.badWorkerFailInterval = 0.01
+        self.profileWorkerStartup = False
 
     def setOptions(self, options):
         """
@@ -202,6 +216,7 @@ class Config(object):
         setOption("batchSystem")
         setOption("disableHotDeployment")
         setOption("scale", float, fC(0.0))
+        setOption("singleMachineForkServer")
         setOption("mesosMasterAddress")
         setOption("parasolCommand")
         setOption("parasolMaxBatches", int, iC(1))
@@ -241,11 +256,14 @@ class Config(object):
         setOption("maxMemory", h2b, iC(1))
         setOption("maxDisk", h2b, iC(1))
         setOption("defaultPreemptable")
+        setOption("learnRequirements")
 
         #Retrying/rescuing jobs
         setOption("retryCount", int, iC(0))
         setOption("maxJobDuration", int, iC(1))
         setOption("rescueJobsFrequency", int, iC(1))
+        setOption("snapshotFrequency", int, iC(0))
+        setOption("speculativeExecution", float, fC(0.0))
 
         #Misc
         setOption("disableCaching")
@@ -259,10 +277,18 @@ class Config(object):
         setOption("sseKey", checkFn=checkSse)
         setOption("cseKey", checkFn=checkSse)
         setOption("servicePollingInterval", float, fC(0.0))
+        setOption("leaderIOThreads", int, iC(1))
+        setOption("callCache", parseJobStore)
+        setOption("workerFanOut", int, iC(0))
+        setOption("chainCheckpointInterval", float, fC(0.0))
+        setOption("serialisationCompression")
+        setOption("serialisationCompressionThreshold", h2b, iC(0))
+        setOption("disableJobGraphValidation")
 
         #Debug options
         setOption("badWorker", float, fC(0.0, 1.0))
         setOption("badWorkerFailInterval", float, fC(0.0))
+        setOption("profileWorkerStartup")
 
     def __eq__(self, other):
         return self.__dict__ == other.__dict__
@@ -347,6 +373,12 @@ def _addOptions(addGroupFn, config):
     addOptionFn("--scale", dest="scale", default=None,
                 help=("A scaling factor to change the value of all submitted tasks's submitted cores. "
                       "Used in singleMachine batch system. default=%s" % config.scale))
+    addOptionFn("--singleMachineForkServer", dest="singleMachineForkServer", action='store_true',
+                default=None,
+                help=("Start the workers of the singleMachine batch system by forking them from a "
+                      "long-lived process that has loaded Toil already, instead of starting each "
+                      "as a new process, to cut the overhead of short jobs. "
+                      "default=%s" % config.singleMachineForkServer))
     addOptionFn("--mesosMaster", dest="mesosMasterAddress", default=None,
                 help=("The host and port of the Mesos master separated by colon. default=%s" % config.mesosMasterAddress))
     addOptionFn("--parasolCommand", dest="parasolCommand", default=None,
@@ -477,6 +509,12 @@ def _addOptions(addGroupFn, config):
                 help='The maximum amount of disk space to request from the batch system at any '
                      'one time. Standard suffixes like K, Ki, M, Mi, G or Gi are supported. '
                      'Default is %s' % bytes2human(config.maxDisk, symbols='iec'))
+    addOptionFn('--learnRequirements', dest='learnRequirements', action='store_true',
+                default=None,
+                help='Learn the memory, cores and disk the jobs of each name actually use and '
+                     'issue jobs with requirements of a high percentile of that usage, if it is '
+                     'lower than what the jobs request. A job that fails is issued with the '
+                     'requirements it requested from then on. Default is False')
 
     #
     #Retrying/rescuing jobs
@@ -494,6 +532,19 @@ def _addOptions(addGroupFn, config):
     addOptionFn("--rescueJobsFrequency", dest="rescueJobsFrequency", default=None,
                       help=("Period of time to wait (in seconds) between checking for "
                             "missing/overlong jobs, that is jobs which get lost by the batch system. Expert parameter. default=%s" % config.rescueJobsFrequency))
+    addOptionFn("--snapshotFrequency", dest="snapshotFrequency", default=None,
+                      help=("Period of time (in seconds) between snapshots of the state of the "
+                            "leader, from which a restarted workflow only has to re-read the jobs "
+                            "issued since. 0 disables the snapshots. default=%s" %
+                            config.snapshotFrequency))
+    addOptionFn("--speculativeExecution", dest="speculativeExecution", default=None,
+                      metavar='MULTIPLE',
+                      help=("Issue a second attempt of a job once it has run for longer than this "
+                            "multiple of the median wall time of the finished jobs of the same "
+                            "name. The first attempt to finish wins and the other is killed. "
+                            "Requires a job store that supports commit claims, e.g. the file job "
+                            "store. 0 disables speculative execution. default=%s" %
+                            config.speculativeExecution))
 
     #
     #Misc options
@@ -539,6 +590,52 @@ def _addOptions(addGroupFn, config):
     addOptionFn("--servicePollingInterval", dest="servicePollingInterval", default=None,
                 help="Interval of time service jobs wait between polling for the existence"
                 " of the keep-alive flag (defailt=%s)" % config.servicePollingInterval)
+    addOptionFn("--leaderIOThreads", dest="leaderIOThreads", default=None,
+                help="The number of threads the leader uses to load the state of finished jobs "
+                     "from the job store while it keeps scheduling other jobs (default=%s)" %
+                     config.leaderIOThreads)
+    addOptionFn("--callCache", dest="callCache", default=None, metavar='JOBSTORE',
+                help="The location of a job store, e.g. one per user, in which the return values "
+                     "of jobs are cached. A job whose state, promised inputs, input files and "
+                     "module are unchanged is not run again, its return value and the files it "
+                     "references are taken from the cache instead. Side effects of cached jobs, "
+                     "other than the files they return, are not repeated. Jobs that add successor "
+                     "or service jobs are not cached. The job store is created if it doesn't "
+                     "exist. " + jobStoreLocatorHelp)
+    addOptionFn("--workerFanOut", dest="workerFanOut", default=None, metavar='N',
+                help="The maximum number of children of a job that the job's worker runs "
+                     "concurrently itself, on the same node, instead of returning them to the "
+                     "leader. Children are only run this way if they fit into the cores, memory "
+                     "and disk of the job, as many at a time as together fit. 0 disables running "
+                     "children in the worker (default=%s)" % config.workerFanOut)
+    addOptionFn("--chainCheckpointInterval", dest="chainCheckpointInterval", default=None,
+                metavar='SECONDS',
+                help="The number of seconds a worker may run jobs in a chain before it records "
+                     "the progress of the chain in the job store. Jobs that finish within this "
+                     "time of the last record are only recorded together with the jobs chained "
+                     "after them, saving job store updates, but are run again if a job chained after them fails "
+                     "or the worker dies. "
+                     "With 0 every job is recorded when it finishes (default=%s)" %
+                     config.chainCheckpointInterval)
+    addOptionFn("--serialisationCompression", dest="serialisationCompression", default=None,
+                choices=['none', 'zlib', 'lz4'],
+                help="The method used to compress the pickled jobs, job graphs and promised "
+                     "values the workflow stores in the job store, if their size is at least "
+                     "--serialisationCompressionThreshold. The lz4 method is faster but requires "
+                     "the lz4 extra. By default jobs are compressed with zlib in the job stores "
+                     "on AWS, Azure and Google, whose items are limited in size and billed by "
+                     "the byte, and are not compressed in the file job store.")
+    addOptionFn("--serialisationCompressionThreshold", dest="serialisationCompressionThreshold",
+                default=None, metavar='BYTES',
+                help="The minimum size of a pickled job, job graph or promised value for it to "
+                     "be compressed, see --serialisationCompression (default=%s)" %
+                     bytes2human(config.serialisationCompressionThreshold, symbols="iec"))
+    addOptionFn("--disableJobGraphValidation", dest="disableJobGraphValidation",
+                action='store_true', default=None,
+                help="Don't check the graphs of new jobs for cycles, multiple roots and checkpoint "
+                     "jobs that aren't leaves before storing them. Only use this for workflows "
+                     "known to build valid graphs, e.g. generated ones, as an invalid graph may "
+                     "deadlock the workflow (default=%s)" % config.disableJobGraphValidation)
     #
     #Debug options
     #
@@ -548,6 +645,12 @@ def _addOptions(addGroupFn, config):
     addOptionFn("--badWorkerFailInterval", dest="badWorkerFailInterval", default=None,
                       help=("When killing the job pick uniformly within the interval from 0.0 to "
                             "'badWorkerFailInterval' seconds after the worker starts, default=%s" % config.badWorkerFailInterval))
+    addOptionFn("--profileWorkerStartup", dest="profileWorkerStartup", action='store_true',
+                default=None,
+                help="Have every worker report how long each phase of its startup took, from "
+                     "importing modules to setting up the file store for its first job, in the "
+                     "stats of the workflow. With --stats, the means are reported by 'toil stats --raw'. "
+                     "default=%s" % config.profileWorkerStartup)
 
 def addOptions(parser, config=Config()):
     """
@@ -619,6 +722,9 @@ class Toil(object):
             config.setOptions(self.options)
             config.workflowAttemptNumber += 1
             jobStore.writeConfig()
+        if config.callCache is not None:
+            from toil.callCache import CallCache
+            CallCache.createStore(config.callCache)
         self.config = config
         self._jobStore = jobStore
         self._inContextManager = True
@@ -663,6 +769,7 @@ class Toil(object):
         try:
             self._setBatchSystemEnvVars()
             self._serialiseEnv()
+            self._registerSharedFileCache()
             self._cacheAllJobs()
 
             # Pickle the promised return value of the root job, then write the pickled promise to
@@ -700,9 +807,11 @@ class Toil(object):
         try:
             self._setBatchSystemEnvVars()
             self._serialiseEnv()
-            self._cacheAllJobs()
+            self._registerSharedFileCache()
+            partialJobCache = self._cacheJobsForRestart()
             self._setProvisioner()
-            rootJobGraph = self._jobStore.clean(jobCache=self._jobCache)
+            rootJobGraph = self._jobStore.clean(jobCache=self._jobCache,
+                                                partialJobCache=partialJobCache)
             return self._runMainLoop(rootJobGraph)
         finally:
             self._shutdownBatchSystem()
@@ -927,6 +1036,18 @@ class Toil(object):
             cPickle.dump(os.environ, fileHandle, cPickle.HIGHEST_PROTOCOL)
         logger.info("Written the environment for the jobs to the environment file")
 
+    def _registerSharedFileCache(self):
+        """
+        Lets the workers cache the configuration and the environment on their nodes. Both must
+        have been written to the job store.
+        """
+        try:
+            SharedFileCache.create(self._jobStore).register(self._batchSystem)
+        except ValueError:
+            logger.warn('The batch system can not pass the shared file cache to the workers, '
+                        'they will read the configuration and the environment from the job '
+                        'store.', exc_info=True)
+
     def _cacheAllJobs(self):
         """
         Downloads all jobs in the current job store into self.jobCache.
@@ -935,6 +1056,24 @@ class Toil(object):
         self._jobCache = {jobGraph.jobStoreID: jobGraph for jobGraph in self._jobStore.jobs()}
         logger.info('{} jobs downloaded.'.format(len(self._jobCache)))
 
+    def _cacheJobsForRestart(self):
+        """
+        Downloads the jobs in the current job store into self.jobCache. If the leader left a
+        snapshot of its state, the jobs in the snapshot are taken from it instead and only the
+        jobs issued since are downloaded. Any other jobs are loaded as the restart needs them.
+
+        :return: True if the cache may lack some of the jobs in the job store
+        :rtype: bool
+        """
+        from toil.leaderSnapshot import LeaderSnapshot
+        jobCache = LeaderSnapshot.loadJobs(self._jobStore, loadThreads=self.config.leaderIOThreads)
+        if jobCache is None:
+            self._cacheAllJobs()
+            return False
+        else:
+            self._jobCache = jobCache
+            return True
+
     def _cacheJob(self, job):
         """
         Adds given job to current job cache.
@@ -0,0 +1,158 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import logging
+import time
+from collections import defaultdict
+
+logger = logging.getLogger( __name__ )
+
+
+class CriticalPathEstimator(object):
+    """
+    Estimates the remaining critical path length of jobs, i.e. the time it will take at least to
+    run a job and all the jobs that will follow it, so that the leader can issue the jobs that lie
+    on long paths through the workflow first.
+
+    Jobs are grouped into classes by their name. The estimator learns the average runtime of each
+    class from the jobs that finish, and which classes of jobs succeed which from the successors
+    of the jobs the leader processes. The remaining path length of a class is its runtime plus the
+    longest remaining path length of its successor classes. Cycles in the graph of classes, e.g.
+    from recursive jobs, are broken by ignoring the edges that close them.
+
+    >>> estimator = CriticalPathEstimator()
+    >>> estimator.addSuccessors('chain', ['chain2', 'leaf'])
+    >>> estimator.addSuccessors('chain2', ['leaf', 'chain'])
+    >>> estimator.addRuntime('chain', 10)
+    >>> estimator.addRuntime('chain2', 20)
+    >>> estimator.addRuntime('leaf', 1)
+    >>> estimator.getRemainingPathLength('chain')
+    31.0
+    >>> estimator.getRemainingPathLength('leaf')
+    1.0
+    >>> estimator.getRemainingPathLength('unknown') == estimator.defaultRuntime()
+    True
+    """
+
+    def __init__(self):
+        # Maps job class to the total runtime and the number of finished jobs of that class
+        self._totalRuntimes = defaultdict(float)
+        self._jobCounts = defaultdict(int)
+
+        # Maps job class to the set of classes of its successor jobs
+        self._successors = defaultdict(set)
+
+        # Maps the jobStoreID of issued jobs to the time they were issued, used to estimate the
+        # runtime of jobs if the batch system does not report wall time
+        self._issueTimes = {}
+
+        # Cache of remaining path lengths by job class, invalidated whenever the estimator learns
+        self._pathLengths = {}
+
+    def jobIssued(self, jobNode):
+        """
+        Record that the given job was issued to the batch system.
+
+        :param toil.job.JobNode jobNode:
+        """
+        self._issueTimes[jobNode.jobStoreID] = time.time()
+
+    def jobFinished(self, jobNode, wallTime=None):
+        """
+        Record that the given job finished, learning the runtime of its class.
+
+        :param toil.job.JobNode jobNode:
+        :param float wallTime: the wall time the job ran for, as reported by the batch system, or
+               None to use the time since the job was issued instead
+        """
+        issueTime = self._issueTimes.pop(jobNode.jobStoreID, None)
+        if wallTime is None:
+            if issueTime is None:
+                return
+            wallTime = time.time() - issueTime
+        self.addRuntime(jobNode.jobName, wallTime)
+
+    def addRuntime(self, jobClass, runtime):
+        """
+        :param str jobClass: the class, i.e. the name, of a finished job
+        :param float runtime: the number of seconds the job ran for
+        """
+        self._totalRuntimes[jobClass] += runtime
+        self._jobCounts[jobClass] += 1
+        self._pathLengths = {}
+
+    def addSuccessors(self, jobClass, successorClasses):
+        """
+        :param str jobClass: the class, i.e. the name, of a job
+        :param successorClasses: the classes of the job's successors
+        """
+        successors = self._successors[jobClass]
+        for successorClass in successorClasses:
+            if successorClass not in successors:
+                successors.add(successorClass)
+                self._pathLengths = {}
+
+    def defaultRuntime(self):
+        """
+        :return: the runtime assumed for classes of jobs that have not finished yet, i.e. the
+                 longest average runtime of any class, or 1 if no job has finished yet. Being
+                 pessimistic about unknown classes issues them early, which avoids starving
+                 long paths that have not been observed yet.
+        :rtype: float
+        """
+        return max([self._totalRuntimes[jobClass] / jobCount
+                    for jobClass, jobCount in self._jobCounts.items()] or [1.0])
+
+    def getRuntime(self, jobClass):
+        """
+        :return: the estimated runtime of a job of the given class
+        :rtype: float
+        """
+        jobCount = self._jobCounts.get(jobClass, 0)
+        return self._totalRuntimes[jobClass] / jobCount if jobCount else self.defaultRuntime()
+
+    def getRemainingPathLength(self, jobClass):
+        """
+        :return: the estimated remaining critical path length of a job of the given class
+        :rtype: float
+        """
+        try:
+            return self._pathLengths[jobClass]
+        except KeyError:
+            pass
+        # Depth first search over the graph of classes without recursion, computing the path
+        # length of a class once those of all of its successors are known
+        defaultRuntime = self.defaultRuntime()
+        onPath = {jobClass}
+        stack = [(jobClass, iter(self._successors.get(jobClass, ())))]
+        while stack:
+            currentClass, successors = stack[-1]
+            for successorClass in successors:
+                if successorClass not in self._pathLengths and successorClass not in onPath:
+                    onPath.add(successorClass)
+                    stack.append((successorClass, iter(self._successors.get(successorClass, ()))))
+                    break
+            else:
+                stack.pop()
+                onPath.remove(currentClass)
+                jobCount = self._jobCounts.get(currentClass, 0)
+                runtime = (self._totalRuntimes[currentClass] / jobCount if jobCount
+                           else defaultRuntime)
+                self._pathLengths[currentClass] = runtime + max(
+                    [self._pathLengths[successorClass]
+                     for successorClass in self._successors.get(currentClass, ())
+                     if successorClass in self._pathLengths] or [0.0])
+        return self._pathLengths[jobClass]
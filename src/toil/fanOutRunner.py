@@ -0,0 +1,157 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import ctypes
+import logging
+import os
+import signal
+import subprocess
+from threading import Thread
+
+# Python 3 compatibility imports
+from six.moves.queue import Queue
+
+from toil import resolveEntryPoint
+
+logger = logging.getLogger( __name__ )
+
+
+def _dieWithParent():
+    # Have Linux kill the child if its worker dies, lest the leader issue the child while it is
+    # still running
+    try:
+        libc = ctypes.CDLL('libc.so.6')
+    except OSError:
+        return
+    PR_SET_PDEATHSIG = 1
+    libc.prctl(PR_SET_PDEATHSIG, signal.SIGKILL)
+
+
+class FanOutRunner(object):
+    """
+    Runs the children of a job in worker processes started by the job's own worker, instead of
+    handing them to the leader, so that fine-grained fan-outs cost neither the leader nor the
+    batch system anything.
+
+    Children are run concurrently, as many at a time as fit into the requirements of the job
+    that was issued to the worker. Each child is run by a worker of its own, on the same node,
+    which chains the child's successors and commits its state as if the leader had issued it.
+    Children that are finished afterwards are removed from the job and the job is updated once
+    for all of them. The others, children that failed, have successors of their own or are
+    checkpoints, are left for the leader to issue.
+    """
+    # Set in the environment of the workers started for the children of a job
+    environmentVariable = 'TOIL_FAN_OUT_CHILD'
+
+    def __init__(self, jobStore, jobStoreLocator, maxChildren):
+        """
+        :param toil.jobStores.abstractJobStore.AbstractJobStore jobStore:
+        :param str jobStoreLocator: the locator of the job store, passed to the workers
+        :param int maxChildren: the maximum number of children run at a time
+        """
+        self.jobStore = jobStore
+        self.jobStoreLocator = jobStoreLocator
+        self.maxChildren = maxChildren
+
+    @classmethod
+    def isChild(cls):
+        """
+        Returns True if the current worker was started by a fan-out runner, in which case it must
+        leave checkpoint jobs to the leader. Only the first call in a worker can return True, so
+        that the worker's own children don't inherit the flag.
+        """
+        return os.environ.pop(cls.environmentVariable, None) is not None
+
+    def canRun(self, jobGraph, resources):
+        """
+        Returns True if the children at the top of the stack of the given job can be run by the
+        job's worker.
+
+        :param toil.jobGraph.JobGraph jobGraph: a job whose worker has just run it
+        :param dict resources: the memory, cores and disk the worker was issued with
+        """
+        for jobNode in jobGraph.stack[-1]:
+            if jobNode.predecessorNumber > 1:
+                logger.debug("The child %s has multiple predecessors, it must be issued by the "
+                             "leader.", jobNode)
+                return False
+            if jobNode.preemptable != jobGraph.preemptable:
+                logger.debug("Preemptability is different for the child %s, returning to the "
+                             "leader", jobNode)
+                return False
+            if (jobNode.memory > resources['memory'] or jobNode.cores > resources['cores']
+                    or jobNode.disk > resources['disk']):
+                logger.debug("The child %s needs more resources than this worker has, returning "
+                             "to the leader.", jobNode)
+                return False
+        return True
+
+    def run(self, jobGraph, resources):
+        """
+        Runs the children at the top of the stack of the given job and updates the job in the job
+        store. All files the job wrote must have been written to the job store.
+
+        :param toil.jobGraph.JobGraph jobGraph: a job whose worker has just run it
+        :param dict resources: the memory, cores and disk the worker was issued with, which the
+               children running at a time must fit in
+        :return: True if all children finished, in which case they are removed from the stack
+        :rtype: bool
+        """
+        children = list(jobGraph.stack[-1])
+        logger.debug("Running the %i children of %s in this worker", len(children), jobGraph)
+        environment = dict(os.environ)
+        environment[self.environmentVariable] = '1'
+        command = [resolveEntryPoint('_toil_worker'), self.jobStoreLocator]
+        finished = Queue()
+
+        def wait(jobNode, popen):
+            finished.put((jobNode, popen.wait()))
+
+        running = set()
+
+        def fits(jobNode):
+            return all(sum(getattr(child, resource) for child in running)
+                       + getattr(jobNode, resource) <= resources[resource]
+                       for resource in ('memory', 'cores', 'disk'))
+
+        while children or running:
+            # Children are started in order, as soon as they fit
+            while children and len(running) < self.maxChildren and fits(children[0]):
+                jobNode = children.pop(0)
+                popen = subprocess.Popen(command + [jobNode.jobStoreID], env=environment,
+                                         preexec_fn=_dieWithParent)
+                running.add(jobNode)
+                thread = Thread(target=wait, args=(jobNode, popen))
+                thread.daemon = True
+                thread.start()
+            jobNode, exitStatus = finished.get()
+            if exitStatus != 0:
+                logger.warn("The worker for the child %s exited with status %i", jobNode,
+                            exitStatus)
+            running.remove(jobNode)
+
+        # A child worker deletes its job once the job and all its successors are done
+        remaining = [jobNode for jobNode in jobGraph.stack[-1]
+                     if self.jobStore.exists(jobNode.jobStoreID)]
+        if len(remaining) < len(jobGraph.stack[-1]):
+            if remaining:
+                jobGraph.stack[-1] = remaining
+            else:
+                jobGraph.stack.pop()
+            self.jobStore.update(jobGraph)
+        if remaining:
+            logger.debug("%i children of %s are left for the leader", len(remaining), jobGraph)
+        return not remaining
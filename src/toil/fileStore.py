@@ -20,7 +20,6 @@ from bd2k.util.objects import abstractclassmethod
 import base64
 from collections import namedtuple, defaultdict
 
-import dill
 import errno
 import logging
 import os
@@ -38,7 +37,7 @@ from threading import Thread, Semaphore, Event
 
 # Python 3 compatibility imports
 from six.moves.queue import Empty, Queue
-from six.moves import xrange
+from six.moves import cPickle, xrange
 
 from bd2k.util.humanize import bytes2human
 from toil.common import cacheDirName, getDirSizeRecursively, getFileSystemSize
@@ -70,6 +69,7 @@ class DeferredFunction(namedtuple('DeferredFunction', 'function args kwargs name
         # concurrently running jobs when the cache state is loaded from disk. By implication we
         # should serialize as early as possible. We need to serialize the function as well as its
         # arguments.
+        import dill
         return cls(*map(dill.dumps, (function, args, kwargs)),
                    name=function.__name__,
                    module=ModuleDescriptor.forModule(function.__module__).globalize())
@@ -80,6 +80,7 @@ class DeferredFunction(namedtuple('DeferredFunction', 'function args kwargs name
         """
         logger.debug('Running deferred function %s.', self)
         self.module.makeLoadable()
+        import dill
         function, args, kwargs = map(dill.loads, (self.function, self.args, self.kwargs))
         return function(*args, **kwargs)
 
@@ -102,21 +103,32 @@ class FileStore(object):
 
     __metaclass__ = ABCMeta
 
-    def __init__(self, jobStore, jobGraph, localTempDir, inputBlockFn):
+    def __init__(self, jobStore, jobGraph, localTempDir, inputBlockFn, commitClaim=None):
         self.jobStore = jobStore
         self.jobGraph = jobGraph
         self.localTempDir = os.path.abspath(localTempDir)
         self.workFlowDir = os.path.dirname(self.localTempDir)
         self.jobName = self.jobGraph.command.split()[1]
         self.inputBlockFn = inputBlockFn
+        self.commitClaim = commitClaim
+        # The disk space used by the job at the end of its run, set once the job is done
+        self.diskUsed = None
         self.loggingMessages = []
         self.filesToDelete = set()
         self.jobsToDelete = set()
+        # Set by the worker to leave the update of the job to the job it chains next, or to
+        # _commitDeferredJobUpdate() if the chain ends
+        self.deferJobUpdate = False
 
     @staticmethod
-    def createFileStore(jobStore, jobGraph, localTempDir, inputBlockFn, caching):
+    def createFileStore(jobStore, jobGraph, localTempDir, inputBlockFn, caching, commitClaim=None):
+        """
+        :param JobCommitClaim commitClaim: the claim the job must acquire before it is updated in
+               the job store, if other attempts to run it may be running concurrently
+        """
         fileStoreCls = CachingFileStore if caching else NonCachingFileStore
-        return fileStoreCls(jobStore, jobGraph, localTempDir, inputBlockFn)
+        return fileStoreCls(jobStore, jobGraph, localTempDir, inputBlockFn,
+                            commitClaim=commitClaim)
 
     @abstractmethod
     @contextmanager
@@ -269,7 +281,7 @@ class FileStore(object):
 
     class _StateFile(object):
         """
-        Utility class to read and write dill-ed state dictionaries from/to a file into a namespace.
+        Utility class to read and write pickled state dictionaries from/to a file into a namespace.
         """
         def __init__(self, stateDict):
             assert isinstance(stateDict, dict)
@@ -298,7 +310,7 @@ class FileStore(object):
             # Read the value from the cache state file then initialize and instance of
             # _CacheState with it.
             with open(fileName, 'r') as fH:
-                infoDict = dill.load(fH)
+                infoDict = cPickle.load(fH)
             return cls(infoDict)
 
         def write(self, fileName):
@@ -313,7 +325,7 @@ class FileStore(object):
                 # http://stackoverflow.com/questions/2709800/how-to-pickle-yourself
                 # We can't pickle nested classes. So we have to pickle the variables of the class
                 # If we ever change this, we need to ensure it doesn't break FileID
-                dill.dump(self.__dict__, fH)
+                cPickle.dump(self.__dict__, fH, cPickle.HIGHEST_PROTOCOL)
             os.rename(fileName + '.tmp', fileName)
 
     # Methods related to the deferred function logic
@@ -368,13 +380,53 @@ class FileStore(object):
         self.loggingMessages.append(dict(text=text, level=level))
 
     # Functions run after the completion of the job.
+    def _claimCommit(self):
+        """
+        Acquires the commit claim of the job, if any, before the job or any state shared with
+        other attempts to run it is changed. See :class:`JobCommitClaim`.
+        """
+        if self.commitClaim is not None:
+            self.commitClaim.acquire()
+
     @abstractmethod
     def _updateJobWhenDone(self):
         """
-        Update the status of the job on the disk.
+        Update the status of the job on the disk, unless :attr:`deferJobUpdate` is set.
         """
         raise NotImplementedError()
 
+    def _commitJob(self):
+        """
+        Updates the job in the job store, then deletes the jobs and files that the update made
+        obsolete.
+        """
+        # Indicate any files that should be deleted once the update of
+        # the job wrapper is completed.
+        self.jobGraph.filesToDelete = list(self.filesToDelete)
+        # Complete the job
+        self.jobStore.update(self.jobGraph)
+        # Delete any remnant jobs
+        map(self.jobStore.delete, self.jobsToDelete)
+        # Delete any remnant files
+        map(self.jobStore.deleteFile, self.filesToDelete)
+        # Remove the files to delete list, having successfully removed the files
+        if len(self.filesToDelete) > 0:
+            self.jobGraph.filesToDelete = []
+            # Update, removing emptying files to delete
+            self.jobStore.update(self.jobGraph)
+
+    def _commitDeferredJobUpdate(self):
+        """
+        Makes the update of the job that :meth:`_updateJobWhenDone` deferred, if any, once the
+        files written by the job are in the job store.
+        """
+        if self.deferJobUpdate:
+            self._blockFn()
+            if self._terminateEvent.isSet():
+                raise RuntimeError("The termination flag is set, exiting before update")
+            self.deferJobUpdate = False
+            self._commitJob()
+
     @abstractmethod
     def _blockFn(self):
         """
@@ -426,8 +478,9 @@ class CachingFileStore(FileStore):
     reduce I/O between, and during jobs.
     """
 
-    def __init__(self, jobStore, jobGraph, localTempDir, inputBlockFn):
-        super(CachingFileStore, self).__init__(jobStore, jobGraph, localTempDir, inputBlockFn)
+    def __init__(self, jobStore, jobGraph, localTempDir, inputBlockFn, commitClaim=None):
+        super(CachingFileStore, self).__init__(jobStore, jobGraph, localTempDir, inputBlockFn,
+                                               commitClaim=commitClaim)
         # Variables related to asynchronous writes.
         self.workerNumber = 2
         self.queue = Queue()
@@ -450,7 +503,8 @@ class CachingFileStore(FileStore):
         # dictionary.
         self.jobSpecificFiles = {}
         self.jobName = str(self.jobGraph)
-        self.jobID = sha1(self.jobName).hexdigest()
+        # The worker's temp dir tells apart attempts to run the same job on this node at once
+        self.jobID = sha1(self.jobName + self.localTempDir).hexdigest()
         logger.info('Starting job (%s) with ID (%s).', self.jobName, self.jobID)
         # A variable to describe how many hard links an unused file in the cache will have.
         self.nlinkThreshold = None
@@ -490,7 +544,7 @@ class CachingFileStore(FileStore):
             os.chdir(self.localTempDir)
             yield
         finally:
-            diskUsed = getDirSizeRecursively(self.localTempDir)
+            diskUsed = self.diskUsed = getDirSizeRecursively(self.localTempDir)
             logString = ("Job {jobName} used {percent:.2f}% ({humanDisk}B [{disk}B] used, "
                          "{humanRequestedDisk}B [{requestedDisk}B] requested) at the end of "
                          "its run.".format(jobName=self.jobName,
@@ -1500,6 +1554,8 @@ class CachingFileStore(FileStore):
         until the writing threads have finished and the input blockFn has stopped \
         blocking.
         """
+        # Claim the job before the update, which a concurrent attempt must not make
+        self._claimCommit()
 
         def asyncUpdate():
             try:
@@ -1520,24 +1576,8 @@ class CachingFileStore(FileStore):
                 if self._terminateEvent.isSet():
                     raise RuntimeError("The termination flag is set, exiting before update")
 
-                # Indicate any files that should be deleted once the update of
-                # the job wrapper is completed.
-                self.jobGraph.filesToDelete = list(self.filesToDelete)
-
-                # Complete the job
-                self.jobStore.update(self.jobGraph)
-
-                # Delete any remnant jobs
-                map(self.jobStore.delete, self.jobsToDelete)
-
-                # Delete any remnant files
-                map(self.jobStore.deleteFile, self.filesToDelete)
-
-                # Remove the files to delete list, having successfully removed the files
-                if len(self.filesToDelete) > 0:
-                    self.jobGraph.filesToDelete = []
-                    # Update, removing emptying files to delete
-                    self.jobStore.update(self.jobGraph)
+                if not self.deferJobUpdate:
+                    self._commitJob()
             except:
                 self._terminateEvent.set()
                 raise
@@ -1587,7 +1627,7 @@ class CachingFileStore(FileStore):
 
 
 class NonCachingFileStore(FileStore):
-    def __init__(self, jobStore, jobGraph, localTempDir, inputBlockFn):
+    def __init__(self, jobStore, jobGraph, localTempDir, inputBlockFn, commitClaim=None):
         self.jobStore = jobStore
         self.jobGraph = jobGraph
         self.jobName = str(self.jobGraph)
@@ -1596,7 +1636,8 @@ class NonCachingFileStore(FileStore):
         self.jobsToDelete = set()
         self.loggingMessages = []
         self.filesToDelete = set()
-        super(NonCachingFileStore, self).__init__(jobStore, jobGraph, localTempDir, inputBlockFn)
+        super(NonCachingFileStore, self).__init__(jobStore, jobGraph, localTempDir, inputBlockFn,
+                                                  commitClaim=commitClaim)
         # This will be defined in the `open` method.
         self.jobStateFile = None
         self.localFileMap = defaultdict(list)
@@ -1616,7 +1657,7 @@ class NonCachingFileStore(FileStore):
             os.chdir(self.localTempDir)
             yield
         finally:
-            diskUsed = getDirSizeRecursively(self.localTempDir)
+            diskUsed = self.diskUsed = getDirSizeRecursively(self.localTempDir)
             logString = ("Job {jobName} used {percent:.2f}% ({humanDisk}B [{disk}B] used, "
                          "{humanRequestedDisk}B [{requestedDisk}B] requested) at the end of "
                          "its run.".format(jobName=self.jobName,
@@ -1692,21 +1733,12 @@ class NonCachingFileStore(FileStore):
         return True
 
     def _updateJobWhenDone(self):
+        # Claim the job before the update, which a concurrent attempt must not make
+        self._claimCommit()
+        if self.deferJobUpdate:
+            return
         try:
-            # Indicate any files that should be deleted once the update of
-            # the job wrapper is completed.
-            self.jobGraph.filesToDelete = list(self.filesToDelete)
-            # Complete the job
-            self.jobStore.update(self.jobGraph)
-            # Delete any remnant jobs
-            map(self.jobStore.delete, self.jobsToDelete)
-            # Delete any remnant files
-            map(self.jobStore.deleteFile, self.filesToDelete)
-            # Remove the files to delete list, having successfully removed the files
-            if len(self.filesToDelete) > 0:
-                self.jobGraph.filesToDelete = []
-                # Update, removing emptying files to delete
-                self.jobStore.update(self.jobGraph)
+            self._commitJob()
         except:
             self._terminateEvent.set()
             raise
@@ -1795,15 +1827,15 @@ class NonCachingFileStore(FileStore):
     @staticmethod
     def _readJobState(jobStateFileName):
         with open(jobStateFileName) as fH:
-            state = dill.load(fH)
+            state = cPickle.load(fH)
         return state
 
     def _registerDeferredFunction(self, deferredFunction):
         with open(self.jobStateFile) as fH:
-            jobState = dill.load(fH)
+            jobState = cPickle.load(fH)
         jobState['deferredFunctions'].append(deferredFunction)
         with open(self.jobStateFile + '.tmp', 'w') as fH:
-            dill.dump(jobState, fH)
+            cPickle.dump(jobState, fH, cPickle.HIGHEST_PROTOCOL)
         os.rename(self.jobStateFile + '.tmp', self.jobStateFile)
         logger.debug('Registered "%s" with job "%s".', deferredFunction, self.jobName)
 
@@ -1821,7 +1853,7 @@ class NonCachingFileStore(FileStore):
                     'jobDir': self.localTempDir,
                     'deferredFunctions': []}
         with open(jobStateFile + '.tmp', 'w') as fH:
-            dill.dump(jobState, fH)
+            cPickle.dump(jobState, fH, cPickle.HIGHEST_PROTOCOL)
         os.rename(jobStateFile + '.tmp', jobStateFile)
         return jobStateFile
 
@@ -1850,6 +1882,45 @@ class FileID(str):
         return cls(fileStoreID, os.stat(filePath).st_size)
 
 
+class JobCommitClaim(object):
+    """
+    Arbitrates between attempts to run the same issue of a job concurrently, as the leader issues
+    them when it runs jobs speculatively. An attempt must acquire the claim before it changes the
+    job, or any other state it shares with the other attempts, in the job store. Only the first
+    attempt to do so succeeds, the others give up.
+    """
+    def __init__(self, jobStore, jobStoreID, claimToken):
+        """
+        :param toil.jobStores.abstractJobStore.AbstractJobStore jobStore:
+        :param str jobStoreID: the ID of the job
+        :param str claimToken: identifies the issue of the job, shared by all its attempts
+        """
+        self.jobStore = jobStore
+        self.jobStoreID = jobStoreID
+        self.claimToken = claimToken
+        self.acquired = False
+
+    def acquire(self):
+        """
+        Acquires the claim, unless this attempt holds it already.
+
+        :raises JobCommitClaimedException: if another attempt acquired the claim first
+        """
+        if not self.acquired:
+            if not self.jobStore.claimJobCommit(self.jobStoreID, self.claimToken):
+                raise JobCommitClaimedException(self.jobStoreID)
+            self.acquired = True
+
+
+class JobCommitClaimedException(Exception):
+    """
+    Raised if another attempt to run a job acquired its commit claim first.
+    """
+    def __init__(self, jobStoreID):
+        super(JobCommitClaimedException, self).__init__(
+            'Another attempt to run job %s claimed it first' % jobStoreID)
+
+
 def shutdownFileStore(workflowDir, workflowID):
     """
     Run the deferred functions from any prematurely terminated jobs still lingering on the system
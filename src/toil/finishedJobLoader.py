@@ -0,0 +1,224 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import logging
+import sys
+import time
+from collections import deque
+from threading import Thread, Event
+
+# Python 3 compatibility imports
+from six import reraise
+from six.moves.queue import Empty, Queue
+
+from toil.jobStores.abstractJobStore import NoSuchJobException
+from toil.statsAndLogging import StatsAndLogging
+
+logger = logging.getLogger( __name__ )
+
+
+class FinishedJob(object):
+    """
+    A job that was reported as finished by the batch system and whose jobGraph is being loaded
+    from the job store.
+    """
+    def __init__(self, jobNode, resultStatus):
+        self.jobNode = jobNode
+        self.resultStatus = resultStatus
+        # The loaded jobGraph, or None if the job no longer exists in the job store
+        self.jobGraph = None
+        # The exc_info tuple of any exception raised while loading the jobGraph
+        self.excInfo = None
+        # Set once the jobGraph has been loaded, or loading failed
+        self.loaded = Event()
+
+
+class FinishedJobLoader(object):
+    """
+    Manages a bounded pool of threads that load the jobGraphs of finished jobs from the job store
+    and, if a job failed, update them, so that the leader can keep scheduling jobs while this I/O
+    is in flight. Loaded jobs are returned in the order they were submitted.
+    """
+    def __init__(self, jobStore, config, wakeup=None):
+        """
+        :param toil.jobStores.abstractJobStore.AbstractJobStore jobStore:
+        :param toil.common.Config config:
+        :param toil.lib.threading.Wakeup wakeup: if given, signalled whenever a job has been
+               loaded
+        """
+        self.jobStore = jobStore
+        self.config = config
+        self._wakeup = wakeup
+
+        self._terminate = Event() # This is used to terminate the loader threads
+
+        self._finishedJobsToLoad = Queue() # This is the input queue of the loader threads
+
+        self._finishedJobs = deque() # The FinishedJob instances submitted and not yet
+        # returned by getLoadedJobs, in submission order. Only used by the leader thread.
+
+        self._loaders = [Thread(target=self._loadFinishedJobs,
+                                args=(self._finishedJobsToLoad, self._terminate, self._wakeup,
+                                      self.jobStore, self.config))
+                         for _ in range(self.numLoaderThreads(jobStore, config))]
+
+    @staticmethod
+    def numLoaderThreads(jobStore, config):
+        """
+        :return: the number of loader threads to use with the given job store. Job stores that
+                 can't be accessed by several threads at once get a single loader thread.
+        :rtype: int
+        """
+        return config.leaderIOThreads if jobStore.supportsConcurrentAccess() else 1
+
+    def start(self):
+        """
+        Start the loader threads.
+        """
+        for loader in self._loaders:
+            loader.start()
+
+    def loadFinishedJob(self, jobNode, resultStatus):
+        """
+        Asynchronously load the jobGraph of a job that was reported as finished by the batch
+        system. Once loaded, the job will be returned by getLoadedJobs.
+
+        :param toil.jobGraph.JobNode jobNode: the finished job
+        :param int resultStatus: the exit status reported by the batch system
+        """
+        finishedJob = FinishedJob(jobNode, resultStatus)
+        self._finishedJobs.append(finishedJob)
+        self._finishedJobsToLoad.put(finishedJob)
+
+    def getLoadedJobs(self):
+        """
+        Returns the jobs whose jobGraphs have been loaded, in the order they were passed to
+        loadFinishedJob. A job is only returned once all jobs submitted before it have been
+        returned.
+
+        :raise: any exception raised while loading the jobGraph of a returned job
+
+        :rtype: list[FinishedJob]
+        """
+        loadedJobs = []
+        while len(self._finishedJobs) > 0 and self._finishedJobs[0].loaded.is_set():
+            finishedJob = self._finishedJobs.popleft()
+            if finishedJob.excInfo is not None:
+                reraise(*finishedJob.excInfo)
+            loadedJobs.append(finishedJob)
+        return loadedJobs
+
+    def getNumberOfFinishedJobs(self):
+        """
+        :return: the number of jobs passed to loadFinishedJob that have not yet been returned by
+                 getLoadedJobs
+        :rtype: int
+        """
+        return len(self._finishedJobs)
+
+    def check(self):
+        """
+        Check on the loader threads.
+        :raise RuntimeError: If any of the underlying threads has quit.
+        """
+        for loader in self._loaders:
+            if not loader.is_alive():
+                raise RuntimeError("Finished job loader has quit")
+
+    def shutdown(self):
+        """
+        Terminate the loader threads. Jobs that are still waiting to be loaded are dropped.
+        """
+        logger.info('Waiting for finished job loader threads to finish ...')
+        startTime = time.time()
+        self._terminate.set()
+        for loader in self._loaders:
+            loader.join()
+        logger.info('... finished shutting down the finished job loader. Took %s seconds',
+                    time.time() - startTime)
+
+    @classmethod
+    def _loadFinishedJobs(cls, finishedJobsToLoad, terminate, wakeup, jobStore, config):
+        """
+        Thread used to load the jobGraphs of finished jobs.
+        """
+        while True:
+            try:
+                # Get a finished job to load, waiting a short period
+                finishedJob = finishedJobsToLoad.get(timeout=1.0)
+            except Empty:
+                # Check if the thread should quit
+                if terminate.is_set():
+                    logger.debug('Received signal to quit loading finished jobs.')
+                    break
+                continue
+            try:
+                finishedJob.jobGraph = cls._loadFinishedJob(finishedJob.jobNode,
+                                                            finishedJob.resultStatus,
+                                                            jobStore, config)
+            except:
+                # Passed on to the leader thread by getLoadedJobs
+                finishedJob.excInfo = sys.exc_info()
+            finishedJob.loaded.set()
+            if wakeup is not None:
+                wakeup.signal()
+
+    @staticmethod
+    def _loadFinishedJob(jobNode, resultStatus, jobStore, config):
+        """
+        Reads the jobGraph of a finished job, reporting its log file, if any, and updates it if
+        the batch system reported the job as failed.
+
+        :return: the jobGraph, or None if the job was removed from the job store
+        :rtype: toil.jobGraph.JobGraph
+        """
+        jobStoreID = jobNode.jobStoreID
+        if not jobStore.exists(jobStoreID):
+            return None
+        logger.debug("Job %s continues to exist (i.e. has more to do)", jobNode)
+        try:
+            jobGraph = jobStore.load(jobStoreID)
+        except NoSuchJobException:
+            # Avoid importing AWSJobStore as the corresponding extra might be missing
+            if jobStore.__class__.__name__ == 'AWSJobStore':
+                # We have a ghost job - the job has been deleted but a stale read from
+                # SDB gave us a false positive when we checked for its existence.
+                # Process the job from here as any other job removed from the job store.
+                # This is a temporary work around until https://github.com/BD2KGenomics/toil/issues/1091
+                # is completed
+                logger.warn('Got a stale read from SDB for job %s', jobNode)
+                return None
+            else:
+                raise
+        if jobGraph.logJobStoreFileID is not None:
+            with jobGraph.getLogFileHandle(jobStore) as logFileStream:
+                # more memory efficient than read().striplines() while leaving off the
+                # trailing \n left when using readlines()
+                # http://stackoverflow.com/a/15233739
+                messages = [line.rstrip('\n') for line in logFileStream]
+                logFormat = '\n%s    ' % jobStoreID
+                logger.warn('The job seems to have left a log file, indicating failure: %s\n%s',
+                            jobGraph, logFormat.join(messages))
+                StatsAndLogging.writeLogFiles(jobGraph.chainedJobs, messages, config)
+        if resultStatus != 0:
+            # If the batch system returned a non-zero exit code then the worker
+            # is assumed not to have captured the failure of the job, so we
+            # reduce the retry count here.
+            if jobGraph.logJobStoreFileID is None:
+                logger.warn("No log file is present, despite job failing: %s", jobNode)
+            jobGraph.setupJobAfterFailure(config)
+            jobStore.update(jobGraph)
+        return jobGraph
@@ -15,14 +15,15 @@
 from __future__ import absolute_import, print_function
 
 import collections
+import copy
 import importlib
 import inspect
+import itertools
 import logging
 import os
 import sys
 import time
 import uuid
-import dill
 
 from abc import ABCMeta, abstractmethod
 from argparse import ArgumentParser
@@ -30,7 +31,7 @@ from contextlib import contextmanager
 from io import BytesIO
 
 # Python 3 compatibility imports
-from six.moves import cPickle
+from six.moves import cPickle, intern, reprlib, xrange
 from six import iteritems, string_types
 
 from bd2k.util.exceptions import require
@@ -43,6 +44,7 @@ from toil.lib.bioio import (setLoggingFromOptions,
                             getTotalCpuTimeAndMemoryUsage,
                             getTotalCpuTime)
 from toil.resource import ModuleDescriptor
+from toil.serialiser import Serialiser
 
 logger = logging.getLogger( __name__ )
 
@@ -52,7 +54,15 @@ class JobLikeObject(object):
     Inherit from this class to add requirement properties to a job (or job-like) object.
     If the object doesn't specify explicit requirements, these properties will fall back
     to the configured defaults. If the value cannot be determined, an AttributeError is raised.
+
+    The leader holds millions of job nodes and job graphs in memory, so the attributes of this
+    class and of JobNode and JobGraph are stored in slots rather than in a per-instance dict.
+    Subclasses that do not declare __slots__, like Job, still get a dict. Instances pickle to
+    and from the same state dict as before the slots were introduced.
     """
+    __slots__ = ('unitName', 'jobName', '_cores', '_memory', '_disk', '_preemptable', '_config',
+                 '__weakref__')
+
     def __init__(self, requirements, unitName, jobName=None):
         cores = requirements.get('cores')
         memory = requirements.get('memory')
@@ -63,7 +73,7 @@ class JobLikeObject(object):
         if jobName is not None:
             assert isinstance(jobName, str)
         self.unitName = unitName
-        self.jobName = jobName if jobName is not None else self.__class__.__name__
+        self.jobName = self._internName(jobName if jobName is not None else self.__class__.__name__)
         self._cores = self._parseResource('cores', cores)
         self._memory = self._parseResource('memory', memory)
         self._disk = self._parseResource('disk', disk)
@@ -172,6 +182,64 @@ class JobLikeObject(object):
             raise TypeError("The '%s' requirement does not accept values that are of %s"
                             % (name, type(value)))
 
+    @classmethod
+    def _slotNames(cls):
+        """
+        :return: the names of the slots declared by this class and its base classes
+        :rtype: frozenset[str]
+        """
+        try:
+            return cls.__dict__['_slotNamesCache']
+        except KeyError:
+            slotNames = frozenset(slot for klass in cls.__mro__
+                                  for slot in klass.__dict__.get('__slots__', ())
+                                  if slot != '__weakref__')
+            # Cache on the class itself, not on a base class it would be inherited from
+            setattr(cls, '_slotNamesCache', slotNames)
+            return slotNames
+
+    @staticmethod
+    def _internName(name):
+        """
+        Job names are shared by many jobs so only one copy of each is kept. Only exact str
+        instances can be interned, others, e.g. instances of subclasses of str, are returned as
+        they are.
+        """
+        return intern(name) if type(name) is str else name
+
+    def __getstate__(self):
+        """
+        :return: the attributes of this object as a dict, whether stored in slots or in the
+                 instance dict
+        :rtype: dict
+        """
+        state = dict(getattr(self, '__dict__', ()))
+        for slot in self._slotNames():
+            try:
+                state[slot] = getattr(self, slot)
+            except AttributeError:
+                # The slot was never set
+                pass
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores the attributes returned by __getstate__, or those of an instance pickled before
+        the slots were introduced.
+        """
+        slotNames = self._slotNames()
+        instanceDict = getattr(self, '__dict__', None)
+        for name, value in iteritems(state):
+            if name in slotNames:
+                if name == 'jobName':
+                    value = self._internName(value)
+                setattr(self, name, value)
+            elif instanceDict is not None:
+                instanceDict[name] = value
+            else:
+                logger.debug("Dropping attribute '%s' unknown to %s while unpickling.",
+                             name, self.__class__.__name__)
+
     def __str__(self):
         printedName = "'" + self.jobName + "'"
         if self.unitName:
@@ -185,6 +253,8 @@ class JobNode(JobLikeObject):
     """
     This object bridges the job graph, job, and batchsystem classes
     """
+    __slots__ = ('jobStoreID', 'predecessorNumber', 'command')
+
     def __init__(self, requirements, jobName, unitName, jobStoreID,
                  command, predecessorNumber=1):
         super(JobNode, self).__init__(requirements=requirements, unitName=unitName, jobName=jobName)
@@ -200,7 +270,7 @@ class JobNode(JobLikeObject):
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
+            return self.__getstate__() == other.__getstate__()
         return NotImplemented
 
     def __ne__(self, other):
@@ -209,7 +279,7 @@ class JobNode(JobLikeObject):
         return NotImplemented
 
     def __repr__(self):
-        return '%s( **%r )' % (self.__class__.__name__, self.__dict__)
+        return '%s( **%r )' % (self.__class__.__name__, self.__getstate__())
 
     @classmethod
     def fromJobGraph(cls, jobGraph):
@@ -446,6 +516,30 @@ class Job(JobLikeObject):
         else:
             return self.addFollowOn(JobFunctionWrappingJob(fn, *args, **kwargs))
 
+    def addChildMap(self, fn, iterable, chunkSize=1000, gather=False, **kwargs):
+        """
+        Adds a job function as a child job for each element of the given iterable, see
+        :class:`toil.job.ChildMap`. This is much cheaper than adding each child with
+        :func:`toil.job.Job.addChildJobFn`, in particular for large fan-outs.
+
+        :param fn: Job function to be run for each element, with the element as its only
+               positional argument after the job and ``**kwargs`` as keyword arguments. See
+               toil.job.JobFunctionWrappingJob for reserved keyword arguments used to specify
+               resource requirements, which apply to each child.
+        :param iterable: the elements, which must be picklable.
+        :param int chunkSize: the maximum number of elements stored in each file of the map.
+        :param bool gather: if True, a follow-on of this job collects the return values of the
+               children, see :func:`toil.job.ChildMap.rv`.
+        :return: The map holding the new child jobs.
+        :rtype: toil.job.ChildMap
+        """
+        childMap = ChildMap(fn, iterable, chunkSize, **kwargs)
+        for childJob in childMap.children:
+            self.addChild(childJob)
+        if gather:
+            childMap.gatherJob = self.addFollowOn(ChildMapGatherJob(childMap))
+        return childMap
+
     @staticmethod
     def wrapFn(fn, *args, **kwargs):
         """
@@ -520,11 +614,18 @@ class Job(JobLikeObject):
         """
         return Promise(self, path)
 
-    def registerPromise(self, path):
+    def registerPromise(self, path, jobStoreID=None):
+        """
+        Creates the file that will hold the promised value of the given path.
+
+        :param str jobStoreID: the ID of the job owning the file, if any, see
+               :func:`toil.jobStores.abstractJobStore.AbstractJobStore.writeFileStream`
+        :return: the locator of the job store and the ID of the file
+        """
         if self._promiseJobStore is None:
             raise RuntimeError('Trying to pass a promise from a promising job that is not a ' +
                                'predecessor of the job receiving the promise')
-        with self._promiseJobStore.writeFileStream() as (fileHandle, jobStoreFileID):
+        with self._promiseJobStore.writeFileStream(jobStoreID) as (fileHandle, jobStoreFileID):
             promise = UnfulfilledPromiseSentinel(str(self), False)
             cPickle.dump(promise, fileHandle, cPickle.HIGHEST_PROTOCOL)
         self._rvs[path].append(jobStoreFileID)
@@ -552,13 +653,17 @@ class Job(JobLikeObject):
         :func:`toil.job.Job.checkJobGraphAcyclic` and
         :func:`toil.job.Job.checkNewCheckpointsAreLeafVertices` for more info.
 
+        The checks share a single walk of the connected component of jobs containing this job,
+        so together they take ``O(|V| + |E|)`` time.
+
         :raises toil.job.JobGraphDeadlockException: if the job graph
             is cyclic, contains multiple roots or contains checkpoint jobs that are
             not leaf vertices when defined (see :func:`toil.job.Job.checkNewCheckpointsAreLeaves`).
         """
-        self.checkJobGraphConnected()
-        self.checkJobGraphAcylic()
-        self.checkNewCheckpointsAreLeafVertices()
+        roots, jobs = self._getJobGraphComponent()
+        self._checkJobGraphConnected(roots)
+        self._checkJobGraphAcylic(roots, jobs)
+        self._checkNewCheckpointsAreLeafVertices(roots, jobs)
 
     def getRootJobs(self):
         """
@@ -567,21 +672,7 @@ class Job(JobLikeObject):
 
         :rtype : set of toil.job.Job instances
         """
-        roots = set()
-        visited = set()
-        #Function to get the roots of a job
-        def getRoots(job):
-            if job not in visited:
-                visited.add(job)
-                if len(job._directPredecessors) > 0:
-                    map(lambda p : getRoots(p), job._directPredecessors)
-                else:
-                    roots.add(job)
-                #The following call ensures we explore all successor edges.
-                map(lambda c : getRoots(c), job._children +
-                    job._followOns)
-        getRoots(self)
-        return roots
+        return self._getJobGraphComponent()[0]
 
     def checkJobGraphConnected(self):
         """
@@ -591,10 +682,7 @@ class Job(JobLikeObject):
         As execution always starts from one root job, having multiple root jobs will \
         cause a deadlock to occur.
         """
-        rootJobs = self.getRootJobs()
-        if len(rootJobs) != 1:
-            raise JobGraphDeadlockException("Graph does not contain exactly one"
-                                            " root job: %s" % rootJobs)
+        self._checkJobGraphConnected(self.getRootJobs())
 
     def checkJobGraphAcylic(self):
         """
@@ -609,21 +697,14 @@ class Job(JobLikeObject):
         an edge an "implied" edge. The augmented job graph is a job graph including \
         all the implied edges.
 
-        For a job graph G = (V, E) the algorithm is ``O(|V|^2)``. It is ``O(|V| + |E|)`` for \
-        a graph with no follow-ons. The former follow-on case could be improved!
+        Instead of adding the implied edges, whose number is ``O(|V|^2)``, the check searches \
+        for cycles in a graph with three vertices for each job: one for its start, one for the \
+        completion of its children and their successors and one for its completion. A \
+        follow-on B of A starts after the children of A completed, which completes A in turn \
+        and every job completes after it started. That graph has a cycle if and only if the \
+        augmented job graph has one, and the check takes ``O(|V| + |E|)`` time.
         """
-        #Get the root jobs
-        roots = self.getRootJobs()
-        if len(roots) == 0:
-            raise JobGraphDeadlockException("Graph contains no root jobs due to cycles")
-
-        #Get implied edges
-        extraEdges = self._getImpliedEdges(roots)
-
-        #Check for directed cycles in the augmented graph
-        visited = set()
-        for root in roots:
-            root._checkJobGraphAcylicDFS([], visited, extraEdges)
+        self._checkJobGraphAcylic(*self._getJobGraphComponent())
 
     def checkNewCheckpointsAreLeafVertices(self):
         """
@@ -639,17 +720,7 @@ class Job(JobLikeObject):
         :raises toil.job.JobGraphDeadlockException: if there exists a job being added to the graph for which \
         checkpoint=True and which is not a leaf.
         """
-        roots = self.getRootJobs() # Roots jobs of component, these are preexisting jobs in the graph
-
-        # All jobs in the component of the job graph containing self
-        jobs = set()
-        map(lambda x : x._dfs(jobs), roots)
-
-        # Check for each job for which checkpoint is true that it is a cut vertex or leaf
-        for y in filter(lambda x : x.checkpoint, jobs):
-            if y not in roots: # The roots are the prexisting jobs
-                if not Job._isLeafVertex(y):
-                    raise JobGraphDeadlockException("New checkpoint job %s is not a leaf in the job graph" % y)
+        self._checkNewCheckpointsAreLeafVertices(*self._getJobGraphComponent())
 
     def defer(self, function, *args, **kwargs):
         """
@@ -861,15 +932,26 @@ class Job(JobLikeObject):
         """
         commandTokens = command.split()
         assert "_toil" == commandTokens[0]
+        if commandTokens[1] == ChildMap.commandToken:
+            # The child of a map, see ChildMap._command()
+            mapTokens = commandTokens[2:5]
+            del commandTokens[2:5]
+        else:
+            mapTokens = None
         userModule = ModuleDescriptor.fromCommand(commandTokens[2:])
         logger.debug('Loading user module %s.', userModule)
         userModule = cls._loadUserModule(userModule)
+        if mapTokens is not None:
+            return ChildMap._loadChild(jobStore, userModule, *mapTokens)
         pickleFile = commandTokens[1]
         if pickleFile == "firstJob":
             openFileStream = jobStore.readSharedFileStream(pickleFile)
         else:
             openFileStream = jobStore.readFileStream(pickleFile)
         with openFileStream as fileHandle:
+            fileHandle = BytesIO(Serialiser.decode(fileHandle.read()))
+        promiseFileIDs = cPickle.load(fileHandle)
+        with Promise.prefetch(jobStore, promiseFileIDs):
             return cls._unpickle(userModule, fileHandle, jobStore.config)
 
 
@@ -883,6 +965,17 @@ class Job(JobLikeObject):
         :param fileHandle:
         :returns:
         """
+        runnable = cls._makeUnpickler(userModule, fileHandle).load()
+        assert isinstance(runnable, JobLikeObject)
+        runnable._config = config
+        return runnable
+
+    @classmethod
+    def _makeUnpickler(cls, userModule, fileHandle):
+        """
+        Returns an unpickler for the given file handle that loads symbols referencing the
+        __main__ module from the given userModule instead.
+        """
         unpickler = cPickle.Unpickler(fileHandle)
 
         def filter_main(module_name, class_name):
@@ -894,10 +987,7 @@ class Job(JobLikeObject):
                 return getattr(importlib.import_module(module_name), class_name)
 
         unpickler.find_global = filter_main
-        runnable = unpickler.load()
-        assert isinstance(runnable, JobLikeObject)
-        runnable._config = config
-        return runnable
+        return unpickler
 
     def getUserScript(self):
         return self.userModule
@@ -906,6 +996,8 @@ class Job(JobLikeObject):
         """
         Sets the values for promises using the return values from this job's run() function.
         """
+        contents = {}
+        serialiser = jobStore.serialiser
         for path, promiseFileStoreIDs in iteritems(self._rvs):
             if not path:
                 # Note that its possible for returnValues to be a promise, not an actual return
@@ -924,63 +1016,122 @@ class Job(JobLikeObject):
                     for index in path:
                         promisedValue = promisedValue[index]
             for promiseFileStoreID in promiseFileStoreIDs:
-                # File may be gone if the job is a service being re-run and the accessing job is
-                # already complete.
-                if jobStore.fileExists(promiseFileStoreID):
-                    with jobStore.updateFileStream(promiseFileStoreID) as fileHandle:
-                        cPickle.dump(promisedValue, fileHandle, cPickle.HIGHEST_PROTOCOL)
+                # Pickled once for each file, since a promised value that is a promise itself
+                # registers another file each time it is pickled
+                contents[promiseFileStoreID] = serialiser.dumps(promisedValue)
+        # Files may be gone if the job is a service being re-run and the accessing job is already
+        # complete, those are skipped.
+        jobStore.updateFilesMany(contents)
 
-    # Functions associated with Job.checkJobGraphAcyclic to establish that the job graph does not
-    # contain any cycles of dependencies:
+    # Functions associated with Job.checkJobGraphForDeadlocks to establish that the job graph
+    # has a single root, does not contain any cycles of dependencies and only has new checkpoint
+    # jobs that are leaves. The graphs are walked iteratively since they may be deep.
 
-    def _dfs(self, visited):
+    def _getJobGraphComponent(self):
         """
-        Adds the job and all jobs reachable on a directed path from current node to the given set.
+        Walks the connected component of jobs containing this job along successor and
+        predecessor edges.
+
+        :return: the root jobs of the component and all jobs in it
+        :rtype: (set, set)
         """
-        if self not in visited:
-            visited.add(self)
-            for successor in self._children + self._followOns:
-                successor._dfs(visited)
+        roots = set()
+        jobs = {self}
+        pending = [self]
+        while pending:
+            job = pending.pop()
+            if not job._directPredecessors:
+                roots.add(job)
+            for neighbour in itertools.chain(job._children, job._followOns,
+                                             job._directPredecessors):
+                if neighbour not in jobs:
+                    jobs.add(neighbour)
+                    pending.append(neighbour)
+        return roots, jobs
 
-    def _checkJobGraphAcylicDFS(self, stack, visited, extraEdges):
+    @staticmethod
+    def _checkJobGraphConnected(roots):
+        if len(roots) != 1:
+            raise JobGraphDeadlockException("Graph does not contain exactly one"
+                                            " root job: %s" % roots)
+
+    @staticmethod
+    def _checkJobGraphAcylic(roots, jobs):
         """
-        DFS traversal to detect cycles in augmented job graph.
+        See :meth:`checkJobGraphAcylic`.
+
+        :param set roots: the root jobs of the component, see :meth:`_getJobGraphComponent`
+        :param set jobs: all jobs in the component
         """
-        if self not in visited:
-            visited.add(self)
-            stack.append(self)
-            for successor in self._children + self._followOns + extraEdges[self]:
-                successor._checkJobGraphAcylicDFS(stack, visited, extraEdges)
-            assert stack.pop() == self
-        if self in stack:
-            stack.append(self)
-            raise JobGraphDeadlockException("A cycle of job dependencies has been detected '%s'" % stack)
+        if len(roots) == 0:
+            raise JobGraphDeadlockException("Graph contains no root jobs due to cycles")
+        # Counts the unvisited edges entering the start, children completion and completion
+        # vertex of each job, see checkJobGraphAcylic(). The edges between completion vertices
+        # point from successors to predecessors.
+        startEdges = dict.fromkeys(jobs, 0)
+        childrenDoneEdges = {}
+        doneEdges = {}
+        childParents = {job: [] for job in jobs}
+        followOnParents = {job: [] for job in jobs}
+        for job in jobs:
+            childrenDoneEdges[job] = 1 + len(job._children)
+            doneEdges[job] = 1 + len(job._followOns)
+            for child in job._children:
+                startEdges[child] += 1
+                childParents[child].append(job)
+            for followOn in job._followOns:
+                # From the start and the children completion of the job
+                startEdges[followOn] += 2
+                followOnParents[followOn].append(job)
+
+        # Visits the vertices in topological order, those on or after a cycle are never visited
+        started = list(roots)
+        childrenDone = []
+        done = []
+        numVisited = 0
+        while started or childrenDone or done:
+            if started:
+                job = started.pop()
+                for successor in itertools.chain(job._children, job._followOns):
+                    startEdges[successor] -= 1
+                    if startEdges[successor] == 0:
+                        started.append(successor)
+                childrenDoneEdges[job] -= 1
+                if childrenDoneEdges[job] == 0:
+                    childrenDone.append(job)
+            elif childrenDone:
+                job = childrenDone.pop()
+                for followOn in job._followOns:
+                    startEdges[followOn] -= 1
+                    if startEdges[followOn] == 0:
+                        started.append(followOn)
+                doneEdges[job] -= 1
+                if doneEdges[job] == 0:
+                    done.append(job)
+            else:
+                job = done.pop()
+                for parent in childParents[job]:
+                    childrenDoneEdges[parent] -= 1
+                    if childrenDoneEdges[parent] == 0:
+                        childrenDone.append(parent)
+                for parent in followOnParents[job]:
+                    doneEdges[parent] -= 1
+                    if doneEdges[parent] == 0:
+                        done.append(parent)
+            numVisited += 1
+        if numVisited < 3 * len(jobs):
+            blocked = [job for job in jobs if doneEdges[job] > 0]
+            raise JobGraphDeadlockException("A cycle of job dependencies has been detected, "
+                                            "%i jobs can never complete: %s"
+                                            % (len(blocked), reprlib.repr(blocked)))
 
     @staticmethod
-    def _getImpliedEdges(roots):
-        """
-        Gets the set of implied edges. See Job.checkJobGraphAcylic
-        """
-        #Get nodes in job graph
-        nodes = set()
-        for root in roots:
-            root._dfs(nodes)
-
-        ##For each follow-on edge calculate the extra implied edges
-        #Adjacency list of implied edges, i.e. map of jobs to lists of jobs
-        #connected by an implied edge
-        extraEdges = dict(map(lambda n : (n, []), nodes))
-        for job in nodes:
-            if len(job._followOns) > 0:
-                #Get set of jobs connected by a directed path to job, starting
-                #with a child edge
-                reacheable = set()
-                for child in job._children:
-                    child._dfs(reacheable)
-                #Now add extra edges
-                for descendant in reacheable:
-                    extraEdges[descendant] += job._followOns[:]
-        return extraEdges
+    def _checkNewCheckpointsAreLeafVertices(roots, jobs):
+        # Check for each job for which checkpoint is true that it is a cut vertex or leaf
+        for job in jobs:
+            if job.checkpoint and job not in roots: # The roots are the prexisting jobs
+                if not Job._isLeafVertex(job):
+                    raise JobGraphDeadlockException("New checkpoint job %s is not a leaf in the job graph" % job)
 
     ####################################################
     #The following functions are used to serialise
@@ -991,40 +1142,48 @@ class Job(JobLikeObject):
         """
         Create an empty job for the job.
         """
+        return jobStore.create(self._makeJobNode(jobStore, command=command,
+                                                 predecessorNumber=predecessorNumber))
+
+    def _makeJobNode(self, jobStore, command=None, predecessorNumber=0):
+        """
+        Create the job node to create an empty job for the job from.
+        """
         # set _config to determine user determined default values for resource requirements
         self._config = jobStore.config
-        return jobStore.create(JobNode.fromJob(self, command=command,
-                                               predecessorNumber=predecessorNumber))
+        return JobNode.fromJob(self, command=command, predecessorNumber=predecessorNumber)
 
     def _makeJobGraphs(self, jobGraph, jobStore):
         """
-        Creates a jobGraph for each job in the job graph, recursively.
-        """
-        jobsToJobGraphs = {self:jobGraph}
-        for successors in (self._followOns, self._children):
-            jobs = map(lambda successor:
-                successor._makeJobGraphs2(jobStore, jobsToJobGraphs), successors)
-            jobGraph.stack.append(jobs)
+        Creates a jobGraph for each job in the job graph, all at once, and adds the successors of
+        each job to its stack.
+        """
+        jobs = []
+        self._collectSuccessors(jobs, {self})
+        jobNodes = [job._makeJobNode(jobStore, predecessorNumber=len(job._directPredecessors))
+                    for job in jobs]
+        jobGraphs = jobStore.createMany(jobNodes)
+        jobsToJobGraphs = dict(zip(jobs, jobGraphs))
+        jobsToJobGraphs[self] = jobGraph
+        for job in [self] + jobs:
+            #Add followOns/children to be run after the job.
+            for successors in (job._followOns, job._children):
+                #The predecessorNumber of a JobNode is used to establish which predecessors have
+                #been completed before running the given Job
+                jobsToJobGraphs[job].stack.append([JobNode.fromJobGraph(jobsToJobGraphs[successor])
+                                                   for successor in successors])
         return jobsToJobGraphs
 
-    def _makeJobGraphs2(self, jobStore, jobsToJobGraphs):
-        #Make the jobGraph for the job, if necessary
-        if self not in jobsToJobGraphs:
-            jobGraph = self._createEmptyJobGraphForJob(jobStore, predecessorNumber=len(self._directPredecessors))
-            jobsToJobGraphs[self] = jobGraph
-            #Add followOns/children to be run after the current job.
-            for successors in (self._followOns, self._children):
-                jobs = map(lambda successor:
-                    successor._makeJobGraphs2(jobStore, jobsToJobGraphs), successors)
-                jobGraph.stack.append(jobs)
-        else:
-            jobGraph = jobsToJobGraphs[self]
-        #The return is a tuple stored within a job.stack
-        #The tuple is jobStoreID, memory, cores, disk,
-        #The predecessorID is used to establish which predecessors have been
-        #completed before running the given Job - it is just a unique ID
-        #per predecessor
-        return JobNode.fromJobGraph(jobGraph)
+    def _collectSuccessors(self, jobs, visited):
+        """
+        Appends the successors of the job that aren't in the given set to the given list, and
+        their successors, recursively.
+        """
+        for successor in self._followOns + self._children:
+            if successor not in visited:
+                visited.add(successor)
+                jobs.append(successor)
+                successor._collectSuccessors(jobs, visited)
 
     def getTopologicalOrderingOfJobs(self):
         """
@@ -1047,35 +1206,68 @@ class Job(JobLikeObject):
         getRunOrder(self)
         return ordering
 
-    def _serialiseJob(self, jobStore, jobsToJobGraphs, rootJobGraph):
+    def _pickleJob(self):
         """
-        Pickle a job and its jobGraph to disk.
+        Pickle a job so that its run method can be run at a later time.
         """
-        # Pickle the job so that its run method can be run at a later time.
         # Drop out the children/followOns/predecessors/services - which are
         # all recorded within the jobStore and do not need to be stored within
         # the job
         self._children, self._followOns, self._services = [], [], []
         self._directPredecessors, self._promiseJobStore = set(), None
+        # The IDs of the files of the promises the job refers to precede the job, so that the
+        # worker can read them all at once, see _loadJob()
+        Promise.registeredFileIDs = []
+        try:
+            pickledJob = cPickle.dumps(self, cPickle.HIGHEST_PROTOCOL)
+            return cPickle.dumps(Promise.registeredFileIDs, cPickle.HIGHEST_PROTOCOL) + pickledJob
+        finally:
+            Promise.registeredFileIDs = None
+
+    @staticmethod
+    def _serialiseJobs(jobStore, jobsAndJobGraphs, rootJobGraph):
+        """
+        Pickle the given jobs and write them and their jobGraphs to disk.
+
+        :param list jobsAndJobGraphs: a list of (job, jobGraph) pairs. Pickling a job registers
+               the promises it refers to with their promising jobs, so the jobs are pickled in the
+               order of this list.
+        """
+        # The maps of mapped children are written first, so the promises they refer to are
+        # registered with their promising jobs before any of those is pickled
+        childMaps = collections.OrderedDict()
+        for job, _ in jobsAndJobGraphs:
+            if isinstance(job, (MappedJob, ChildMapGatherJob)):
+                childMaps[job.childMap] = None
+        for childMap in childMaps:
+            childMap._write(jobStore, rootJobGraph.jobStoreID)
+        serialiser = jobStore.serialiser
+        pickledJobs = [serialiser.encode(job._pickleJob()) for job, _ in jobsAndJobGraphs
+                       if not isinstance(job, MappedJob)]
         # The pickled job is "run" as the command of the job, see worker
         # for the mechanism which unpickles the job and executes the Job.run
         # method.
-        with jobStore.writeFileStream(rootJobGraph.jobStoreID) as (fileHandle, fileStoreID):
-            cPickle.dump(self, fileHandle, cPickle.HIGHEST_PROTOCOL)
-        # Note that getUserScript() may have been overridden. This is intended. If we used
-        # self.userModule directly, we'd be getting a reference to job.py if the job was
-        # specified as a function (as opposed to a class) since that is where FunctionWrappingJob
-        #  is defined. What we really want is the module that was loaded as __main__,
-        # and FunctionWrappingJob overrides getUserScript() to give us just that. Only then can
-        # filter_main() in _unpickle( ) do its job of resolving any user-defined type or function.
-        userScript = self.getUserScript().globalize()
-        jobsToJobGraphs[self].command = ' '.join(('_toil', fileStoreID) + userScript.toCommand())
-        #Update the status of the jobGraph on disk
-        jobStore.update(jobsToJobGraphs[self])
-
-    def _serialiseServices(self, jobStore, jobGraph, rootJobGraph):
-        """
-        Serialises the services for a job.
+        fileStoreIDs = iter(jobStore.writeFilesMany(pickledJobs, rootJobGraph.jobStoreID))
+        for job, jobGraph in jobsAndJobGraphs:
+            if isinstance(job, MappedJob):
+                jobGraph.command = job.childMap._command(job.index)
+                continue
+            # Note that getUserScript() may have been overridden. This is intended. If we used
+            # self.userModule directly, we'd be getting a reference to job.py if the job was
+            # specified as a function (as opposed to a class) since that is where
+            # FunctionWrappingJob is defined. What we really want is the module that was loaded
+            # as __main__, and FunctionWrappingJob overrides getUserScript() to give us just
+            # that. Only then can filter_main() in _unpickle( ) do its job of resolving any
+            # user-defined type or function.
+            userScript = job.getUserScript().globalize()
+            jobGraph.command = ' '.join(('_toil', next(fileStoreIDs)) + userScript.toCommand())
+        #Update the status of the jobGraphs on disk
+        jobStore.updateMany([jobGraph for _, jobGraph in jobsAndJobGraphs])
+
+    def _serialiseServices(self, jobStore, jobGraph, jobsAndJobGraphs):
+        """
+        Serialises the services for a job. The service jobs are appended to the given list of
+        (job, jobGraph) pairs, for :meth:`_serialiseJobs`.
         """
         def processService(serviceJob, depth):
             # Extend the depth of the services if necessary
@@ -1121,7 +1313,7 @@ class Job(JobLikeObject):
             serviceJob.service = None
 
             # Serialise the service job and job wrapper
-            serviceJob._serialiseJob(jobStore, { serviceJob:serviceJobGraph }, rootJobGraph)
+            jobsAndJobGraphs.append((serviceJob, serviceJobGraph))
 
             # Restore values
             #serviceJob.service = service
@@ -1140,7 +1332,8 @@ class Job(JobLikeObject):
         """
         #Check if the job graph has created
         #any cycles of dependencies or has multiple roots
-        self.checkJobGraphForDeadlocks()
+        if not jobStore.config.disableJobGraphValidation:
+            self.checkJobGraphForDeadlocks()
 
         #Create the jobGraphs for followOns/children
         jobsToJobGraphs = self._makeJobGraphs(jobGraph, jobStore)
@@ -1161,13 +1354,14 @@ class Job(JobLikeObject):
 
         ordering.reverse()
         assert self == ordering[-1]
+        jobsAndJobGraphs = []
         if firstJob:
             #If the first job we serialise all the jobs, including the root job
             for job in ordering:
                 # Pickle the services for the job
-                job._serialiseServices(jobStore, jobsToJobGraphs[job], jobGraph)
+                job._serialiseServices(jobStore, jobsToJobGraphs[job], jobsAndJobGraphs)
                 # Now pickle the job
-                job._serialiseJob(jobStore, jobsToJobGraphs, jobGraph)
+                jobsAndJobGraphs.append((job, jobsToJobGraphs[job]))
         else:
             #We store the return values at this point, because if a return value
             #is a promise from another job, we need to register the promise
@@ -1176,11 +1370,13 @@ class Job(JobLikeObject):
             #Pickle the non-root jobs
             for job in ordering[:-1]:
                 # Pickle the services for the job
-                job._serialiseServices(jobStore, jobsToJobGraphs[job], jobGraph)
+                job._serialiseServices(jobStore, jobsToJobGraphs[job], jobsAndJobGraphs)
                 # Pickle the job itself
-                job._serialiseJob(jobStore, jobsToJobGraphs, jobGraph)
+                jobsAndJobGraphs.append((job, jobsToJobGraphs[job]))
             # Pickle any services for the job
-            self._serialiseServices(jobStore, jobGraph, jobGraph)
+            self._serialiseServices(jobStore, jobGraph, jobsAndJobGraphs)
+        # Write all jobs at once, so that job stores can batch the writes
+        Job._serialiseJobs(jobStore, jobsAndJobGraphs, jobGraph)
 
     def _serialiseFirstJob(self, jobStore):
         """
@@ -1268,11 +1464,13 @@ class Job(JobLikeObject):
                     time=str(time.time() - startTime),
                     clock=str(totalCpuTime - startClock),
                     class_name=self._jobName(),
-                    memory=str(totalMemoryUsage)
+                    memory=str(totalMemoryUsage),
+                    job_name=self.jobName,
+                    disk=str(fileStore.diskUsed)
                 )
             )
 
-    def _runner(self, jobGraph, jobStore, fileStore):
+    def _runner(self, jobGraph, jobStore, fileStore, callCache=None):
         """
         This method actually runs the job, and serialises the next jobs.
 
@@ -1280,12 +1478,19 @@ class Job(JobLikeObject):
         :param class jobStore: Instance of the job store
         :param toil.fileStore.FileStore fileStore: Instance of a Cached on uncached
                filestore
+        :param toil.callCache.CallCache callCache: if given, the return value of the job is
+               taken from this cache instead of running the job, if possible
         :return:
         """
         # Make fileStore available as an attribute during run() ...
         self._fileStore = fileStore
         # ... but also pass it to run() as an argument for backwards compatibility.
-        returnValues = self._run(jobGraph, fileStore)
+        if callCache is None:
+            returnValues = self._run(jobGraph, fileStore)
+        else:
+            returnValues = callCache.run(self, jobGraph, fileStore)
+        # If other attempts to run this job may be running, only the first to get here continues
+        fileStore._claimCommit()
         # Serialize the new jobs defined by the run method to the jobStore
         self._serialiseExistingJob(jobGraph, jobStore, returnValues)
 
@@ -1508,7 +1713,214 @@ class EncapsulatedJob(Job):
         return self.encapsulatedJob.getUserScript()
 
 
+class ChildMap(object):
+    """
+    The children added by :meth:`toil.job.Job.addChildMap`, one for each element of an
+    iterable, which run the same job function on their element.
+
+    Instead of pickling a job for each child, the job serialising the children pickles the
+    function and the keyword arguments shared by the children once and their elements in chunks
+    of up to chunkSize elements, writing one file for each. The command of a child references the
+    chunk of its element and the element's offset in the chunk. All these files are owned by the
+    serialising job, as are the files holding the values of the promises the shared keyword
+    arguments or the elements refer to, since those are read by many children.
+
+    If the map is gathered, a file for the return value of each child is created as well, whose
+    IDs are stored in a column of their own at the start of each chunk. The gather job, a
+    follow-on of the parent of the map, reads them.
+    """
+    commandToken = '_map'
+
+    def __init__(self, fn, iterable, chunkSize, **kwargs):
+        """
+        See :meth:`toil.job.Job.addChildMap`.
+        """
+        if chunkSize < 1:
+            raise ValueError("The chunk size of a map must be positive")
+        if PromisedRequirement.convertPromises(kwargs):
+            raise JobException("The children of a map don't support promised requirements")
+        # The job each child runs, except for the element
+        self.prototype = JobFunctionWrappingJob(fn, **kwargs)
+        self.elements = list(iterable)
+        self.chunkSize = chunkSize
+        self.gatherJob = None
+        template = MappedJob(self, 0)
+        self.children = [template._copy(index) for index in xrange(len(self.elements))]
+        self._sharedFileID = None
+        self._chunkFileIDs = None
+        self._moduleCommand = None
+
+    def rv(self, *path):
+        """
+        Creates a promise of the list of the return values of the children, in the order of
+        their elements, see :func:`toil.job.Job.rv`. The map must be gathered.
+
+        :rtype: toil.job.Promise
+        """
+        if self.gatherJob is None:
+            raise JobException("The return values of the children of a map can only be "
+                               "promised if the map is gathered")
+        return self.gatherJob.rv(*path)
+
+    def _write(self, jobStore, jobStoreID):
+        """
+        Writes the files of the map to the given job store, see the class docstring.
+
+        :param str jobStoreID: the ID of the job serialising the children, which owns the files
+        """
+        numElements = len(self.elements)
+        if self.gatherJob is None:
+            resultFileIDs = [None] * numElements
+        else:
+            sentinel = cPickle.dumps(UnfulfilledPromiseSentinel(str(self.prototype), False),
+                                     cPickle.HIGHEST_PROTOCOL)
+            resultFileIDs = jobStore.writeFilesMany([sentinel] * numElements, jobStoreID)
+        serialiser = jobStore.serialiser
+        contents = [serialiser.encode(self._pickle(self.prototype, jobStoreID))]
+        for start in xrange(0, numElements, self.chunkSize):
+            end = start + self.chunkSize
+            contents.append(serialiser.encode(
+                cPickle.dumps(resultFileIDs[start:end], cPickle.HIGHEST_PROTOCOL) +
+                self._pickle(self.elements[start:end], jobStoreID)))
+        fileIDs = jobStore.writeFilesMany(contents, jobStoreID)
+        self._sharedFileID, self._chunkFileIDs = fileIDs[0], fileIDs[1:]
+        self._moduleCommand = self.prototype.getUserScript().globalize().toCommand()
+
+    def _command(self, index):
+        """
+        Returns the command of the child for the element at the given index. The map must have
+        been written.
+        """
+        chunkIndex, offset = divmod(index, self.chunkSize)
+        return ' '.join(('_toil', self.commandToken, self._sharedFileID,
+                         self._chunkFileIDs[chunkIndex], str(offset)) + self._moduleCommand)
+
+    @staticmethod
+    def _pickle(obj, jobStoreID):
+        """
+        Pickles the given object. The promises it refers to are registered with their promising
+        jobs as when pickling a job, except that the files holding the promised values are owned
+        by the given job, instead of being deleted by the first job reading them.
+        """
+        def persistentID(obj):
+            if isinstance(obj, Promise):
+                return obj.job.registerPromise(obj.path, jobStoreID)[1]
+            return None
+
+        fileHandle = BytesIO()
+        pickler = cPickle.Pickler(fileHandle, cPickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = persistentID
+        pickler.dump(obj)
+        return fileHandle.getvalue()
+
+    @staticmethod
+    def _makeUnpickler(jobStore, userModule, fileHandle):
+        """
+        Returns an unpickler for objects pickled by :meth:`_pickle`, see
+        :meth:`toil.job.Job._makeUnpickler`.
+        """
+        unpickler = Job._makeUnpickler(userModule, fileHandle)
+
+        def persistentLoad(jobStoreFileID):
+            with jobStore.readFileStream(jobStoreFileID) as promiseFileHandle:
+                return Serialiser.loads(promiseFileHandle.read())
+
+        unpickler.persistent_load = persistentLoad
+        return unpickler
+
+    @classmethod
+    def _loadChild(cls, jobStore, userModule, sharedFileID, chunkFileID, offset):
+        """
+        Loads the job run by the child of a map, given the tokens of the child's command, see
+        :meth:`_command`.
+
+        :rtype: toil.job.JobFunctionWrappingJob
+        """
+        offset = int(offset)
+        with jobStore.readFileStream(sharedFileID) as fileHandle:
+            fileHandle = BytesIO(Serialiser.decode(fileHandle.read()))
+        job = cls._makeUnpickler(jobStore, userModule, fileHandle).load()
+        with jobStore.readFileStream(chunkFileID) as fileHandle:
+            fileHandle = BytesIO(Serialiser.decode(fileHandle.read()))
+        unpickler = cls._makeUnpickler(jobStore, userModule, fileHandle)
+        resultFileID = unpickler.load()[offset]
+        job._args = (unpickler.load()[offset],)
+        if resultFileID is not None:
+            job._rvs[()].append(resultFileID)
+        job._config = jobStore.config
+        return job
+
+
+class MappedJob(Job):
+    """
+    A child added by :meth:`toil.job.Job.addChildMap`. It stands in for the job running the
+    function of the map on one element, see :class:`toil.job.ChildMap`, and is never pickled.
+    """
+    def __init__(self, childMap, index):
+        prototype = childMap.prototype
+        Job.__init__(self, memory=prototype._memory, cores=prototype._cores,
+                     disk=prototype._disk, preemptable=prototype._preemptable,
+                     unitName=prototype.unitName, checkpoint=prototype.checkpoint)
+        self.jobName = prototype.jobName
+        self.childMap = childMap
+        self.index = index
+
+    def _copy(self, index):
+        """
+        Returns a copy of this job for the element at the given index, without any successors.
+        This is much faster than constructing the job, which looks up the module of its class.
+        """
+        job = copy.copy(self)
+        job._children, job._followOns, job._services = [], [], []
+        job._directPredecessors = set()
+        job._rvs = collections.defaultdict(list)
+        job.index = index
+        return job
+
+    def rv(self, *path):
+        raise JobException("The return values of the children of a map can only be promised by "
+                           "gathering the map, see Job.addChildMap()")
+
+    def getUserScript(self):
+        return self.childMap.prototype.getUserScript()
+
+
+class ChildMapGatherJob(Job):
+    """
+    The follow-on added by :meth:`toil.job.Job.addChildMap` to gather a map. It returns the list
+    of the return values of the children of the map, in the order of their elements.
+    """
+    def __init__(self, childMap):
+        Job.__init__(self)
+        self.childMap = childMap
+        self.chunkFileIDs = None
+        self.userFunctionModule = childMap.prototype.getUserScript()
+
+    def _pickleJob(self):
+        # The map was written by now and the gather job only needs its chunks
+        self.chunkFileIDs, self.childMap = self.childMap._chunkFileIDs, None
+        return super(ChildMapGatherJob, self)._pickleJob()
+
+    def run(self, fileStore):
+        userModule = self._loadUserModule(self.userFunctionModule)
+        jobStore = fileStore.jobStore
+        results = []
+        for chunkFileID in self.chunkFileIDs:
+            # The IDs of the result files are the first column of the chunk
+            with jobStore.readFileStream(chunkFileID) as fileHandle:
+                resultFileIDs = cPickle.loads(Serialiser.decode(fileHandle.read()))
+            for content in jobStore.readFilesMany(resultFileIDs):
+                content = Serialiser.decode(content)
+                results.append(self._makeUnpickler(userModule, BytesIO(content)).load())
+        return results
+
+    def getUserScript(self):
+        return self.userFunctionModule
+
+
 class ServiceJobNode(JobNode):
+    __slots__ = ('startJobStoreID', 'terminateJobStoreID', 'errorJobStoreID')
+
     def __init__(self, jobStoreID, memory, cores, disk, startJobStoreID, terminateJobStoreID,
                  errorJobStoreID, unitName, jobName, command, predecessorNumber):
         requirements = dict(memory=memory, cores=cores, disk=disk, preemptable=False)
@@ -1642,6 +2054,16 @@ class Promise(object):
     """
     A set of IDs of files containing promised values when we know we won't need them anymore
     """
+
+    registeredFileIDs = None
+    """
+    While a job is being pickled, the IDs of the files registered for the promises it refers to
+    """
+
+    _prefetched = {}
+    """
+    Maps the IDs of the files of the promises the job being unpickled refers to to their content
+    """
     def __init__(self, job, path):
         """
         :param Job job: the job whose return value this promise references
@@ -1662,6 +2084,8 @@ class Promise(object):
         # empty file in the job store if the promise is actually being pickled. This is done so
         # that we do not allocate files for promises that are never used.
         jobStoreLocator, jobStoreFileID = self.job.registerPromise(self.path)
+        if self.registeredFileIDs is not None:
+            self.registeredFileIDs.append(jobStoreFileID)
         # Returning a class object here causes the pickling machinery to attempt to instantiate
         # the class. We will catch that with __new__ and return an the actual return value instead.
         return self.__class__, (jobStoreLocator, jobStoreFileID)
@@ -1676,17 +2100,41 @@ class Promise(object):
             # Attempted instantiation during unpickling, return promised value instead
             return cls._resolve(*args)
 
+    @classmethod
+    @contextmanager
+    def prefetch(cls, jobStore, jobStoreFileIDs):
+        """
+        Reads the given promise files from the given job store at once, for the promises
+        unpickled within the context to be resolved from.
+
+        :param toil.jobStores.abstractJobStore.AbstractJobStore jobStore:
+        :param list[str] jobStoreFileIDs:
+        """
+        # The promises of other jobs in the same workflow use the same job store, too
+        cls._jobstore = jobStore
+        cls._prefetched = dict(zip(jobStoreFileIDs, jobStore.readFilesMany(jobStoreFileIDs)))
+        try:
+            yield
+        finally:
+            cls._prefetched = {}
+
     @classmethod
     def _resolve(cls, jobStoreLocator, jobStoreFileID):
+        cls.filesToDelete.add(jobStoreFileID)
+        try:
+            content = cls._prefetched[jobStoreFileID]
+        except KeyError:
+            pass
+        else:
+            return Serialiser.loads(content)
         # Initialize the cached job store if it was never initialized in the current process or
         # if it belongs to a different workflow that was run earlier in the current process.
         if cls._jobstore is None or cls._jobstore.config.jobStore != jobStoreLocator:
             cls._jobstore = Toil.resumeJobStore(jobStoreLocator)
-        cls.filesToDelete.add(jobStoreFileID)
         with cls._jobstore.readFileStream(jobStoreFileID) as fileHandle:
             # If this doesn't work then the file containing the promise may not exist or be
             # corrupted
-            value = cPickle.load(fileHandle)
+            value = Serialiser.loads(fileHandle.read())
             return value
 
 
@@ -1719,6 +2167,7 @@ class PromisedRequirement(object):
             func = lambda x: x
             args = [valueOrCallable]
 
+        import dill
         self._func = dill.dumps(func)
         self._args = list(args)
 
@@ -1726,6 +2175,7 @@ class PromisedRequirement(object):
         """
         Returns PromisedRequirement value
         """
+        import dill
         func = dill.loads(self._func)
         return func(*self._args)
 
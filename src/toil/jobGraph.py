@@ -26,6 +26,11 @@ class JobGraph(JobNode):
     scripts is persisted separately since it may be much bigger than the state managed by this
     class and should therefore only be held in memory for brief periods of time.
     """
+    __slots__ = ('remainingRetryCount', 'filesToDelete', 'predecessorsFinished', 'stack',
+                 'logJobStoreFileID', 'services', 'terminateJobStoreID', 'startJobStoreID',
+                 'errorJobStoreID', 'checkpoint', 'checkpointFilesToDelete', 'chainedJobs',
+                 'useLearnedRequirements')
+
     def __init__(self, command, memory, cores, disk, unitName, jobName, preemptable,
                  jobStoreID, remainingRetryCount, predecessorNumber,
                  filesToDelete=None, predecessorsFinished=None,
@@ -35,7 +40,8 @@ class JobGraph(JobNode):
                  logJobStoreFileID=None,
                  checkpoint=None,
                  checkpointFilesToDelete=None,
-                 chainedJobs=None):
+                 chainedJobs=None,
+                 useLearnedRequirements=True):
         requirements = {'memory': memory, 'cores': cores, 'disk': disk,
                         'preemptable': preemptable}
         super(JobGraph, self).__init__(command=command,
@@ -95,11 +101,21 @@ class JobGraph(JobNode):
         # this job
         self.chainedJobs = chainedJobs
 
+        # Whether the leader may issue the job with the requirements learned from other jobs of
+        # its class instead of the requested ones, see --learnRequirements. Cleared when the job
+        # fails.
+        self.useLearnedRequirements = useLearnedRequirements
+
+    def __setstate__(self, state):
+        # Job graphs pickled before requirements were learned lack the flag
+        state.setdefault('useLearnedRequirements', True)
+        super(JobGraph, self).__setstate__(state)
+
     def setupJobAfterFailure(self, config):
         """
         Reduce the remainingRetryCount if greater than zero and set the memory
         to be at least as big as the default memory (in case of exhaustion of memory,
-        which is common).
+        which is common). Also stop issuing the job with learned requirements.
         """
         self.remainingRetryCount = max(0, self.remainingRetryCount - 1)
         logger.warn("Due to failure we are reducing the remaining retry count of job %s with ID %s to %s",
@@ -111,6 +127,11 @@ class JobGraph(JobNode):
             self._memory = config.defaultMemory
             logger.warn("We have increased the default memory of the failed job %s to %s bytes",
                         self, self.memory)
+        # The job may have failed because the learned requirements were too low for it
+        if config.learnRequirements and self.useLearnedRequirements:
+            self.useLearnedRequirements = False
+            logger.warn("The failed job %s will be issued with the requirements it requested",
+                        self)
 
     def getLogFileHandle( self, jobStore ):
         """
@@ -22,13 +22,13 @@ from datetime import timedelta
 from uuid import uuid4
 
 # Python 3 compatibility imports
-from six import itervalues
+from six import iteritems, itervalues
 from six.moves.urllib.request import urlopen
 import six.moves.urllib.parse as urlparse
 
-from bd2k.util.retry import retry_http
 
 from toil.fileStore import FileID
+from toil.serialiser import Serialiser
 from toil.job import JobException
 from bd2k.util import memoize
 from bd2k.util.objects import abstractclassmethod
@@ -107,6 +107,9 @@ class AbstractJobStore(object):
     """
     __metaclass__ = ABCMeta
 
+    # Set by useSharedFileCache()
+    __sharedFileCache = None
+
     def __init__(self):
         """
         Create an instance of the job store. The instance will not be fully functional until
@@ -147,11 +150,34 @@ class AbstractJobStore(object):
 
         :raises NoSuchJobStoreException: if the physical storage for this job store doesn't exist
         """
-        with self.readSharedFileStream('config.pickle') as fileHandle:
+        with self.readCachedSharedFileStream('config.pickle') as fileHandle:
             config = cPickle.load(fileHandle)
             assert config.workflowID is not None
             self.__config = config
 
+    def useSharedFileCache(self, sharedFileCache):
+        """
+        Have :meth:`readCachedSharedFileStream`, and therefore :meth:`resume`, read the shared
+        files held by the given node-local cache from the cache. This method should only be invoked
+        on a worker, before :meth:`resume`.
+
+        :param toil.sharedFileCache.SharedFileCache sharedFileCache:
+        """
+        self.__sharedFileCache = sharedFileCache
+
+    def readCachedSharedFileStream(self, sharedFileName):
+        """
+        Like :meth:`readSharedFileStream` but reads the file from the node-local cache passed to
+        :meth:`useSharedFileCache`, if any, and if the cache holds the file. Only use this method
+        for shared files that don't change while the leader is running.
+
+        :param str sharedFileName: A file name matching AbstractJobStore.fileNameRegex, unique within
+               this job store
+        """
+        if self.__sharedFileCache is not None and sharedFileName in self.__sharedFileCache:
+            return self.__sharedFileCache.readSharedFileStream(self, sharedFileName)
+        return self.readSharedFileStream(sharedFileName)
+
     @property
     def config(self):
         """
@@ -161,6 +187,19 @@ class AbstractJobStore(object):
         """
         return self.__config
 
+    # The compression method of the serialiser, unless the workflow configures one
+    defaultCompression = 'none'
+
+    @property
+    def serialiser(self):
+        """
+        The serialiser of the jobs, job graphs and promised values stored in this job store, as
+        configured for the workflow.
+
+        :rtype: toil.serialiser.Serialiser
+        """
+        return Serialiser.fromConfig(self.config, defaultCompression=self.defaultCompression)
+
     rootJobStoreIDFileName = 'rootJobStoreID'
 
     def setRootJob(self, rootJobStoreID):
@@ -418,7 +457,7 @@ class AbstractJobStore(object):
 
     # Cleanup functions
 
-    def clean(self, jobCache=None):
+    def clean(self, jobCache=None, partialJobCache=False):
         """
         Function to cleanup the state of a job store after a restart.
         Fixes jobs that might have been partially updated. Resets the try counts and removes jobs
@@ -427,7 +466,12 @@ class AbstractJobStore(object):
         :param dict[str,toil.jobGraph.JobGraph] jobCache: if a value it must be a dict
                from job ID keys to JobGraph object values. Jobs will be loaded from the cache
                (which can be downloaded from the job store in a batch) instead of piecemeal when
-               recursed into.
+               recursed into. Jobs missing from the cache are loaded from the job store and added
+               to it.
+
+        :param bool partialJobCache: whether the jobCache may lack some of the jobs in the job
+               store. If so, the jobs to remove are found among the IDs listed by
+               :meth:`jobStoreIDs`, and only those are loaded from the job store.
         """
         if jobCache is None:
             logger.warning("Cleaning jobStore recursively. This may be slow.")
@@ -439,7 +483,8 @@ class AbstractJobStore(object):
                 try:
                     return jobCache[jobId]
                 except KeyError:
-                    self.load(jobId)
+                    jobGraph = jobCache[jobId] = self.load(jobId)
+                    return jobGraph
             else:
                 return self.load(jobId)
 
@@ -453,10 +498,21 @@ class AbstractJobStore(object):
                 return self.exists(jobId)
 
         def getJobs():
-            if jobCache is not None:
-                return itervalues(jobCache)
-            else:
+            if jobCache is None:
                 return self.jobs()
+            elif partialJobCache:
+                return getUnreachableJobs()
+            else:
+                return itervalues(jobCache)
+
+        def getUnreachableJobs():
+            for jobStoreID in self.jobStoreIDs():
+                if jobStoreID not in reachableFromRoot:
+                    try:
+                        yield jobCache[jobStoreID] if jobStoreID in jobCache else self.load(jobStoreID)
+                    except NoSuchJobException:
+                        # An orphaned job may be incomplete, like in jobs()
+                        pass
 
         # Iterate from the root jobGraph and collate all jobs that are reachable from it
         # All other jobs returned by self.jobs() are orphaned and can be removed
@@ -622,6 +678,18 @@ class AbstractJobStore(object):
         """
         raise NotImplementedError()
 
+    def createMany(self, jobNodes):
+        """
+        Like :meth:`create` but for several job nodes at once. Job stores that can create jobs in
+        fewer round trips than one per job should override this method.
+
+        :param list[toil.job.JobNode] jobNodes: the job nodes to create job graphs from
+
+        :return: the created job graphs, in the order of the given job nodes
+        :rtype: list[toil.jobGraph.JobGraph]
+        """
+        return [self.create(jobNode) for jobNode in jobNodes]
+
     @abstractmethod
     def exists(self, jobStoreID):
         """
@@ -689,6 +757,18 @@ class AbstractJobStore(object):
         """
         raise NotImplementedError()
 
+    def updateMany(self, jobs):
+        """
+        Like :meth:`update` but for several jobs at once. Each job is persisted atomically but
+        the batch as a whole isn't, i.e. if this method fails, some of the jobs may have been
+        written. Job stores that can write jobs in fewer round trips than one per job should
+        override this method.
+
+        :param list[toil.jobGraph.JobGraph] jobs: the jobs to write to this job store
+        """
+        for job in jobs:
+            self.update(job)
+
     @abstractmethod
     def delete(self, jobStoreID):
         """
@@ -715,6 +795,17 @@ class AbstractJobStore(object):
         """
         raise NotImplementedError()
 
+    def jobStoreIDs(self):
+        """
+        Best effort attempt to return an iterator on the IDs of all jobs in the store, with the
+        same caveats as :meth:`jobs`. Job stores that can list the IDs of their jobs without
+        loading the jobs should override this.
+
+        :rtype: Iterator[str]
+        """
+        for jobGraph in self.jobs():
+            yield jobGraph.jobStoreID
+
     ##########################################
     # The following provide an way of creating/reading/writing/updating files
     # associated with a given job.
@@ -772,6 +863,28 @@ class AbstractJobStore(object):
         """
         raise NotImplementedError()
 
+    def writeFilesMany(self, contents, jobStoreID=None):
+        """
+        Writes each of the given strings to a new file in this job store. Job stores that can
+        write files in fewer round trips than one per file should override this method.
+
+        :param list[str] contents: the content of each file
+
+        :param str jobStoreID: the id of a job, or None. If specified, the files will be
+               associated with that job, see :meth:`writeFileStream`.
+
+        :raise NoSuchJobException: if the job specified via jobStoreID does not exist
+
+        :return: the IDs of the new files, in the order of the given contents
+        :rtype: list[str]
+        """
+        jobStoreFileIDs = []
+        for content in contents:
+            with self.writeFileStream(jobStoreID) as (fileHandle, jobStoreFileID):
+                fileHandle.write(content)
+            jobStoreFileIDs.append(jobStoreFileID)
+        return jobStoreFileIDs
+
     @abstractmethod
     def getEmptyFileStoreID(self, jobStoreID=None):
         """
@@ -814,6 +927,24 @@ class AbstractJobStore(object):
         """
         raise NotImplementedError()
 
+    def readFilesMany(self, jobStoreFileIDs):
+        """
+        Reads the content of each of the given files. Job stores that can read files in fewer
+        round trips than one per file should override this method.
+
+        :param list[str] jobStoreFileIDs: the IDs of the files to read
+
+        :raise NoSuchFileException: if any of the files does not exist
+
+        :return: the content of each file, in the order of the given IDs
+        :rtype: list[str]
+        """
+        contents = []
+        for jobStoreFileID in jobStoreFileIDs:
+            with self.readFileStream(jobStoreFileID) as fileHandle:
+                contents.append(fileHandle.read())
+        return contents
+
     @abstractmethod
     def deleteFile(self, jobStoreFileID):
         """
@@ -869,6 +1000,22 @@ class AbstractJobStore(object):
         """
         raise NotImplementedError()
 
+    def updateFilesMany(self, contents):
+        """
+        Replaces the content of each of the given files that exists, skipping those that don't.
+        Job stores that can update files in fewer round trips than one or two per file should
+        override this method.
+
+        :param dict[str,str] contents: maps the IDs of the files to update to their new content
+
+        :raise ConcurrentFileModificationException: if a file was modified concurrently during
+               an invocation of this method
+        """
+        for jobStoreFileID, content in iteritems(contents):
+            if self.fileExists(jobStoreFileID):
+                with self.updateFileStream(jobStoreFileID) as fileHandle:
+                    fileHandle.write(content)
+
     ##########################################
     # The following methods deal with shared files, i.e. files not associated
     # with specific jobs.
@@ -908,6 +1055,18 @@ class AbstractJobStore(object):
         """
         raise NotImplementedError()
 
+    def deleteSharedFile(self, sharedFileName):
+        """
+        Deletes the global file referenced by the given name, if it exists. Job stores that don't
+        implement this leave shared files behind until the job store is destroyed.
+
+        :param str sharedFileName: A file name matching AbstractJobStore.fileNameRegex, unique within
+               this job store
+
+        :raise NotImplementedError: if this job store can't delete shared files
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     def writeStatsAndLogging(self, statsAndLoggingString):
         """
@@ -944,6 +1103,49 @@ class AbstractJobStore(object):
         """
         raise NotImplementedError()
 
+    ##########################################
+    # The following methods deal with concurrent access to the job store
+    ##########################################
+
+    @classmethod
+    def supportsConcurrentAccess(cls):
+        """
+        Whether several threads may call the methods of one instance of this class at once. The
+        leader only loads and updates jobs concurrently in job stores that support it. All job
+        stores that come with Toil do, subclasses that aren't thread-safe should override this.
+
+        :rtype: bool
+        """
+        return True
+
+    ##########################################
+    # The following methods arbitrate between concurrent attempts to run the same job
+    ##########################################
+
+    @classmethod
+    def supportsJobCommitClaims(cls):
+        """
+        Whether this job store implements claimJobCommit(), which the leader needs in order to
+        run several attempts of the same job concurrently.
+
+        :rtype: bool
+        """
+        return False
+
+    def claimJobCommit(self, jobStoreID, claimToken):
+        """
+        Atomically claims the right to change the given job, and any state shared with other
+        attempts to run it, for the attempt that calls this method first with the given token.
+        All attempts to run the same issue of a job use the same token.
+
+        :param str jobStoreID: the ID of the job
+        :param str claimToken: identifies the issue of the job the attempts belong to
+        :return: True if the claim was made, False if it was made before or the job no longer
+                 exists
+        :rtype: bool
+        """
+        raise NotImplementedError()
+
     ## Helper methods for subclasses
 
     def _defaultTryCount(self):
@@ -970,6 +1172,7 @@ class JobStoreSupport(AbstractJobStore):
     def getSize(cls, url):
         if url.scheme.lower() == 'ftp':
             return None
+        from bd2k.util.retry import retry_http
         for attempt in retry_http():
             with attempt:
                 with closing(urlopen(url.geturl())) as readable:
@@ -978,6 +1181,7 @@ class JobStoreSupport(AbstractJobStore):
 
     @classmethod
     def _readFromUrl(cls, url, writable):
+        from bd2k.util.retry import retry_http
         for attempt in retry_http():
             with attempt:
                 with closing(urlopen(url.geturl())) as readable:
@@ -26,8 +26,8 @@ import hashlib
 import itertools
 
 # Python 3 compatibility imports
-from six.moves import xrange, cPickle, StringIO, reprlib
-from six import iteritems
+from six.moves import xrange, StringIO, reprlib
+from six import iteritems, itervalues
 
 from bd2k.util import strict_bool
 from bd2k.util.exceptions import panic
@@ -58,8 +58,9 @@ from toil.jobStores.aws.utils import (SDBHelper,
                                       retry_s3,
                                       bucket_location_to_region,
                                       region_to_bucket_location)
-from toil.jobStores.utils import WritablePipe, ReadablePipe
+from toil.jobStores.utils import WritablePipe, ReadablePipe, splitIntoBatches
 from toil.jobGraph import JobGraph
+from toil.serialiser import Serialiser
 import toil.lib.encryption as encryption
 
 log = logging.getLogger(__name__)
@@ -158,6 +159,9 @@ class AWSJobStore(AbstractJobStore):
     #
     bucketNameRe = re.compile(r'^[a-z0-9][a-z0-9-]+[a-z0-9]$')
 
+    # SDB items are limited in size, and jobs were always compressed before they were serialised
+    defaultCompression = 'zlib'
+
     # See http://docs.aws.amazon.com/AmazonS3/latest/dev/BucketRestrictions.html
     #
     minBucketNameLen = 3
@@ -313,9 +317,17 @@ class AWSJobStore(AbstractJobStore):
         job = AWSJob.fromJobNode(jobNode, jobStoreID=jobStoreID, tryCount=self._defaultTryCount())
         for attempt in retry_sdb():
             with attempt:
-                assert self.jobsDomain.put_attributes(*job.toItem())
+                assert self.jobsDomain.put_attributes(*job.toItem(self.serialiser))
         return job
 
+    def createMany(self, jobNodes):
+        jobs = [AWSJob.fromJobNode(jobNode, jobStoreID=self._newJobID(),
+                                   tryCount=self._defaultTryCount())
+                for jobNode in jobNodes]
+        log.debug("Creating %i jobs", len(jobs))
+        self._batchPutItems(self.jobsDomain, [job.toItem(self.serialiser) for job in jobs])
+        return jobs
+
     def exists(self, jobStoreID):
         for attempt in retry_sdb():
             with attempt:
@@ -335,6 +347,17 @@ class AWSJobStore(AbstractJobStore):
         for jobItem in result:
             yield AWSJob.fromItem(jobItem)
 
+    def jobStoreIDs(self):
+        result = None
+        for attempt in retry_sdb():
+            with attempt:
+                result = list(self.jobsDomain.select(
+                    consistent_read=True,
+                    query="select itemName() from `%s`" % self.jobsDomain.name))
+        assert result is not None
+        for jobItem in result:
+            yield jobItem.name
+
     def load(self, jobStoreID):
         item = None
         for attempt in retry_sdb():
@@ -352,7 +375,35 @@ class AWSJobStore(AbstractJobStore):
         log.debug("Updating job %s", job.jobStoreID)
         for attempt in retry_sdb():
             with attempt:
-                assert self.jobsDomain.put_attributes(*job.toItem())
+                assert self.jobsDomain.put_attributes(*job.toItem(self.serialiser))
+
+    def updateMany(self, jobs):
+        log.debug("Updating %i jobs", len(jobs))
+        self._batchPutItems(self.jobsDomain, [job.toItem(self.serialiser) for job in jobs])
+
+    itemsPerBatchPut = 25
+
+    # SDB limits the size of a BatchPutAttributes request to 1MB. Attribute values are URL-encoded
+    # in the request, the rest of the budget is left for that.
+    bytesPerBatchPut = 512 * 1024
+
+    def _batchPutItems(self, domain, items):
+        """
+        Writes the given items to the given domain, in as few BatchPutAttributes requests as SDB
+        allows. Unlike put_attributes(), this does not support conditional writes.
+
+        :param Domain domain: the domain to write the items to
+        :param list[(str,dict)] items: the name and the attributes of each item
+        """
+        def itemSize(item):
+            itemName, attributes = item
+            return len(itemName) + sum(len(k) + len(str(v)) for k, v in iteritems(attributes))
+
+        for batch in splitIntoBatches(items, self.itemsPerBatchPut, self.bytesPerBatchPut,
+                                      itemSize):
+            for attempt in retry_sdb():
+                with attempt:
+                    assert domain.batch_put_attributes(dict(batch))
 
     itemsPerBatchDelete = 25
 
@@ -522,6 +573,64 @@ class AWSJobStore(AbstractJobStore):
         info.save()
         log.debug("Wrote %r.", info)
 
+    def writeFilesMany(self, contents, jobStoreID=None):
+        infos = [self.FileInfo.create(jobStoreID) for _ in contents]
+        uploads = []
+        for info, content in zip(infos, contents):
+            if len(content) <= info._maxInlinedSize():
+                info.content = content
+            else:
+                uploads.append((info, content))
+        if uploads:
+            def upload(info, content):
+                with info.uploadStream(multipart=len(content) > self.partSize) as writable:
+                    writable.write(content)
+
+            self._mapConcurrently(upload, *zip(*uploads))
+        # The files are new so, unlike FileInfo.save(), there is no previous version to check for
+        # or clean up
+        self._batchPutItems(self.filesDomain, [(info.fileID, info.toItem()[0]) for info in infos])
+        log.debug("Wrote %i files.", len(infos))
+        return [info.fileID for info in infos]
+
+    def _mapConcurrently(self, fn, *iterables):
+        """
+        Like map(), but calls the given function in a pool of threads.
+        """
+        numCalls = min(map(len, iterables))
+        if numCalls == 0:
+            return []
+        # Like in copyKeyMultipart(), the threads just block, waiting on the server
+        with ThreadPoolExecutor(max_workers=min(cpu_count() * 16, numCalls, 128)) as executor:
+            return list(executor.map(fn, *iterables))
+
+    # SDB limits the number of comparisons in a Select expression to 20
+    itemsPerSelect = 20
+
+    def _loadFileInfos(self, jobStoreFileIDs):
+        """
+        Loads the info of each of the given files, with as few Select requests as SDB allows.
+
+        :param list[str] jobStoreFileIDs:
+        :return: maps the IDs of the files that exist to their info
+        :rtype: dict[str,AWSJobStore.FileInfo]
+        """
+        infos = {}
+        for start in xrange(0, len(jobStoreFileIDs), self.itemsPerSelect):
+            batch = jobStoreFileIDs[start:start + self.itemsPerSelect]
+            query = "select * from `%s` where itemName() in (%s)" % (
+                self.filesDomain.name, ', '.join("'%s'" % fileID for fileID in batch))
+            items = None
+            for attempt in retry_sdb():
+                with attempt:
+                    items = list(self.filesDomain.select(consistent_read=True, query=query))
+            assert items is not None
+            for item in items:
+                info = self.FileInfo.fromItem(item)
+                if info is not None:
+                    infos[info.fileID] = info
+        return infos
+
     @contextmanager
     def writeSharedFileStream(self, sharedFileName, isProtected=None):
         assert self._validateSharedFileName(sharedFileName)
@@ -547,6 +656,17 @@ class AWSJobStore(AbstractJobStore):
         info.save()
         log.debug("Wrote %r from stream.", info)
 
+    def updateFilesMany(self, contents):
+        infos = self._loadFileInfos(list(contents))
+
+        def update(info):
+            with info.uploadStream() as writable:
+                writable.write(contents[info.fileID])
+            info.save()
+
+        self._mapConcurrently(update, list(itervalues(infos)))
+        log.debug("Updated %i files.", len(infos))
+
     def fileExists(self, jobStoreFileID):
         return self.FileInfo.exists(jobStoreFileID)
 
@@ -562,6 +682,25 @@ class AWSJobStore(AbstractJobStore):
         with info.downloadStream() as readable:
             yield readable
 
+    def readFilesMany(self, jobStoreFileIDs):
+        infos = self._loadFileInfos(jobStoreFileIDs)
+        for jobStoreFileID in jobStoreFileIDs:
+            if jobStoreFileID not in infos:
+                raise NoSuchFileException(jobStoreFileID)
+        contents = {fileID: info.content for fileID, info in iteritems(infos)
+                    if info.content is not None}
+
+        def download(info):
+            with info.downloadStream() as readable:
+                return readable.read()
+
+        # Inlined files were read along with their info, the others are in S3
+        downloads = [info for info in itervalues(infos) if info.content is None]
+        contents.update(zip((info.fileID for info in downloads),
+                            self._mapConcurrently(download, downloads)))
+        log.debug("Read %i files.", len(infos))
+        return [contents[jobStoreFileID] for jobStoreFileID in jobStoreFileIDs]
+
     @contextmanager
     def readSharedFileStream(self, sharedFileName):
         assert self._validateSharedFileName(sharedFileName)
@@ -571,6 +710,10 @@ class AWSJobStore(AbstractJobStore):
         with info.downloadStream() as readable:
             yield readable
 
+    def deleteSharedFile(self, sharedFileName):
+        assert self._validateSharedFileName(sharedFileName)
+        self.deleteFile(self._sharedFileID(sharedFileName))
+
     def deleteFile(self, jobStoreFileID):
         info = self.FileInfo.load(jobStoreFileID)
         if info is None:
@@ -1347,6 +1490,7 @@ class AWSJob(JobGraph, SDBHelper):
     """
     A Job that can be converted to and from an SDB item.
     """
+    __slots__ = ()
 
     @classmethod
     def fromItem(cls, item):
@@ -1356,19 +1500,22 @@ class AWSJob(JobGraph, SDBHelper):
         """
         binary, _ = cls.attributesToBinary(item)
         assert binary is not None
-        return cPickle.loads(binary)
+        return Serialiser.loads(binary)
 
-    def toItem(self):
+    def toItem(self, serialiser):
         """
         To to a peculiarity of Boto's SDB bindings, this method does not return an Item,
         but a tuple. The returned tuple can be used with put_attributes like so
 
         domain.put_attributes( *toItem(...) )
 
+        :param toil.serialiser.Serialiser serialiser: the serialiser of the job store, which
+               compresses the job if so configured
+
         :rtype: (str,dict)
         :return: a str for the item's name and a dictionary for the item's attributes
         """
-        return self.jobStoreID, self.binaryToAttributes(cPickle.dumps(self, protocol=cPickle.HIGHEST_PROTOCOL))
+        return self.jobStoreID, self.binaryToAttributes(serialiser.dumps(self), compress=False)
 
 
 class BucketLocationConflictException(Exception):
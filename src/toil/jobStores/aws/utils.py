@@ -81,6 +81,9 @@ class SDBHelper(object):
     # requests to fail signature verification, resulting in a 403. We therefore have to
     # base64-encode values ourselves even if that means we loose a quarter of capacity.
 
+    # A mixin, so don't force an instance dict onto classes that otherwise have none
+    __slots__ = ()
+
     maxAttributesPerItem = 256
     maxValueSize = 1024
     maxRawValueSize = maxValueSize * 3 / 4
@@ -109,13 +112,17 @@ class SDBHelper(object):
         return cls._maxChunks() * cls.maxValueSize
 
     @classmethod
-    def binaryToAttributes(cls, binary):
+    def binaryToAttributes(cls, binary, compress=True):
+        """
+        :param bool compress: whether to compress the binary data, pass False for data that is
+               compressed already
+        """
         if binary is None: return {}
         assert len(binary) <= cls.maxBinarySize()
         # The use of compression is just an optimization. We can't include it in the maxValueSize
         # computation because the compression ratio depends on the input.
-        compressed = bz2.compress(binary)
-        if len(compressed) > len(binary):
+        compressed = bz2.compress(binary) if compress else None
+        if compressed is None or len(compressed) > len(binary):
             compressed = 'U' + binary
         else:
             compressed = 'C' + compressed
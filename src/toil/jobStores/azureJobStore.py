@@ -26,7 +26,6 @@ from contextlib import contextmanager
 from datetime import datetime, timedelta
 
 # Python 3 compatibility imports
-from six.moves import cPickle
 from six.moves.http_client import HTTPException
 from six.moves.configparser import RawConfigParser, NoOptionError
 
@@ -42,8 +41,9 @@ from bd2k.util import strict_bool, memoize
 from bd2k.util.exceptions import panic
 from bd2k.util.retry import retry
 
-from toil.jobStores.utils import WritablePipe, ReadablePipe
+from toil.jobStores.utils import WritablePipe, ReadablePipe, splitIntoBatches
 from toil.jobGraph import JobGraph
+from toil.serialiser import Serialiser
 from toil.jobStores.abstractJobStore import (AbstractJobStore,
                                              NoSuchJobException,
                                              ConcurrentFileModificationException,
@@ -100,6 +100,10 @@ class AzureJobStore(AbstractJobStore):
     #
     containerNameRe = re.compile(r'^[a-z0-9](-?[a-z0-9]+)+[a-z0-9]$')
 
+    # Table entities and entity group transactions are limited in size, and jobs were always
+    # compressed before they were serialised
+    defaultCompression = 'zlib'
+
     # See https://msdn.microsoft.com/en-us/library/azure/dd135715.aspx
     #
     minContainerNameLen = 3
@@ -228,11 +232,17 @@ class AzureJobStore(AbstractJobStore):
     def create(self, jobNode):
         jobStoreID = self._newJobID()
         job = AzureJob.fromJobNode(jobNode, jobStoreID, self._defaultTryCount())
-        entity = job.toItem(chunkSize=self.jobChunkSize)
+        entity = job.toItem(self.serialiser, chunkSize=self.jobChunkSize)
         entity['RowKey'] = jobStoreID
         self.jobItems.insert_entity(entity=entity)
         return job
 
+    def createMany(self, jobNodes):
+        jobs = [AzureJob.fromJobNode(jobNode, self._newJobID(), self._defaultTryCount())
+                for jobNode in jobNodes]
+        self._batchEntities(self.jobItems, 'insert_entity', map(self._jobToEntity, jobs))
+        return jobs
+
     def exists(self, jobStoreID):
         if self.jobItems.get_entity(row_key=jobStoreID) is None:
             return False
@@ -246,7 +256,15 @@ class AzureJobStore(AbstractJobStore):
 
     def update(self, job):
         self.jobItems.update_entity(row_key=job.jobStoreID,
-                                    entity=job.toItem(chunkSize=self.jobChunkSize))
+                                    entity=job.toItem(self.serialiser, chunkSize=self.jobChunkSize))
+
+    def updateMany(self, jobs):
+        self._batchEntities(self.jobItems, 'update_entity', map(self._jobToEntity, jobs))
+
+    def _jobToEntity(self, job):
+        entity = job.toItem(self.serialiser, chunkSize=self.jobChunkSize)
+        entity['RowKey'] = job.jobStoreID
+        return entity
 
     def delete(self, jobStoreID):
         try:
@@ -368,6 +386,32 @@ class AzureJobStore(AbstractJobStore):
             yield fd, jobStoreFileID
         self._associateFileWithJob(jobStoreFileID, jobStoreID)
 
+    def writeFilesMany(self, contents, jobStoreID=None):
+        encrypted = self.keyPath is not None
+        maxBlockSize = self._maxAzureBlockBytes
+        if encrypted:
+            maxBlockSize -= encryption.overhead
+        jobStoreFileIDs = []
+        for content in contents:
+            jobStoreFileID = self._newFileID()
+            if len(content) <= maxBlockSize:
+                # A single request instead of one for the block and one for the block list
+                if encrypted:
+                    content = encryption.encrypt(content, self.keyPath)
+                self.files.put_blob(blob_name=jobStoreFileID, blob=content,
+                                    x_ms_blob_type='BlockBlob',
+                                    x_ms_meta_name_values=dict(encrypted=str(encrypted)))
+            else:
+                with self._uploadStream(jobStoreFileID, self.files) as fd:
+                    fd.write(content)
+            jobStoreFileIDs.append(jobStoreFileID)
+        if jobStoreID is not None:
+            # The files of a job share a partition of the table, see _associateFileWithJob()
+            self._batchEntities(self.jobFileIDs, 'insert_entity',
+                                [{'PartitionKey': jobStoreID, 'RowKey': jobStoreFileID}
+                                 for jobStoreFileID in jobStoreFileIDs])
+        return jobStoreFileIDs
+
     @contextmanager
     def updateFileStream(self, jobStoreFileID):
         with self._uploadStream(jobStoreFileID, self.files, checkForModification=True) as fd:
@@ -405,6 +449,10 @@ class AzureJobStore(AbstractJobStore):
         with self._downloadStream(sharedFileID, self.files) as fd:
             yield fd
 
+    def deleteSharedFile(self, sharedFileName):
+        assert self._validateSharedFileName(sharedFileName)
+        self.deleteFile(self._newFileID(sharedFileName))
+
     def writeStatsAndLogging(self, statsAndLoggingString):
         # TODO: would be a great use case for the append blobs, once implemented in the Azure SDK
         jobStoreFileID = self._newFileID()
@@ -487,6 +535,32 @@ class AzureJobStore(AbstractJobStore):
             jobStoreID = entities[0].PartitionKey
             self.jobFileIDs.delete_entity(partition_key=jobStoreID, row_key=jobStoreFileID)
 
+    # See https://msdn.microsoft.com/en-us/library/azure/dd894038.aspx. A transaction may hold up
+    # to 4MB, binary properties are base64-encoded in the request.
+    entitiesPerBatch = 100
+    bytesPerBatch = 2 * 1024 * 1024
+
+    def _batchEntities(self, table, operation, entities):
+        """
+        Applies the given operation to each of the given entities, in as few entity group
+        transactions as possible. All entities must be in the same partition of the table.
+
+        :param AzureTable table: the table holding the entities
+        :param str operation: the name of a TableService method taking an entity, e.g.
+               'insert_entity'
+        :param list[dict] entities: the entities
+        """
+        def entitySize(entity):
+            return sum(len(value.value) if isinstance(value, EntityProperty) else len(str(value))
+                       for value in entity.values())
+
+        # The table service collects the operations of a transaction until it is committed. A
+        # service of our own keeps those of other threads using this job store out of it.
+        tableService = TableService(account_key=self.accountKey, account_name=self.accountName)
+        for batch in splitIntoBatches(entities, self.entitiesPerBatch, self.bytesPerBatch,
+                                      entitySize):
+            table.batch(tableService, operation, batch)
+
     def _bindTable(self, tableName, create=False):
         for attempt in retry_azure():
             with attempt:
@@ -679,6 +753,41 @@ class AzureTable(object):
 
         return f
 
+    # The operations a batch is retried with, if the batch may have been committed by an attempt
+    # that failed, e.g. one whose response was lost. Inserting an entity twice is a conflict.
+    _retriedOperations = {'insert_entity': 'insert_or_replace_entity'}
+
+    def batch(self, tableService, name, entities):
+        """
+        Invokes the TableService method of the given name for each of the given entities, in a
+        single entity group transaction.
+
+        :param TableService tableService: the service to make the transaction with, it must not
+               be used for anything else concurrently
+        """
+        for entity in entities:
+            if 'PartitionKey' not in entity:
+                entity['PartitionKey'] = self.defaultPartition
+        for attemptNumber, attempt in enumerate(retry_azure()):
+            with attempt:
+                if attemptNumber > 0:
+                    name = self._retriedOperations.get(name, name)
+                function = getattr(tableService, name)
+                funcArgs, _, _, _ = inspect.getargspec(function)
+                tableService.begin_batch()
+                try:
+                    for entity in entities:
+                        kwargs = dict(table_name=self.tableName, entity=entity)
+                        if 'partition_key' in funcArgs:
+                            kwargs['partition_key'] = entity['PartitionKey']
+                        if 'row_key' in funcArgs:
+                            kwargs['row_key'] = entity['RowKey']
+                        function(**kwargs)
+                except:
+                    with panic(log=logger):
+                        tableService.cancel_batch()
+                tableService.commit_batch()
+
     def get_entity(self, **kwargs):
         try:
             return self.__getattr__('get_entity')(**kwargs)
@@ -759,6 +868,7 @@ class AzureJob(JobGraph):
     Copied almost entirely from AWSJob, except to take into account the
     fact that Azure properties must start with a letter or underscore.
     """
+    __slots__ = ()
 
     defaultAttrs = ['PartitionKey', 'RowKey', 'etag', 'Timestamp']
 
@@ -786,17 +896,21 @@ class AzureJob(JobGraph):
             wholeJobString = chunkedJob[0][1].value
         else:
             wholeJobString = ''.join(item[1].value for item in chunkedJob)
-        return cPickle.loads(bz2.decompress(wholeJobString))
+        if not wholeJobString.startswith(Serialiser.magic):
+            # Jobs written before the serialiser was introduced were always compressed with bz2
+            wholeJobString = bz2.decompress(wholeJobString)
+        return Serialiser.loads(wholeJobString)
 
-    def toItem(self, chunkSize=maxAzureTablePropertySize):
+    def toItem(self, serialiser, chunkSize=maxAzureTablePropertySize):
         """
+        :param toil.serialiser.Serialiser serialiser: the serialiser of the job store
         :param chunkSize: the size of a chunk for splitting up the serialized job into chunks
         that each fit into a property value of the an Azure table entity
         :rtype: dict
         """
         assert chunkSize <= maxAzureTablePropertySize
         item = {}
-        serializedAndEncodedJob = bz2.compress(cPickle.dumps(self, protocol=cPickle.HIGHEST_PROTOCOL))
+        serializedAndEncodedJob = serialiser.dumps(self)
         jobChunks = [serializedAndEncodedJob[i:i + chunkSize]
                      for i in range(0, len(serializedAndEncodedJob), chunkSize)]
         for attributeOrder, chunk in enumerate(jobChunks):
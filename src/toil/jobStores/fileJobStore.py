@@ -16,7 +16,6 @@ from __future__ import absolute_import
 
 from contextlib import contextmanager
 import logging
-import pickle as pickler
 import random
 import shutil
 import os
@@ -37,6 +36,7 @@ from toil.jobStores.abstractJobStore import (AbstractJobStore,
                                              JobStoreExistsException,
                                              NoSuchJobStoreException)
 from toil.jobGraph import JobGraph
+from toil.serialiser import Serialiser
 
 logger = logging.getLogger( __name__ )
 
@@ -60,6 +60,8 @@ class FileJobStore(AbstractJobStore):
         logger.debug("Path to job store directory is '%s'.", self.jobStoreDir)
         # Directory where temporary files go
         self.tempFilesDir = os.path.join(self.jobStoreDir, 'tmp')
+        # The directories in the hierarchy below self.tempFilesDir that are known to exist
+        self._tempSharedDirs = set()
 
     def initialize(self, config):
         try:
@@ -81,6 +83,7 @@ class FileJobStore(AbstractJobStore):
     def destroy(self):
         if os.path.exists(self.jobStoreDir):
             shutil.rmtree(self.jobStoreDir)
+        self._tempSharedDirs.clear()
 
     ##########################################
     # The following methods deal with creating/loading/updating/writing/checking for the
@@ -88,10 +91,10 @@ class FileJobStore(AbstractJobStore):
     ########################################## 
 
     def create(self, jobNode):
-        # The absolute path to the job directory.
+        # The absolute path to the job directory. Most jobs never have files associated with them,
+        # the pickles of new jobs are associated with the job that created them, so the sub
+        # directory holding such files is created by _getTempFile() when the first one is written.
         absJobDir = tempfile.mkdtemp(prefix="job", dir=self._getTempSharedDir())
-        # Sub directory to put temporary files associated with the job in
-        os.mkdir(os.path.join(absJobDir, "g"))
         # Make the job
         job = JobGraph.fromJobNode(jobNode, jobStoreID=self._getRelativePath(absJobDir),
                                    tryCount=self._defaultTryCount())
@@ -121,8 +124,8 @@ class FileJobStore(AbstractJobStore):
         self._checkJobStoreId(jobStoreID)
         # Load a valid version of the job
         jobFile = self._getJobFileName(jobStoreID)
-        with open(jobFile, 'r') as fileHandle:
-            job = pickler.load(fileHandle)
+        with open(jobFile, 'rb') as fileHandle:
+            job = Serialiser.loads(fileHandle.read())
         # The following cleans up any issues resulting from the failure of the
         # job during writing by the batch system.
         if os.path.isfile(jobFile + ".new"):
@@ -136,8 +139,8 @@ class FileJobStore(AbstractJobStore):
         # The file is then moved to its correct path.
         # Atomicity guarantees use the fact the underlying file systems "move"
         # function is atomic.
-        with open(self._getJobFileName(job.jobStoreID) + ".new", 'w') as f:
-            pickler.dump(job, f)
+        with open(self._getJobFileName(job.jobStoreID) + ".new", 'wb') as f:
+            f.write(self.serialiser.dumps(job))
         # This should be atomic for the file system
         os.rename(self._getJobFileName(job.jobStoreID) + ".new", self._getJobFileName(job.jobStoreID))
 
@@ -158,6 +161,12 @@ class FileJobStore(AbstractJobStore):
                         # An orphaned job may leave an empty or incomplete job file which we can safely ignore
                         pass
 
+    def jobStoreIDs(self):
+        for tempDir in self._tempDirectories():
+            for i in os.listdir(tempDir):
+                if i.startswith( 'job' ):
+                    yield self._getRelativePath(os.path.join(tempDir, i))
+
     ##########################################
     # Functions that deal with temporary files associated with jobs
     ##########################################
@@ -225,6 +234,18 @@ class FileJobStore(AbstractJobStore):
             yield f, self._getRelativePath(absPath)
         os.close(fd)  # Close the os level file descriptor
 
+    def writeFilesMany(self, contents, jobStoreID=None):
+        if jobStoreID is not None:
+            self._checkJobStoreId(jobStoreID)
+        jobStoreFileIDs = []
+        for content in contents:
+            # The job was checked above, for the whole batch
+            fd, absPath = self._getTempFile(jobStoreID, checkJob=False)
+            with os.fdopen(fd, 'w') as f:
+                f.write(content)
+            jobStoreFileIDs.append(self._getRelativePath(absPath))
+        return jobStoreFileIDs
+
     def getEmptyFileStoreID(self, jobStoreID=None):
         with self.writeFileStream(jobStoreID) as (fileHandle, jobStoreFileID):
             return jobStoreFileID
@@ -309,6 +330,14 @@ class FileJobStore(AbstractJobStore):
             else:
                 raise
 
+    def deleteSharedFile(self, sharedFileName):
+        assert self._validateSharedFileName( sharedFileName )
+        try:
+            os.remove(os.path.join(self.jobStoreDir, sharedFileName))
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
     def writeStatsAndLogging(self, statsAndLoggingString):
         # Temporary files are placed in the set of temporary files/directoies
         fd, tempStatsFile = tempfile.mkstemp(prefix="stats", suffix=".new", dir=self._getTempSharedDir())
@@ -333,6 +362,21 @@ class FileJobStore(AbstractJobStore):
                         os.rename(absTempFile, newAbsTempFile)
         return numberOfFilesProcessed
 
+    @classmethod
+    def supportsJobCommitClaims(cls):
+        return True
+
+    def claimJobCommit(self, jobStoreID, claimToken):
+        # The claim is a file in the job's directory, so it is removed along with the job
+        claimFile = os.path.join(self._getAbsPath(jobStoreID), 'claim.' + claimToken)
+        try:
+            os.close(os.open(claimFile, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except OSError as e:
+            if e.errno in (errno.EEXIST, errno.ENOENT):
+                return False
+            raise
+        return True
+
     ##########################################
     # Private methods
     ##########################################   
@@ -387,6 +431,8 @@ class FileJobStore(AbstractJobStore):
         tempDir = self.tempFilesDir
         for i in xrange(self.levels):
             tempDir = os.path.join(tempDir, random.choice(self.validDirs))
+            if tempDir in self._tempSharedDirs:
+                continue
             if not os.path.exists(tempDir):
                 try:
                     os.mkdir(tempDir)
@@ -394,6 +440,8 @@ class FileJobStore(AbstractJobStore):
                     if not os.path.exists(tempDir): # In the case that a collision occurs and
                         # it is created while we wait then we ignore
                         raise
+            # These directories are never removed while the job store exists
+            self._tempSharedDirs.add(tempDir)
         return tempDir
 
     def _tempDirectories(self):
@@ -411,8 +459,10 @@ class FileJobStore(AbstractJobStore):
         for tempDir in _dirs(self.tempFilesDir, self.levels):
             yield tempDir
 
-    def _getTempFile(self, jobStoreID=None):
+    def _getTempFile(self, jobStoreID=None, checkJob=True):
         """
+        :param bool checkJob: if False, the caller has already checked that the given job exists
+
         :rtype : file-descriptor, string, string is the absolute path to a temporary file within
         the given job's (referenced by jobStoreID's) temporary file directory. The file-descriptor
         is integer pointing to open operating system file handle. Should be closed using os.close()
@@ -420,9 +470,21 @@ class FileJobStore(AbstractJobStore):
         """
         if jobStoreID != None:
             # Make a temporary file within the job's directory
-            self._checkJobStoreId(jobStoreID)
-            return tempfile.mkstemp(suffix=".tmp",
-                                dir=os.path.join(self._getAbsPath(jobStoreID), "g"))
+            if checkJob:
+                self._checkJobStoreId(jobStoreID)
+            jobFilesDir = os.path.join(self._getAbsPath(jobStoreID), "g")
+            try:
+                return tempfile.mkstemp(suffix=".tmp", dir=jobFilesDir)
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+            # The job's first file, see create()
+            try:
+                os.mkdir(jobFilesDir)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            return tempfile.mkstemp(suffix=".tmp", dir=jobFilesDir)
         else:
             # Make a temporary file within the temporary file structure
             return tempfile.mkstemp(prefix="tmp", suffix=".tmp", dir=self._getTempSharedDir())
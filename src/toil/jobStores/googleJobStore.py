@@ -9,13 +9,14 @@ import logging
 import time
 
 # Python 3 compatibility imports
-from six.moves import cPickle, StringIO
+from six.moves import StringIO
 
 from toil.jobStores.abstractJobStore import (AbstractJobStore, NoSuchJobException,
                                              NoSuchFileException,
                                              ConcurrentFileModificationException)
 from toil.jobStores.utils import WritablePipe, ReadablePipe
 from toil.jobGraph import JobGraph
+from toil.serialiser import Serialiser
 
 log = logging.getLogger(__name__)
 
@@ -24,6 +25,9 @@ GOOGLE_STORAGE = 'gs'
 
 class GoogleJobStore(AbstractJobStore):
 
+    # Jobs are transferred over the network with every load and update
+    defaultCompression = 'zlib'
+
     @classmethod
     def initialize(cls, locator, config=None):
         try:
@@ -118,7 +122,7 @@ class GoogleJobStore(AbstractJobStore):
                        command=jobNode.command, remainingRetryCount=self._defaultTryCount(),
                        logJobStoreFileID=None, predecessorNumber=jobNode.predecessorNumber,
                        **jobNode._requirements)
-        self._writeString(jobStoreID, cPickle.dumps(job, protocol=cPickle.HIGHEST_PROTOCOL))
+        self._writeString(jobStoreID, self.serialiser.dumps(job))
         return job
 
     def exists(self, jobStoreID):
@@ -145,20 +149,24 @@ class GoogleJobStore(AbstractJobStore):
             jobString = self._readContents(jobStoreID)
         except NoSuchFileException:
             raise NoSuchJobException(jobStoreID)
-        return cPickle.loads(jobString)
+        return Serialiser.loads(jobString)
 
     def update(self, job):
-        self._writeString(job.jobStoreID, cPickle.dumps(job, protocol=cPickle.HIGHEST_PROTOCOL), update=True)
+        self._writeString(job.jobStoreID, self.serialiser.dumps(job), update=True)
 
     def delete(self, jobStoreID):
         # jobs will always be encrypted when avaliable
         self._delete(jobStoreID, encrypt=True)
 
     def jobs(self):
+        for jobStoreID in self.jobStoreIDs():
+            yield self.load(jobStoreID)
+
+    def jobStoreIDs(self):
         for key in self.files.list(prefix='job'):
             jobStoreID = key.name
             if len(jobStoreID) == 39:
-                yield self.load(jobStoreID)
+                yield jobStoreID
 
     def writeFile(self, localFilePath, jobStoreID=None):
         fileID = self._newID(isFile=True, jobStoreID=jobStoreID)
@@ -242,6 +250,13 @@ class GoogleJobStore(AbstractJobStore):
         with self._downloadStream(key, encrypt=isProtected) as readable:
             yield readable
 
+    def deleteSharedFile(self, sharedFileName):
+        assert self._validateSharedFileName(sharedFileName)
+        try:
+            self.deleteFile(sharedFileName)
+        except NoSuchFileException:
+            pass
+
     @staticmethod
     def _getResources(url):
         projectID = url.host
@@ -7,6 +7,34 @@ from bd2k.util.threading import ExceptionalThread
 
 log = logging.getLogger(__name__)
 
+
+def splitIntoBatches(items, maxItems, maxSize, sizeOf):
+    """
+    Splits the given items into lists of consecutive items, each holding at most the given number
+    of items. Unless it consists of a single item, the total size of the items in each list is at
+    most the given size, too.
+
+    >>> list(splitIntoBatches(range(5), 2, 100, lambda i: 1))
+    [[0, 1], [2, 3], [4]]
+    >>> list(splitIntoBatches([3, 3, 5, 7, 1], 10, 6, lambda i: i))
+    [[3, 3], [5], [7], [1]]
+
+    :param list items: the items to split up
+    :param int maxItems: the maximum number of items per list
+    :param int maxSize: the maximum total size of the items per list
+    :param sizeOf: a function returning the size of an item
+    """
+    batch, batchSize = [], 0
+    for item in items:
+        size = sizeOf(item)
+        if batch and (len(batch) == maxItems or batchSize + size > maxSize):
+            yield batch
+            batch, batchSize = [], 0
+        batch.append(item)
+        batchSize += size
+    if batch:
+        yield batch
+
 class WritablePipe(object):
     """
     An object-oriented wrapper for os.pipe. Clients should subclass it, implement
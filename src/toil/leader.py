@@ -19,8 +19,11 @@ from __future__ import absolute_import
 
 import logging
 import gzip
+import heapq
+import itertools
 import os
 import time
+import uuid
 from collections import namedtuple
 
 # Python 3 compatibility imports
@@ -30,10 +33,15 @@ from bd2k.util.expando import Expando
 from bd2k.util.humanize import bytes2human
 
 from toil import resolveEntryPoint
-from toil.jobStores.abstractJobStore import NoSuchJobException
+from toil.criticalPath import CriticalPathEstimator
+from toil.finishedJobLoader import FinishedJobLoader
+from toil.leaderSnapshot import LeaderSnapshot
+from toil.lib.threading import Wakeup
 from toil.provisioners.clusterScaler import ClusterScaler
 from toil.serviceManager import ServiceManager
+from toil.requirementsLearner import RequirementsLearner
 from toil.statsAndLogging import StatsAndLogging
+from toil.stragglerDetector import StragglerDetector
 from toil.jobGraph import JobNode
 from toil.job import ServiceJobNode
 from toil.toilState import ToilState
@@ -100,7 +108,8 @@ class Leader:
         self.jobStoreLocator = config.jobStore
 
         # Get a snap shot of the current state of the jobs in the jobStore
-        self.toilState = ToilState(jobStore, rootJob, jobCache=jobCache)
+        self.toilState = ToilState(jobStore, rootJob, jobCache=jobCache,
+                                   loadThreads=config.leaderIOThreads)
         logger.info("Found %s jobs to start and %i jobs with successors to run",
                         len(self.toilState.updatedJobs), len(self.toilState.successorCounts))
 
@@ -109,9 +118,33 @@ class Leader:
         assert len(self.batchSystem.getIssuedBatchJobIDs()) == 0 #Batch system must start with no active jobs!
         logger.info("Checked batch system has no running jobs and no updated jobs")
 
+        # Signalled by the batch system and the service manager whenever they have output for
+        # the main loop, so that the main loop can react to it immediately
+        self.wakeup = Wakeup()
+        try:
+            self.batchSystem.setWakeup(self.wakeup)
+        except NotImplementedError:
+            logger.debug("The batch system doesn't support wakeups, polling it for updated jobs")
+            self.batchSystemSignalsWakeup = False
+        else:
+            self.batchSystemSignalsWakeup = True
+
         # Map of batch system IDs to IsseudJob tuples
         self.jobBatchSystemIDToIssuedJob = {}
 
+        # Priority queue of jobs that are ready to be issued, as (-priority, index, jobNode)
+        # tuples. Jobs with the longest estimated remaining critical path are issued first.
+        self.readyJobs = []
+        self.readyJobIndex = itertools.count()
+
+        # Each issue of a job is identified by a token, which is unique across the leaders of the
+        # workflow and passed to the worker
+        self.issueTokenPrefix = uuid.uuid4().hex[:8]
+        self.issueTokenIndex = itertools.count()
+
+        # Estimates the priority of ready jobs from the runtimes of finished jobs
+        self.criticalPath = CriticalPathEstimator()
+
         # Number of preempetable jobs currently being run by batch system
         self.preemptableJobsIssued = 0
 
@@ -123,6 +156,14 @@ class Leader:
         self.preemptableServiceJobsIssued = 0
         self.preemptableServiceJobsToBeIssued = []
 
+        # The issued service jobs by batch system ID, maintained as jobs are issued and removed
+        # so that the deadlock check does not have to scan all issued jobs
+        self.issuedServiceJobs = {}
+
+        # Snapshot of the batch system's running jobs, taken at most once per iteration of the
+        # main loop. None if no snapshot has been taken in the current iteration.
+        self._runningBatchJobIDs = None
+
         # Hash to store number of times a job is lost by the batch system,
         # used to decide if to reissue an apparently missing job
         self.reissueMissingJobs_missingHash = {}
@@ -135,10 +176,32 @@ class Leader:
         self.clusterScaler = None if self.provisioner is None else ClusterScaler(self.provisioner, self, self.config)
 
         # A service manager thread to start and terminate services
-        self.serviceManager = ServiceManager(jobStore, self.toilState)
+        self.serviceManager = ServiceManager(jobStore, self.toilState, wakeup=self.wakeup)
+
+        # Threads to load the jobGraphs of finished jobs without blocking the main loop
+        self.finishedJobLoader = FinishedJobLoader(jobStore, self.config, wakeup=self.wakeup)
+
+        # Learns the resources jobs actually use from their stats, None unless requested
+        self.requirementsLearner = (RequirementsLearner.load(jobStore)
+                                    if self.config.learnRequirements else None)
 
         # A thread to manage the aggregation of statistics and logging from the run
-        self.statsAndLogging = StatsAndLogging(self.jobStore, self.config)
+        self.statsAndLogging = StatsAndLogging(self.jobStore, self.config,
+                                               requirementsLearner=self.requirementsLearner)
+
+        # Periodic snapshots of the state, with a journal of the jobs issued since, from which
+        # a restarted leader only has to re-read the jobs that may have changed
+        self.leaderSnapshot = LeaderSnapshot(jobStore, self.config)
+
+        # Finds the jobs that run for much longer than their peers so that a second attempt of
+        # them can be issued, None if speculative execution is disabled
+        self.stragglerDetector = None
+        if self.config.speculativeExecution > 0:
+            if jobStore.supportsJobCommitClaims():
+                self.stragglerDetector = StragglerDetector(self.config.speculativeExecution)
+            else:
+                logger.warn('Speculative execution is disabled, the job store does not support '
+                            'commit claims')
 
         # Set used to monitor deadlocked jobs
         self.potentialDeadlockedJobs = set()
@@ -171,8 +234,13 @@ class Leader:
                     self.clusterScaler.start()
 
                 try:
-                    # Run the main loop
-                    self.innerLoop()
+                    # Start the finished job loader threads
+                    self.finishedJobLoader.start()
+                    try:
+                        # Run the main loop
+                        self.innerLoop()
+                    finally:
+                        self.finishedJobLoader.shutdown()
                 finally:
                     if self.clusterScaler is not None:
                         logger.info('Waiting for workers to shutdown')
@@ -187,6 +255,8 @@ class Leader:
         finally:
             # Ensure the stats and logging thread is properly shutdown
             self.statsAndLogging.shutdown()
+            if self.requirementsLearner is not None:
+                self.requirementsLearner.save()
 
         # Filter the failed jobs
         self.toilState.totalFailedJobs = filter(lambda j : self.jobStore.exists(j.jobStoreID), self.toilState.totalFailedJobs)
@@ -217,6 +287,9 @@ class Leader:
 
         logger.info("Starting the main loop")
         while True:
+            # Invalidate the snapshot of running jobs taken in the previous iteration
+            self._runningBatchJobIDs = None
+
             # Process jobs that are ready to be scheduled/have successors to schedule
             if len(self.toilState.updatedJobs) > 0:
                 logger.debug('Built the jobs list, currently have %i jobs to update and %i jobs issued',
@@ -263,7 +336,8 @@ class Leader:
                         elif jobGraph.checkpoint is not None and jobGraph.remainingRetryCount > 0:
                             logger.warn('Job: %s is being restarted as a checkpoint after the total '
                                         'failure of jobs in its subtree.', jobGraph.jobStoreID)
-                            self.issueJob(JobNode.fromJobGraph(jobGraph))
+                            self.issueJob(JobNode.fromJobGraph(jobGraph),
+                                          useLearnedRequirements=jobGraph.useLearnedRequirements)
                         else: # Mark it totally failed
                             logger.debug("Job %s is being processed as completely failed", jobGraph.jobStoreID)
                             self.processTotallyFailedJob(jobGraph)
@@ -283,7 +357,8 @@ class Leader:
                                         jobGraph, jobGraph.jobStoreID)
                         else:
                             # Otherwise try the job again
-                            self.issueJob(JobNode.fromJobGraph(jobGraph))
+                            self.issueJob(JobNode.fromJobGraph(jobGraph),
+                                          useLearnedRequirements=jobGraph.useLearnedRequirements)
 
                     # If the job has services to run, which have not been started, start them
                     elif len(jobGraph.services) > 0:
@@ -312,6 +387,8 @@ class Leader:
                         #the jobGraph can be considered again
                         assert jobGraph.jobStoreID not in self.toilState.successorCounts
                         self.toilState.successorCounts[jobGraph.jobStoreID] = len(jobGraph.stack[-1])
+                        self.criticalPath.addSuccessors(jobGraph.jobName,
+                                                        [jobNode.jobName for jobNode in jobGraph.stack[-1]])
                         #List of successors to schedule
                         successors = []
 
@@ -416,25 +493,43 @@ class Leader:
                 jobGraph.services = []
                 self.toilState.updatedJobs.add((jobGraph, 0))
 
-            # Gather any new, updated jobGraph from the batch system
-            updatedJobTuple = self.batchSystem.getUpdatedBatchJob(2)
-            if updatedJobTuple is not None:
-                jobID, result, wallTime = updatedJobTuple
-                # easy, track different state
-                try:
-                    updatedJob = self.jobBatchSystemIDToIssuedJob[jobID]
-                except KeyError:
-                    logger.warn("A result seems to already have been processed "
-                                "for job %s", jobID)
-                else:
-                    if result == 0:
-                        cur_logger = (logger.debug if str(updatedJob.jobName).startswith(self.debugJobNames)
-                                      else logger.info)
-                        cur_logger('Job ended successfully: %s', updatedJob)
+            # Snapshot the state every so often, before issuing any more jobs
+            if self.leaderSnapshot.isDue():
+                self.leaderSnapshot.write(self.toilState,
+                                          {jobNode.jobStoreID for jobNode in
+                                           self.jobBatchSystemIDToIssuedJob.values()})
+
+            if self.requirementsLearner is not None and self.requirementsLearner.isDue():
+                self.requirementsLearner.save()
+
+            # Issue the jobs that became ready in this iteration, most important first
+            self.issueReadyJobs()
+
+            # Issue a second attempt of the jobs that run for much longer than their peers
+            if self.stragglerDetector is not None and self.stragglerDetector.isDue():
+                self.issueSpeculativeJobs()
+
+            # Wait for the next event and gather all new, updated jobGraphs from the batch
+            # system, so that a burst of finished jobs is processed in one pass rather than one
+            # job per iteration
+            updatedJobTuples = self._waitForUpdatedBatchJobs()
+            if updatedJobTuples:
+                for jobID, result, wallTime in updatedJobTuples:
+                    # easy, track different state
+                    try:
+                        updatedJob = self.jobBatchSystemIDToIssuedJob[jobID]
+                    except KeyError:
+                        logger.warn("A result seems to already have been processed "
+                                    "for job %s", jobID)
                     else:
-                        logger.warn('Job failed with exit value %i: %s',
-                                    result, updatedJob)
-                    self.processFinishedJob(jobID, result, wallTime=wallTime)
+                        if result == 0:
+                            cur_logger = (logger.debug if str(updatedJob.jobName).startswith(self.debugJobNames)
+                                          else logger.info)
+                            cur_logger('Job ended successfully: %s', updatedJob)
+                        else:
+                            logger.warn('Job failed with exit value %i: %s',
+                                        result, updatedJob)
+                        self.processFinishedJob(jobID, result, wallTime=wallTime)
 
             else:
                 # Process jobs that have gone awry
@@ -459,15 +554,21 @@ class Leader:
                         #in a minute, providing things are quiet
                     logger.info("Rescued any (long) missing jobs")
 
+            # Gather the finished jobs whose jobGraphs have been loaded from the job store
+            self.processLoadedJobs()
+
             # Check on the associated threads and exit if a failure is detected
             self.statsAndLogging.check()
             self.serviceManager.check()
+            self.finishedJobLoader.check()
             # the cluster scaler object will only be instantiated if autoscaling is enabled
             if self.clusterScaler is not None:
                 self.clusterScaler.check()
 
             # The exit criterion
-            if len(self.toilState.updatedJobs) == 0 and self.getNumberOfJobsIssued() == 0 and self.serviceManager.jobsIssuedToServiceManager == 0:
+            if (len(self.toilState.updatedJobs) == 0 and self.getNumberOfJobsIssued() == 0
+                and self.serviceManager.jobsIssuedToServiceManager == 0
+                and self.finishedJobLoader.getNumberOfFinishedJobs() == 0):
                 logger.info("No jobs left to run so exiting.")
                 break
 
@@ -485,16 +586,57 @@ class Leader:
         # assert self.toilState.jobsToBeScheduledWithMultiplePredecessors # These are not properly emptied yet
         # assert self.toilState.hasFailedSuccessors == set() # These are not properly emptied yet
 
+    def _waitForUpdatedBatchJobs(self, maxWait=2):
+        """
+        Waits until the batch system, the service manager or the finished job loader signal an
+        event for the main loop
+        and returns the jobs updated by the batch system. Does not wait if there are updated
+        jobs in the toil state already. The timeout only bounds how long the periodic checks
+        made by the main loop (rescuing jobs, detecting deadlocks and checking on the leader's
+        threads) can be delayed.
+
+        :param float maxWait: the maximum number of seconds to wait for an event
+
+        :rtype: list[tuple(str, int, float)]
+        """
+        if len(self.toilState.updatedJobs) > 0:
+            maxWait = 0
+        if self.batchSystemSignalsWakeup:
+            self.wakeup.wait(maxWait)
+            return self.batchSystem.getUpdatedBatchJobs(0)
+        else:
+            return self.batchSystem.getUpdatedBatchJobs(maxWait)
+
+    def getRunningBatchJobIDs(self):
+        """
+        Gets the jobs currently running in the batch system, querying the batch system at most
+        once per iteration of the main loop.
+
+        :return: dictionary mapping the batch system IDs of running jobs to the number of
+                 seconds they have been running for
+        :rtype: dict[int,float]
+        """
+        if self._runningBatchJobIDs is None:
+            self._runningBatchJobIDs = self.batchSystem.getRunningBatchJobIDs()
+        return self._runningBatchJobIDs
+
     def checkForDeadlocks(self):
         """
         Checks if the system is deadlocked running service jobs.
         """
-        totalRunningJobs = len(self.batchSystem.getRunningBatchJobIDs())
         totalServicesIssued = self.serviceJobsIssued + self.preemptableServiceJobsIssued
-        # If there are no updated jobs and at least some jobs running
-        if totalServicesIssued >= totalRunningJobs and len(self.toilState.updatedJobs) == 0 and totalRunningJobs > 0:
-            serviceJobs = filter(lambda x : isinstance(x, ServiceJobNode), self.jobBatchSystemIDToIssuedJob.values())
-            runningServiceJobs = set(filter(lambda x : self.serviceManager.isRunning(x), serviceJobs))
+        # The system can only be deadlocked if some services are issued and there are no updated
+        # or finished jobs. Checking this first avoids querying the batch system in every
+        # iteration of the main loop.
+        if (totalServicesIssued > 0 and len(self.toilState.updatedJobs) == 0
+            and self.finishedJobLoader.getNumberOfFinishedJobs() == 0):
+            totalRunningJobs = len(self.getRunningBatchJobIDs())
+        else:
+            totalRunningJobs = 0
+        # If at least some jobs are running and they could all be services
+        if totalServicesIssued >= totalRunningJobs > 0:
+            runningServiceJobs = set(serviceJob for serviceJob in self.issuedServiceJobs.values()
+                                     if self.serviceManager.isRunning(serviceJob))
             assert len(runningServiceJobs) <= totalRunningJobs
 
             # If all the running jobs are active services then we have a potential deadlock
@@ -515,31 +657,85 @@ class Leader:
             self.potentialDeadlockTime = 0
 
 
-    def issueJob(self, jobNode):
+    def issueJob(self, jobNode, useLearnedRequirements=True):
         """
         Add a job to the queue of jobs
         """
-        jobNode.command = ' '.join((resolveEntryPoint('_toil_worker'),
-                                    self.jobStoreLocator, jobNode.jobStoreID))
-        jobBatchSystemID = self.batchSystem.issueBatchJob(jobNode)
-        self.jobBatchSystemIDToIssuedJob[jobBatchSystemID] = jobNode
-        if jobNode.preemptable:
-            # len(jobBatchSystemIDToIssuedJob) should always be greater than or equal to preemptableJobsIssued,
-            # so increment this value after the job is added to the issuedJob dict
-            self.preemptableJobsIssued += 1
-        cur_logger = (logger.debug if jobNode.jobName.startswith(self.debugJobNames)
-                      else logger.info)
-        cur_logger("Issued job %s with job batch system ID: "
-                   "%s and cores: %s, disk: %s, and memory: %s",
-                   jobNode, str(jobBatchSystemID), int(jobNode.cores),
-                   bytes2human(jobNode.disk), bytes2human(jobNode.memory))
+        self.issueJobs([jobNode], useLearnedRequirements=useLearnedRequirements)
 
-    def issueJobs(self, jobs):
+    def issueJobs(self, jobs, useLearnedRequirements=True):
         """
-        Add a list of jobs, each represented as a jobNode object
+        Add a list of jobs, each represented as a jobNode object, to the queue of jobs. The jobs
+        are issued to the batch system by issueReadyJobs.
+
+        :param bool useLearnedRequirements: whether the jobs may be issued with the requirements
+               learned from other jobs of their class, see --learnRequirements
         """
-        for job in jobs:
-            self.issueJob(job)
+        for jobNode in jobs:
+            if useLearnedRequirements and self.requirementsLearner is not None:
+                jobNode = self.requirementsLearner.rightSize(jobNode)
+            priority = self.criticalPath.getRemainingPathLength(jobNode.jobName)
+            heapq.heappush(self.readyJobs, (-priority, next(self.readyJobIndex), jobNode))
+
+    def issueReadyJobs(self):
+        """
+        Issue all queued jobs to the batch system at once, in order of decreasing estimated
+        remaining critical path length
+        """
+        if len(self.readyJobs) == 0:
+            return
+        jobs, priorities = [], []
+        while self.readyJobs:
+            negativePriority, _, jobNode = heapq.heappop(self.readyJobs)
+            # The attempts of the job issued speculatively share the token of its issue
+            issueToken = '%s-%i' % (self.issueTokenPrefix, next(self.issueTokenIndex))
+            # The worker must not chain or fan out jobs beyond the resources issued here, which
+            # may be less than the job graph's requirements, see --learnRequirements
+            issuedResources = '%d:%r:%d' % (jobNode.memory, float(jobNode.cores), jobNode.disk)
+            jobNode.command = ' '.join((resolveEntryPoint('_toil_worker'),
+                                        self.jobStoreLocator, jobNode.jobStoreID,
+                                        issueToken, issuedResources))
+            jobs.append(jobNode)
+            priorities.append(-negativePriority)
+        # The workers of the jobs may change them in the job store from here on
+        self.leaderSnapshot.journal([jobNode.jobStoreID for jobNode in jobs])
+        jobBatchSystemIDs = self.batchSystem.issueBatchJobs(jobs, priorities=priorities)
+        for jobNode, jobBatchSystemID in zip(jobs, jobBatchSystemIDs):
+            self.jobBatchSystemIDToIssuedJob[jobBatchSystemID] = jobNode
+            if isinstance(jobNode, ServiceJobNode):
+                self.issuedServiceJobs[jobBatchSystemID] = jobNode
+            self.criticalPath.jobIssued(jobNode)
+            if jobNode.preemptable:
+                # len(jobBatchSystemIDToIssuedJob) should always be greater than or equal to preemptableJobsIssued,
+                # so increment this value after the job is added to the issuedJob dict
+                self.preemptableJobsIssued += 1
+            cur_logger = (logger.debug if jobNode.jobName.startswith(self.debugJobNames)
+                          else logger.info)
+            cur_logger("Issued job %s with job batch system ID: "
+                       "%s and cores: %s, disk: %s, and memory: %s",
+                       jobNode, str(jobBatchSystemID), int(jobNode.cores),
+                       bytes2human(jobNode.disk), bytes2human(jobNode.memory))
+
+    def issueSpeculativeJobs(self):
+        """
+        Issue a second attempt of each running job that the straggler detector deems a
+        straggler. The attempts run the same command, sharing the job's issue token, and the
+        first attempt to claim the job commits it, see :class:`toil.fileStore.JobCommitClaim`.
+        """
+        runningJobs = self.getRunningBatchJobIDs()
+        for jobBatchSystemID in self.stragglerDetector.findStragglers(
+                self.jobBatchSystemIDToIssuedJob, runningJobs):
+            jobNode = self.jobBatchSystemIDToIssuedJob[jobBatchSystemID]
+            attemptBatchSystemID = self.batchSystem.issueBatchJob(jobNode)
+            self.jobBatchSystemIDToIssuedJob[attemptBatchSystemID] = jobNode
+            if jobNode.preemptable:
+                self.preemptableJobsIssued += 1
+            self.stragglerDetector.addAttempts(jobNode.jobStoreID,
+                                               [jobBatchSystemID, attemptBatchSystemID])
+            logger.warn("Job %s with batch system ID %s has been running for %.0f seconds, issued "
+                        "a second attempt with batch system ID %s", jobNode,
+                        str(jobBatchSystemID), runningJobs[jobBatchSystemID],
+                        str(attemptBatchSystemID))
 
     def issueServiceJob(self, jobNode):
         """
@@ -608,6 +804,10 @@ class Leader:
             assert self.preemptableJobsIssued > 0
             self.preemptableJobsIssued -= 1
         del self.jobBatchSystemIDToIssuedJob[jobBatchSystemID]
+        self.issuedServiceJobs.pop(jobBatchSystemID, None)
+        # A removed job can no longer be missing
+        if self.reissueMissingJobs_missingHash.pop(jobBatchSystemID, None) is not None:
+            logger.warn("Batch system id: %s is no longer missing", str(jobBatchSystemID))
         # If service job
         if jobNode.jobStoreID in self.toilState.serviceJobStoreIDToPredecessorJob:
             # Decrement the number of services
@@ -645,7 +845,7 @@ class Leader:
         jobsToKill = []
         if maxJobDuration < 10000000:  # We won't bother doing anything if the rescue
             # time is more than 16 weeks.
-            runningJobs = self.batchSystem.getRunningBatchJobIDs()
+            runningJobs = self.getRunningBatchJobIDs()
             for jobBatchSystemID in runningJobs.keys():
                 if runningJobs[jobBatchSystemID] > maxJobDuration:
                     logger.warn("The job: %s has been running for: %s seconds, more than the "
@@ -664,22 +864,23 @@ class Leader:
         then we pass the job to processFinishedJob.
         """
         runningJobs = set(self.batchSystem.getIssuedBatchJobIDs())
-        jobBatchSystemIDsSet = set(self.getJobIDs())
-        #Clean up the reissueMissingJobs_missingHash hash, getting rid of jobs that have turned up
-        missingJobIDsSet = set(self.reissueMissingJobs_missingHash.keys())
-        for jobBatchSystemID in missingJobIDsSet.difference(jobBatchSystemIDsSet):
+        # Entries for jobs that were removed are dropped by removeJob, so only jobs that have
+        # turned up in the batch system again need to be cleaned up here
+        for jobBatchSystemID in [jobBatchSystemID
+                                 for jobBatchSystemID in self.reissueMissingJobs_missingHash
+                                 if jobBatchSystemID in runningJobs]:
             self.reissueMissingJobs_missingHash.pop(jobBatchSystemID)
             logger.warn("Batch system id: %s is no longer missing", str(jobBatchSystemID))
-        assert runningJobs.issubset(jobBatchSystemIDsSet) #Assert checks we have
-        #no unexpected jobs running
+        #Assert checks we have no unexpected jobs running
+        assert all(jobBatchSystemID in self.jobBatchSystemIDToIssuedJob
+                   for jobBatchSystemID in runningJobs)
         jobsToKill = []
-        for jobBatchSystemID in set(jobBatchSystemIDsSet.difference(runningJobs)):
+        for jobBatchSystemID in [jobBatchSystemID
+                                 for jobBatchSystemID in self.jobBatchSystemIDToIssuedJob
+                                 if jobBatchSystemID not in runningJobs]:
             jobStoreID = self.getJobStoreID(jobBatchSystemID)
-            if self.reissueMissingJobs_missingHash.has_key(jobBatchSystemID):
-                self.reissueMissingJobs_missingHash[jobBatchSystemID] += 1
-            else:
-                self.reissueMissingJobs_missingHash[jobBatchSystemID] = 1
-            timesMissing = self.reissueMissingJobs_missingHash[jobBatchSystemID]
+            timesMissing = self.reissueMissingJobs_missingHash.get(jobBatchSystemID, 0) + 1
+            self.reissueMissingJobs_missingHash[jobBatchSystemID] = timesMissing
             logger.warn("Job store ID %s with batch system id %s is missing for the %i time",
                         jobStoreID, str(jobBatchSystemID), timesMissing)
             if timesMissing == killAfterNTimesMissing:
@@ -691,94 +892,85 @@ class Leader:
 
     def processFinishedJob(self, batchSystemID, resultStatus, wallTime=None):
         """
-        Function reads a processed jobGraph file and updates it state.
+        Function removes a finished job from the set of issued jobs and hands it to the finished
+        job loader, which reads the processed jobGraph file and updates its state in the
+        background. The job is then processed by processLoadedJobs.
         """
-        def processRemovedJob(issuedJob):
-            if resultStatus != 0:
-                logger.warn("Despite the batch system claiming failure the "
-                            "job %s seems to have finished and been removed", issuedJob)
-            self._updatePredecessorStatus(issuedJob.jobStoreID)
+        if self.stragglerDetector is not None:
+            jobStoreID = self.getJobStoreID(batchSystemID)
+            otherAttempts = self.stragglerDetector.removeAttempt(jobStoreID, batchSystemID)
+            if otherAttempts:
+                if resultStatus != 0:
+                    # This attempt lost the job to another one or failed before claiming it, in
+                    # either case the job is up to the other attempts
+                    logger.debug("Attempt %s of job %s failed, waiting for the other attempts",
+                                 str(batchSystemID), jobStoreID)
+                    self.removeJob(batchSystemID)
+                    return
+                # This attempt committed the job, the others can only lose
+                self.batchSystem.killBatchJobs(otherAttempts)
+                for otherBatchSystemID in otherAttempts:
+                    self.stragglerDetector.removeAttempt(jobStoreID, otherBatchSystemID)
+                    self.removeJob(otherBatchSystemID)
         jobNode = self.removeJob(batchSystemID)
-        jobStoreID = jobNode.jobStoreID
+        self.criticalPath.jobFinished(jobNode, wallTime)
         if wallTime is not None and self.clusterScaler is not None:
             self.clusterScaler.addCompletedJob(jobNode, wallTime)
-        if self.jobStore.exists(jobStoreID):
-            logger.debug("Job %s continues to exist (i.e. has more to do)", jobNode)
-            try:
-                jobGraph = self.jobStore.load(jobStoreID)
-            except NoSuchJobException:
-                # Avoid importing AWSJobStore as the corresponding extra might be missing
-                if self.jobStore.__class__.__name__ == 'AWSJobStore':
-                    # We have a ghost job - the job has been deleted but a stale read from
-                    # SDB gave us a false positive when we checked for its existence.
-                    # Process the job from here as any other job removed from the job store.
-                    # This is a temporary work around until https://github.com/BD2KGenomics/toil/issues/1091
-                    # is completed
-                    logger.warn('Got a stale read from SDB for job %s', jobNode)
-                    processRemovedJob(jobNode)
-                    return
-                else:
-                    raise
-            if jobGraph.logJobStoreFileID is not None:
-                with jobGraph.getLogFileHandle( self.jobStore ) as logFileStream:
-                    # more memory efficient than read().striplines() while leaving off the
-                    # trailing \n left when using readlines()
-                    # http://stackoverflow.com/a/15233739
-                    messages = [line.rstrip('\n') for line in logFileStream]
-                    logFormat = '\n%s    ' % jobStoreID
-                    logger.warn('The job seems to have left a log file, indicating failure: %s\n%s',
-                                jobGraph, logFormat.join(messages))
-                    StatsAndLogging.writeLogFiles(jobGraph.chainedJobs, messages, self.config)
-            if resultStatus != 0:
-                # If the batch system returned a non-zero exit code then the worker
-                # is assumed not to have captured the failure of the job, so we
-                # reduce the retry count here.
-                if jobGraph.logJobStoreFileID is None:
-                    logger.warn("No log file is present, despite job failing: %s", jobNode)
-                jobGraph.setupJobAfterFailure(self.config)
-                self.jobStore.update(jobGraph)
-            elif jobStoreID in self.toilState.hasFailedSuccessors:
-                # If the job has completed okay, we can remove it from the list of jobs with failed successors
-                self.toilState.hasFailedSuccessors.remove(jobStoreID)
-
-            self.toilState.updatedJobs.add((jobGraph, resultStatus)) #Now we know the
-            #jobGraph is done we can add it to the list of updated jobGraph files
-            logger.debug("Added job: %s to active jobs", jobGraph)
-        else:  #The jobGraph is done
-            processRemovedJob(jobNode)
+        if wallTime is not None and resultStatus == 0 and self.stragglerDetector is not None:
+            self.stragglerDetector.addCompletedJob(jobNode, wallTime)
+        self.finishedJobLoader.loadFinishedJob(jobNode, resultStatus)
+
+    def processLoadedJobs(self):
+        """
+        Adds the finished jobs whose jobGraphs have been loaded by the finished job loader to the
+        updated jobs, in the order the jobs finished, and cleans up after jobs that were removed
+        from the job store.
+        """
+        for finishedJob in self.finishedJobLoader.getLoadedJobs():
+            jobNode, resultStatus, jobGraph = (finishedJob.jobNode, finishedJob.resultStatus,
+                                               finishedJob.jobGraph)
+            if jobGraph is not None:
+                if resultStatus == 0 and jobNode.jobStoreID in self.toilState.hasFailedSuccessors:
+                    # If the job has completed okay, we can remove it from the list of jobs with failed successors
+                    self.toilState.hasFailedSuccessors.remove(jobNode.jobStoreID)
+
+                self.toilState.updatedJobs.add((jobGraph, resultStatus)) #Now we know the
+                #jobGraph is done we can add it to the list of updated jobGraph files
+                logger.debug("Added job: %s to active jobs", jobGraph)
+            else:  #The jobGraph is done
+                if resultStatus != 0:
+                    logger.warn("Despite the batch system claiming failure the "
+                                "job %s seems to have finished and been removed", jobNode)
+                self._updatePredecessorStatus(jobNode.jobStoreID)
 
     @staticmethod
-    def getSuccessors(jobGraph, alreadySeenSuccessors, jobStore):
+    def getSuccessors(jobGraph, alreadySeenSuccessors, jobStore, loadThreads=1):
         """
-        Gets successors of the given job by walking the job graph recursively.
+        Gets successors of the given job by walking the job graph breadth first, loading the
+        jobs of each level of the walk using up to the given number of threads concurrently.
         Any successor in alreadySeenSuccessors is ignored and not traversed.
         Returns the set of found successors. This set is added to alreadySeenSuccessors.
         """
         successors = set()
 
-        def successorRecursion(jobGraph):
-            # For lists of successors
-            for successorList in jobGraph.stack:
-
-                # For each successor in list of successors
-                for successorJobNode in successorList:
-
-                    # Id of the successor
-                    successorJobStoreID = successorJobNode.jobStoreID
-
-                    # If successor not already visited
-                    if successorJobStoreID not in alreadySeenSuccessors:
-
-                        # Add to set of successors
-                        successors.add(successorJobStoreID)
-                        alreadySeenSuccessors.add(successorJobStoreID)
-
-                        # Recurse if job exists
-                        # (job may not exist if already completed)
-                        if jobStore.exists(successorJobStoreID):
-                            successorRecursion(jobStore.load(successorJobStoreID))
-
-        successorRecursion(jobGraph) # Recurse from jobGraph
+        jobGraphs = [jobGraph]
+        while jobGraphs:
+            # The successors of this level that have not been visited yet
+            unseenSuccessors = set()
+            for jobGraph in jobGraphs:
+                for successorList in jobGraph.stack:
+                    for successorJobNode in successorList:
+                        successorJobStoreID = successorJobNode.jobStoreID
+                        if successorJobStoreID not in alreadySeenSuccessors:
+                            unseenSuccessors.add(successorJobStoreID)
+                            alreadySeenSuccessors.add(successorJobStoreID)
+            successors.update(unseenSuccessors)
+
+            # Walk on from the successors that still exist
+            # (a job may not exist if already completed)
+            jobGraphs = list(ToilState.loadJobs(jobStore, unseenSuccessors,
+                                                loadThreads=loadThreads,
+                                                ignoreMissing=True).values())
 
         return successors
 
@@ -822,7 +1014,8 @@ class Leader:
             # All successors traversed will be added to toilState.failedSuccessors and returned
             # as a set (unseenSuccessors).
             unseenSuccessors = self.getSuccessors(jobGraph, self.toilState.failedSuccessors,
-                                                  self.jobStore)
+                                                  self.jobStore,
+                                                  loadThreads=self.config.leaderIOThreads)
             logger.debug("Found new failed successors: %s of job: %s", " ".join(
                          unseenSuccessors), jobGraph)
 
@@ -0,0 +1,189 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import itertools
+import logging
+import time
+import uuid
+
+# Python 3 compatibility imports
+from six.moves import cPickle
+
+from toil.jobStores.abstractJobStore import NoSuchFileException
+from toil.toilState import ToilState
+
+logger = logging.getLogger( __name__ )
+
+
+class LeaderSnapshot(object):
+    """
+    Periodically writes the jobGraphs of the jobs that wait for their successors in the leader's
+    state to the job store, followed by a journal of the jobs issued since. Only issued jobs are
+    changed in the job store by their workers, so a restarted leader can take the jobGraphs of all
+    jobs in the snapshot that are not in the journal from the snapshot, and only has to re-read the
+    rest from the job store.
+
+    Each snapshot has a unique generation. The journal is a sequence of shared files, each holding
+    the generation of the snapshot it belongs to and the IDs of the jobs in the snapshot that are
+    about to be issued. Jobs that are not in the snapshot are read from the job store on restart
+    anyway, so issuing them is not journaled, and each job in the snapshot is journaled at most
+    once. Most batches of jobs issued by the leader therefore write no journal file at all. A
+    journal file is written before its jobs are issued, so the journal is complete up to the first
+    journal file that is missing, belongs to another generation, or was only partially written.
+    The journal of a snapshot is deleted once it is superseded by the next one.
+    """
+    snapshotFileName = 'leaderSnapshot.pickle'
+    journalFileName = 'leaderJournal.%i.pickle'
+
+    def __init__(self, jobStore, config):
+        """
+        :param toil.jobStores.abstractJobStore.AbstractJobStore jobStore:
+        :param toil.common.Config config: the snapshotFrequency of the config determines the
+               number of seconds between snapshots, 0 disables them
+        """
+        self.jobStore = jobStore
+        self.frequency = config.snapshotFrequency
+        # The generation of the last snapshot, None if none has been written yet
+        self.generation = None
+        self.lastSnapshotTime = 0
+        # The index of the next journal file of the current generation
+        self.journalIndex = 0
+        # The IDs of the jobs in the last snapshot that have not been issued since
+        self.unjournaled = set()
+
+    def isDue(self):
+        """
+        Returns True if it is time to write another snapshot.
+        """
+        return self.frequency > 0 and time.time() - self.lastSnapshotTime >= self.frequency
+
+    def write(self, toilState, issuedJobStoreIDs):
+        """
+        Writes a snapshot of the given state to the job store, starting a new journal.
+
+        :param toil.toilState.ToilState toilState: the leader's state
+        :param set issuedJobStoreIDs: the IDs of the jobs currently issued, whose jobGraphs may
+               be changed by their workers after the snapshot was taken
+        """
+        # The leader changes jobGraphs in its state without updating them in the job store, e.g.
+        # by popping the successors that completed from their stack, in ways that clean() would
+        # repair on restart. The exception are the services the leader removes from jobs once
+        # they are started, which a restart must run again if they are still running or failed,
+        # so such jobs are left out.
+        jobs = {}
+        for predecessors in toilState.successorJobStoreIDToPredecessorJobs.values():
+            for jobGraph in predecessors:
+                if (jobGraph.jobStoreID not in toilState.servicesIssued
+                        and jobGraph.jobStoreID not in toilState.hasFailedSuccessors
+                        and jobGraph.jobStoreID not in issuedJobStoreIDs):
+                    jobs[jobGraph.jobStoreID] = jobGraph
+        generation = uuid.uuid4().hex
+        with self.jobStore.writeSharedFileStream(self.snapshotFileName) as fileHandle:
+            cPickle.dump((generation, jobs, set(issuedJobStoreIDs)), fileHandle,
+                         cPickle.HIGHEST_PROTOCOL)
+        self.generation = generation
+        self.lastSnapshotTime = time.time()
+        self._deleteJournal(self.jobStore, self.journalIndex)
+        self.journalIndex = 0
+        self.unjournaled = set(jobs)
+        logger.debug('Wrote a snapshot of %i jobs of the leader state', len(jobs))
+
+    def journal(self, jobStoreIDs):
+        """
+        Adds those of the given jobs that are in the current snapshot to its journal. Must be
+        called before the jobs are issued.
+
+        :param list jobStoreIDs: the IDs of the jobs about to be issued
+        """
+        jobStoreIDs = [jobStoreID for jobStoreID in jobStoreIDs if jobStoreID in self.unjournaled]
+        if jobStoreIDs:
+            with self.jobStore.writeSharedFileStream(self.journalFileName % self.journalIndex) as fileHandle:
+                cPickle.dump((self.generation, jobStoreIDs), fileHandle, cPickle.HIGHEST_PROTOCOL)
+            self.journalIndex += 1
+            self.unjournaled.difference_update(jobStoreIDs)
+
+    @classmethod
+    def _deleteJournal(cls, jobStore, numJournalFiles):
+        """
+        Deletes the given number of journal files, last one first, so that the remaining journal
+        files are still a prefix of the journal should the leader stop while they are deleted.
+        Journal files that can't be deleted are harmless, as they belong to another generation.
+        """
+        for journalIndex in reversed(range(numJournalFiles)):
+            try:
+                jobStore.deleteSharedFile(cls.journalFileName % journalIndex)
+            except NotImplementedError:
+                logger.debug('Leaving the journal of the leader state behind in a job store that '
+                             'cannot delete shared files')
+                return
+
+    @classmethod
+    def loadJobs(cls, jobStore, loadThreads=8):
+        """
+        Loads the jobs of the last snapshot in the given job store, re-reading the ones in its
+        journal from the job store. The snapshot is invalidated, as the jobs may be changed
+        without being journaled until the restarted leader writes its first snapshot.
+
+        :param toil.jobStores.abstractJobStore.AbstractJobStore jobStore:
+        :param int loadThreads: the number of threads used to re-read the journaled jobs
+        :return: map from jobStoreID to jobGraph of the jobs, or None if there is no usable
+                 snapshot. Jobs in the job store that were not reachable from the root job when
+                 the snapshot was written are not included.
+        :rtype: dict[str,toil.jobGraph.JobGraph]|None
+        """
+        try:
+            with jobStore.readSharedFileStream(cls.snapshotFileName) as fileHandle:
+                snapshot = cPickle.load(fileHandle)
+        except NoSuchFileException:
+            return None
+        except Exception:
+            logger.warn('Ignoring a snapshot of the leader state that could not be read',
+                        exc_info=True)
+            return None
+        if snapshot is None:
+            return None
+        with jobStore.writeSharedFileStream(cls.snapshotFileName) as fileHandle:
+            cPickle.dump(None, fileHandle, cPickle.HIGHEST_PROTOCOL)
+        generation, jobs, journaled = snapshot
+
+        # Replay the journal, counting the journal files left behind by earlier generations too
+        replaying = True
+        for journalIndex in itertools.count():
+            try:
+                with jobStore.readSharedFileStream(cls.journalFileName % journalIndex) as fileHandle:
+                    journalGeneration, jobStoreIDs = cPickle.load(fileHandle)
+            except NoSuchFileException:
+                break
+            except Exception:
+                # The leader stopped while writing this journal file, before issuing its jobs
+                logger.debug('Ignoring a partially written journal of the leader state',
+                             exc_info=True)
+                replaying = False
+                continue
+            if journalGeneration != generation:
+                replaying = False
+            if replaying:
+                journaled.update(jobStoreIDs)
+        # The snapshot was invalidated above, so its journal is of no further use
+        cls._deleteJournal(jobStore, journalIndex)
+
+        for jobStoreID in journaled:
+            jobs.pop(jobStoreID, None)
+        logger.info('Using %i jobs from a snapshot of the leader state, re-reading %i jobs '
+                    'issued since', len(jobs), len(journaled))
+        jobs.update(ToilState.loadJobs(jobStore, journaled, loadThreads=loadThreads,
+                                       ignoreMissing=True))
+        return jobs
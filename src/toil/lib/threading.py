@@ -0,0 +1,93 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+from threading import Event
+
+# Python 3 compatibility imports
+from six.moves.queue import Queue
+
+
+class Wakeup(object):
+    """
+    Lets any number of producer threads wake up a single consumer thread, e.g. the leader.
+
+    The consumer calls :meth:`wait` and then checks all of its event sources without blocking.
+    Because :meth:`wait` resets the wakeup before the consumer checks its sources, a signal
+    raised while those sources are being checked is never lost, it simply causes the next call
+    to :meth:`wait` to return immediately.
+
+    >>> wakeup = Wakeup()
+    >>> wakeup.wait(0)
+    False
+    >>> wakeup.signal()
+    >>> wakeup.wait(0)
+    True
+    >>> wakeup.wait(0)
+    False
+    """
+
+    def __init__(self):
+        super(Wakeup, self).__init__()
+        self._event = Event()
+
+    def signal(self):
+        """
+        Wake up the consumer, or, if it isn't currently waiting, prevent its next wait.
+        """
+        self._event.set()
+
+    def wait(self, timeout):
+        """
+        Block until signalled or until the timeout expires.
+
+        :param float timeout: the maximum number of seconds to block
+
+        :return: True if the wakeup was signalled, False if the timeout expired
+        :rtype: bool
+        """
+        signalled = self._event.wait(timeout)
+        self._event.clear()
+        return signalled
+
+
+class WakeupQueue(Queue):
+    """
+    A queue that signals a :class:`Wakeup`, if one is attached, whenever an item is put into it.
+
+    >>> wakeup = Wakeup()
+    >>> queue = WakeupQueue()
+    >>> queue.put(1)
+    >>> wakeup.wait(0)
+    False
+    >>> queue.wakeup = wakeup
+    >>> queue.put(2)
+    >>> wakeup.wait(0)
+    True
+    """
+
+    def __init__(self, maxsize=0):
+        # Queue is an old-style class in Python 2, so we can't use super()
+        Queue.__init__(self, maxsize)
+        self.wakeup = None
+        """
+        :type: Wakeup
+        """
+
+    def _put(self, item):
+        Queue._put(self, item)
+        wakeup = self.wakeup
+        if wakeup is not None:
+            wakeup.signal()
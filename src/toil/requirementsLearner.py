@@ -0,0 +1,211 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import copy
+import logging
+import math
+import time
+from collections import deque
+from threading import Lock
+
+# Python 3 compatibility imports
+from six import iteritems
+from six.moves import cPickle
+
+from toil.job import ServiceJobNode
+from toil.jobStores.abstractJobStore import NoSuchFileException
+
+logger = logging.getLogger( __name__ )
+
+
+class RequirementsLearner(object):
+    """
+    Learns the memory, cores and disk the jobs of each class actually use from the stats the
+    workers report, so that the leader can issue jobs with requirements closer to their usage
+    than what they request, packing more jobs onto each node.
+
+    Jobs are grouped into classes by their name. The learned requirement of a class is a high
+    percentile of the usage of its most recently finished jobs, plus some headroom. Classes with
+    fewer than :attr:`minimumJobs` finished jobs are issued as requested. Requirements are only
+    ever lowered, and a job that fails is issued with its requested requirements from then on,
+    see :meth:`toil.jobGraph.JobGraph.setupJobAfterFailure`.
+
+    The memory a worker reports is the peak memory of its whole process, and the disk is the
+    size of the job's temporary directory at the end of its run.
+
+    >>> learner = RequirementsLearner(jobStore=None)
+    >>> for i in range(10):
+    ...     learner.addUsage('sort', memory=100 + i, cores=0.5, disk=10)
+    >>> learner.getRequirement('sort', 'memory')
+    131
+    >>> learner.getRequirement('align', 'memory') is None
+    True
+    """
+    fileName = 'learnedRequirements.pickle'
+
+    # The number of finished jobs of a class needed before its requirements are learned
+    minimumJobs = 5
+
+    # The number of recently finished jobs of a class whose usage is kept
+    windowSize = 100
+
+    # The percentile of the usage of a class its learned requirements are based on
+    percentile = 95
+
+    # The factor applied to the percentile of the usage
+    headroom = 1.2
+
+    # The smallest number of cores a job is issued with
+    minimumCores = 0.1
+
+    # The number of seconds between writing the learned usage to the job store
+    saveInterval = 300
+
+    resources = ('memory', 'cores', 'disk')
+
+    def __init__(self, jobStore, usage=None):
+        """
+        :param toil.jobStores.abstractJobStore.AbstractJobStore jobStore: the job store the
+               learned usage is kept in
+        :param dict usage: maps job class and resource to a list of the usage of finished jobs,
+               as returned by :meth:`load`
+        """
+        self.jobStore = jobStore
+        # Usage is added by the stats and logging thread and read by the leader's main loop
+        self._lock = Lock()
+        self._usage = {}
+        for jobClass, resourceUsage in iteritems(usage or {}):
+            for resource, values in iteritems(resourceUsage):
+                self._getUsage(jobClass, resource).extend(values)
+        self.lastSaveTime = time.time()
+
+    def _getUsage(self, jobClass, resource):
+        try:
+            return self._usage[jobClass][resource]
+        except KeyError:
+            return self._usage.setdefault(jobClass, {}).setdefault(
+                resource, deque(maxlen=self.windowSize))
+
+    def addUsage(self, jobClass, **usage):
+        """
+        Record the resources a finished job of the given class used.
+
+        :param str jobClass: the name of the job
+        :param usage: the memory and disk in bytes and the cores the job used, each may be
+               missing
+        """
+        with self._lock:
+            for resource in self.resources:
+                if usage.get(resource) is not None:
+                    self._getUsage(jobClass, resource).append(usage[resource])
+
+    def addJobStats(self, jobStats):
+        """
+        Record the resources used by a job from the stats reported by its worker.
+
+        :param bd2k.util.expando.Expando jobStats: an entry of the jobs in the stats of a worker
+        """
+        try:
+            jobClass = jobStats.job_name
+        except AttributeError:
+            # Reported by a worker that does not report the job name
+            return
+        wallTime = float(jobStats.time)
+        try:
+            disk = int(jobStats.disk)
+        except (AttributeError, ValueError):
+            disk = None
+        # The worker reports its peak memory in KiB
+        self.addUsage(jobClass, memory=int(jobStats.memory) * 1024, disk=disk,
+                      cores=float(jobStats.clock) / wallTime if wallTime > 0 else None)
+
+    def getRequirement(self, jobClass, resource):
+        """
+        Returns the learned requirement of the given resource for the jobs of the given class,
+        or None if too few of them have finished.
+
+        :rtype: int|float|None
+        """
+        with self._lock:
+            try:
+                values = sorted(self._usage[jobClass][resource])
+            except KeyError:
+                return None
+        if len(values) < self.minimumJobs:
+            return None
+        rank = int(math.ceil(self.percentile / 100.0 * len(values))) - 1
+        requirement = values[rank] * self.headroom
+        if resource == 'cores':
+            return max(requirement, self.minimumCores)
+        return int(math.ceil(requirement))
+
+    def rightSize(self, jobNode):
+        """
+        Returns the given job with its requirements lowered to the learned requirements of its
+        class, if they are lower than the requested ones.
+
+        :param toil.job.JobNode jobNode: the job about to be issued, which is left unchanged
+        :rtype: toil.job.JobNode
+        """
+        # Services run for as long as they are needed, their usage says nothing about others
+        if isinstance(jobNode, ServiceJobNode):
+            return jobNode
+        requirements = {}
+        for resource in self.resources:
+            requirement = self.getRequirement(jobNode.jobName, resource)
+            if requirement is not None and requirement < getattr(jobNode, resource):
+                requirements[resource] = requirement
+        if not requirements:
+            return jobNode
+        logger.debug('Issuing job %s with the learned requirements %s', jobNode, requirements)
+        jobNode = copy.copy(jobNode)
+        for resource, requirement in iteritems(requirements):
+            setattr(jobNode, '_' + resource, requirement)
+        return jobNode
+
+    def isDue(self):
+        """
+        Returns True if it is time to write the learned usage to the job store again.
+        """
+        return time.time() - self.lastSaveTime >= self.saveInterval
+
+    def save(self):
+        """
+        Writes the learned usage to the job store.
+        """
+        with self._lock:
+            usage = {jobClass: {resource: list(values)
+                                for resource, values in iteritems(resourceUsage)}
+                     for jobClass, resourceUsage in iteritems(self._usage)}
+        with self.jobStore.writeSharedFileStream(self.fileName) as fileHandle:
+            cPickle.dump(usage, fileHandle, cPickle.HIGHEST_PROTOCOL)
+        self.lastSaveTime = time.time()
+
+    @classmethod
+    def load(cls, jobStore):
+        """
+        Returns a learner for the given job store, knowing the usage learned by a previous run of
+        the workflow, if any.
+
+        :param toil.jobStores.abstractJobStore.AbstractJobStore jobStore:
+        :rtype: RequirementsLearner
+        """
+        try:
+            with jobStore.readSharedFileStream(cls.fileName) as fileHandle:
+                usage = cPickle.load(fileHandle)
+        except NoSuchFileException:
+            usage = None
+        return cls(jobStore, usage=usage)
@@ -31,7 +31,6 @@ from urllib2 import HTTPError
 from zipfile import ZipFile, PyZipFile
 
 # Python 3 compatibility imports
-from bd2k.util.retry import retry
 from six.moves.urllib.request import urlopen
 
 from bd2k.util import strict_bool
@@ -235,6 +234,8 @@ class Resource(namedtuple('Resource', ('name', 'pathHash', 'url', 'contentHash')
 
         :type dstFile: io.BytesIO|io.FileIO
         """
+        # Imported here since the module is slow to import and most workers don't download
+        from bd2k.util.retry import retry
         for attempt in retry(predicate=lambda e: isinstance(e, HTTPError) and e.code == 400):
             with attempt:
                 with closing(urlopen(self.url)) as content:
@@ -570,6 +571,30 @@ class ModuleDescriptor(namedtuple('ModuleDescriptor', ('dirPath', 'name', 'fromV
             sys.path.append(module.dirPath)
         return module
 
+    @property
+    def contentHash(self):
+        """
+        An MD5 checksum of this module. If the module was hot-deployed, this is the content hash
+        of its resource. Otherwise it is the checksum of the source file of the module, which is
+        loaded if it hasn't been already.
+
+        :rtype: str
+        """
+        if not self.belongsToToil:
+            resource = Resource.lookup(self._resourcePath)
+            if resource is not None:
+                return resource.contentHash
+        try:
+            module = sys.modules[self.name]
+        except KeyError:
+            module = self.load()
+        path = module.__file__
+        root, ext = os.path.splitext(path)
+        if ext != '.py' and os.path.exists(root + '.py'):
+            path = root + '.py'
+        with open(path, 'rb') as f:
+            return hashlib.md5(f.read()).hexdigest()
+
     def load(self):
         module = self.makeLoadable()
         try:
@@ -0,0 +1,155 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import struct
+import zlib
+
+# Python 3 compatibility imports
+from six.moves import cPickle
+
+
+class Serialiser(object):
+    """
+    Pickles the objects a workflow keeps in its job store, i.e. its jobs, job graphs and promised
+    values, with the highest pickle protocol, compressing pickles of at least a given size.
+
+    Serialised data starts with a header made of :attr:`magic`, the version of the format and the
+    compression method of the rest of the data. Data without the header is a plain pickle, as
+    written before the header was introduced, so any serialised data can be decoded regardless of
+    how the serialiser that encoded it was configured.
+
+    >>> serialiser = Serialiser(compression='zlib', compressionThreshold=100)
+    >>> serialiser.loads(serialiser.dumps('x' * 10)) == 'x' * 10
+    True
+    >>> len(serialiser.dumps('x' * 1000)) < 100
+    True
+    >>> Serialiser.loads(cPickle.dumps(42))
+    42
+    """
+    # No pickle starts with a null byte
+    magic = b'\0toil'
+
+    version = 1
+
+    # The compression methods by name, each with the number identifying it in the header
+    compressions = {'none': 0, 'zlib': 1, 'lz4': 2}
+
+    _header = struct.Struct('!%isBB' % len(magic))
+
+    def __init__(self, compression='none', compressionThreshold=16 * 1024):
+        """
+        :param str compression: the name of the method used to compress large pickles, one of
+               the keys of :attr:`compressions`. The lz4 method requires the lz4 package.
+        :param int compressionThreshold: the minimum size of a pickle in bytes for it to be
+               compressed
+        """
+        if compression not in self.compressions:
+            raise ValueError("Unknown compression method '%s'" % compression)
+        if compression == 'lz4':
+            # Fail early if the optional dependency is missing
+            self._lz4()
+        self.compression = compression
+        self.compressionThreshold = compressionThreshold
+
+    @classmethod
+    def fromConfig(cls, config, defaultCompression='none'):
+        """
+        :param toil.common.Config config:
+        :param str defaultCompression: the compression method used if the config doesn't specify
+               one
+        :rtype: Serialiser
+        """
+        return cls(compression=config.serialisationCompression or defaultCompression,
+                   compressionThreshold=config.serialisationCompressionThreshold)
+
+    def dumps(self, obj):
+        """
+        :return: the serialised form of the given object
+        :rtype: bytes
+        """
+        return self.encode(cPickle.dumps(obj, cPickle.HIGHEST_PROTOCOL))
+
+    @classmethod
+    def loads(cls, data):
+        """
+        :param bytes data: an object serialised by any serialiser, or a plain pickle
+        :return: the object
+        """
+        return cPickle.loads(cls.decode(data))
+
+    def encode(self, pickled):
+        """
+        Adds the header to the given pickle, or to several concatenated ones, compressing them
+        if they are large enough.
+
+        :param bytes pickled:
+        :rtype: bytes
+        """
+        compression = 'none'
+        if self.compression != 'none' and len(pickled) >= self.compressionThreshold:
+            compressed = self._compress(self.compression, pickled)
+            # Incompressible data, e.g. random bytes, is stored as is
+            if len(compressed) < len(pickled):
+                compression, pickled = self.compression, compressed
+        return self._header.pack(self.magic, self.version, self.compressions[compression]) + pickled
+
+    @classmethod
+    def decode(cls, data):
+        """
+        The inverse of :meth:`encode`.
+
+        :param bytes data: data encoded by any serialiser, or a plain pickle
+        :return: the pickle
+        :rtype: bytes
+        """
+        if not data.startswith(cls.magic):
+            return data
+        magic, version, compressionID = cls._header.unpack_from(data)
+        if version > cls.version:
+            raise RuntimeError("The data was serialised by a newer version of Toil, format "
+                               "version %i" % version)
+        pickled = data[cls._header.size:]
+        for compression, knownID in cls.compressions.items():
+            if knownID == compressionID:
+                return cls._decompress(compression, pickled)
+        raise RuntimeError("Unknown compression method %i" % compressionID)
+
+    @classmethod
+    def _compress(cls, compression, data):
+        if compression == 'zlib':
+            # The fastest level, most of the gain in size is had with it already
+            return zlib.compress(data, 1)
+        elif compression == 'lz4':
+            return cls._lz4().compress(data)
+        else:
+            assert False
+
+    @classmethod
+    def _decompress(cls, compression, data):
+        if compression == 'none':
+            return data
+        elif compression == 'zlib':
+            return zlib.decompress(data)
+        elif compression == 'lz4':
+            return cls._lz4().decompress(data)
+        else:
+            assert False
+
+    @staticmethod
+    def _lz4():
+        # Only imported when used since lz4 is an optional dependency
+        import lz4.frame
+        return lz4.frame
@@ -22,13 +22,19 @@ from threading import Thread, Event
 # Python 3 compatibility imports
 from six.moves.queue import Empty, Queue
 
+from toil.lib.threading import WakeupQueue
+
 logger = logging.getLogger( __name__ )
 
 class ServiceManager( object ):
     """
     Manages the scheduling of services.
     """
-    def __init__(self, jobStore, toilState):
+    def __init__(self, jobStore, toilState, wakeup=None):
+        """
+        :param toil.lib.threading.Wakeup wakeup: if given, signalled whenever a jobGraph whose
+               services are running or a service job to start becomes available
+        """
         self.jobStore = jobStore
         
         self.toilState = toilState
@@ -41,11 +47,13 @@ class ServiceManager( object ):
         self._jobGraphsWithServicesToStart = Queue() # This is the input queue of
         # jobGraphs that have services that need to be started
 
-        self._jobGraphsWithServicesThatHaveStarted = Queue() # This is the output queue
+        self._jobGraphsWithServicesThatHaveStarted = WakeupQueue() # This is the output queue
         # of jobGraphs that have services that are already started
+        self._jobGraphsWithServicesThatHaveStarted.wakeup = wakeup
 
-        self._serviceJobGraphsToStart = Queue() # This is the queue of services for the
+        self._serviceJobGraphsToStart = WakeupQueue() # This is the queue of services for the
         # batch system to start
+        self._serviceJobGraphsToStart.wakeup = wakeup
 
         self.jobsIssuedToServiceManager = 0 # The number of jobs the service manager
         # is scheduling
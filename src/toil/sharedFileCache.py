@@ -0,0 +1,181 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import base64
+import errno
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from io import BytesIO
+
+logger = logging.getLogger(__name__)
+
+
+class SharedFileCache(object):
+    """
+    A node-local copy of the shared files every worker reads before running its job, i.e. the
+    configuration and the environment of the workflow. The leader writes these files once when it
+    starts or restarts the workflow and passes their MD5 hashes to the workers in an environment
+    variable. The first worker on a node reads each file from the job store and saves it in the
+    workflow directory of the node, under its hash. Later workers on the node read it from there.
+
+    A file whose content doesn't match the hash the worker was given, e.g. because the workflow
+    was restarted since the worker was issued, is read from the job store and not cached.
+    """
+    environmentVariable = 'TOIL_SHARED_FILE_CACHE'
+
+    sharedFileNames = ('config.pickle', 'environment.pickle')
+
+    def __init__(self, jobStoreLocator, workflowID, workDir, contentHashes):
+        """
+        :param str jobStoreLocator: the locator of the job store holding the shared files
+        :param str workflowID: the ID of the workflow, see :meth:`toil.common.Toil.getWorkflowDir`
+        :param str workDir: the value of the --workDir option of the workflow
+        :param dict contentHashes: maps the names of the shared files to the MD5 hex digests of
+               their content
+        """
+        self.jobStoreLocator = jobStoreLocator
+        self.workflowID = workflowID
+        self.workDir = workDir
+        self.contentHashes = contentHashes
+
+    @classmethod
+    def create(cls, jobStore):
+        """
+        Hashes the shared files in the given job store. This method should be invoked on the
+        leader, after the files were written.
+
+        :param toil.jobStores.abstractJobStore.AbstractJobStore jobStore:
+        :rtype: SharedFileCache
+        """
+        contentHashes = {}
+        for sharedFileName in cls.sharedFileNames:
+            with jobStore.readSharedFileStream(sharedFileName) as f:
+                contentHashes[sharedFileName] = hashlib.md5(f.read()).hexdigest()
+        config = jobStore.config
+        return cls(jobStoreLocator=config.jobStore,
+                   workflowID=config.workflowID,
+                   workDir=config.workDir,
+                   contentHashes=contentHashes)
+
+    def register(self, batchSystem):
+        """
+        Passes this cache to the workers the given batch system starts.
+
+        :param toil.batchSystems.abstractBatchSystem.AbstractBatchSystem batchSystem:
+        """
+        batchSystem.setEnv(self.environmentVariable, self.pickle())
+
+    @classmethod
+    def lookup(cls, jobStoreLocator):
+        """
+        Returns the cache the leader passed to this worker, or None if the batch system doesn't
+        pass environment variables to workers or the variable was set for a different job store,
+        e.g. by the workflow of a job that runs a workflow of its own.
+
+        :param str jobStoreLocator: the locator of the job store of this worker
+        :rtype: SharedFileCache|None
+        """
+        try:
+            s = os.environ[cls.environmentVariable]
+        except KeyError:
+            return None
+        self = cls.unpickle(s)
+        if self.jobStoreLocator != jobStoreLocator:
+            return None
+        return self
+
+    def pickle(self):
+        """
+        :return: this cache as a string without commas or spaces, which some batch systems don't
+                 allow in the values of environment variables
+        :rtype: str
+        """
+        return base64.urlsafe_b64encode(json.dumps([self.jobStoreLocator, self.workflowID,
+                                                    self.workDir, self.contentHashes],
+                                                   separators=(',', ':')))
+
+    @classmethod
+    def unpickle(cls, s):
+        """
+        :rtype: SharedFileCache
+        """
+        return cls(*json.loads(base64.urlsafe_b64decode(s)))
+
+    @staticmethod
+    def dirName(workflowID):
+        """
+        :return: the name of the directory holding the cached files in the workflow directory
+        """
+        return 'sharedFiles-' + workflowID
+
+    def __contains__(self, sharedFileName):
+        return sharedFileName in self.contentHashes
+
+    @contextmanager
+    def readSharedFileStream(self, jobStore, sharedFileName):
+        """
+        Like :meth:`toil.jobStores.abstractJobStore.AbstractJobStore.readSharedFileStream` but
+        reads the given file from the cache, saving it there first if necessary.
+
+        :param toil.jobStores.abstractJobStore.AbstractJobStore jobStore: the job store to read
+               the file from if it isn't cached yet
+        :param str sharedFileName: the name of one of the files in :attr:`sharedFileNames`
+        """
+        contentHash = self.contentHashes[sharedFileName]
+        # Imported here to avoid a circular import
+        from toil.common import Toil
+        dirPath = os.path.join(Toil.getWorkflowDir(self.workflowID, self.workDir),
+                               self.dirName(self.workflowID))
+        filePath = os.path.join(dirPath, contentHash)
+        try:
+            f = open(filePath, 'rb')
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        else:
+            with f:
+                yield f
+            return
+        with jobStore.readSharedFileStream(sharedFileName) as f:
+            content = f.read()
+        if hashlib.md5(content).hexdigest() == contentHash:
+            self._save(dirPath, filePath, content)
+        else:
+            logger.warn("The shared file '%s' changed since this worker was issued, not caching "
+                        "it.", sharedFileName)
+        yield BytesIO(content)
+
+    @staticmethod
+    def _save(dirPath, filePath, content):
+        try:
+            os.mkdir(dirPath)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        fd, tempPath = tempfile.mkstemp(dir=dirPath)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            # Atomic, so that other workers only ever see the complete file. Workers that miss
+            # the file concurrently all save the same content.
+            os.rename(tempPath, filePath)
+        except:
+            os.unlink(tempPath)
+            raise
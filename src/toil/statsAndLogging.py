@@ -31,10 +31,14 @@ class StatsAndLogging( object ):
     Class manages a thread that aggregates statistics and logging information on a toil run.
     """
 
-    def __init__(self, jobStore, config):
+    def __init__(self, jobStore, config, requirementsLearner=None):
+        """
+        :param toil.requirementsLearner.RequirementsLearner requirementsLearner: if not None,
+               learns from the resources used by the jobs in the stats of the workers
+        """
         self._stop = Event()
         self._worker = Thread(target=self.statsAndLoggingAggregator,
-                              args=(jobStore, self._stop, config))
+                              args=(jobStore, self._stop, config, requirementsLearner))
 
     def start(self):
         """
@@ -85,7 +89,7 @@ class StatsAndLogging( object ):
             os.symlink(os.path.relpath(fullName, path), name)
 
     @classmethod
-    def statsAndLoggingAggregator(cls, jobStore, stop, config):
+    def statsAndLoggingAggregator(cls, jobStore, stop, config, requirementsLearner=None):
         """
         The following function is used for collating stats/reporting log messages from the workers.
         Works inside of a thread, collates as long as the stop flag is not True.
@@ -120,6 +124,9 @@ class StatsAndLogging( object ):
                 messages = logs.messages
                 logWithFormatting(jobNames[0], messages)
                 cls.writeLogFiles(jobNames, messages, config=config)
+            if requirementsLearner is not None:
+                for jobStats in stats.get('jobs', ()):
+                    requirementsLearner.addJobStats(jobStats)
 
         while True:
             # This is a indirect way of getting a message to the thread to exit
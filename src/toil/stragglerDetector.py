@@ -0,0 +1,147 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import logging
+import time
+from collections import defaultdict, deque
+
+from toil.job import ServiceJobNode
+
+logger = logging.getLogger( __name__ )
+
+
+class StragglerDetector(object):
+    """
+    Finds the issued jobs that have run for much longer than the finished jobs of the same class,
+    so that the leader can issue a second attempt of them, and tracks the attempts of each such
+    job until one of them wins.
+
+    Jobs are grouped into classes by their name, like the jobs of the
+    :class:`toil.criticalPath.CriticalPathEstimator`. A job is a straggler once it has run for
+    longer than the given multiple of the median wall time of the most recently finished jobs of
+    its class. Classes with fewer than :attr:`minimumJobs` finished jobs have no stragglers.
+
+    >>> detector = StragglerDetector(multiple=2)
+    >>> for wallTime in (1, 2, 10):
+    ...     detector.addWallTime('align', wallTime)
+    >>> detector.getMedianWallTime('align')
+    2
+    >>> detector.getMedianWallTime('sort') is None
+    True
+    """
+    # The number of finished jobs of a class needed before its jobs can be stragglers
+    minimumJobs = 3
+
+    # The number of recently finished jobs of a class whose wall times the median is taken of
+    windowSize = 100
+
+    # The number of seconds between checks for stragglers
+    checkInterval = 10
+
+    def __init__(self, multiple):
+        """
+        :param float multiple: the multiple of the median wall time of its class after which a
+               running job is a straggler
+        """
+        self.multiple = multiple
+        self._wallTimes = defaultdict(lambda: deque(maxlen=self.windowSize))
+        # Maps the jobStoreIDs of the jobs that were issued more than once to the batch system
+        # IDs of their attempts that are still issued
+        self._attempts = {}
+        self.lastCheckTime = 0
+
+    def isDue(self):
+        """
+        Returns True if it is time to check for stragglers again.
+        """
+        return time.time() - self.lastCheckTime >= self.checkInterval
+
+    def addWallTime(self, jobClass, wallTime):
+        """
+        Record the wall time of a finished job of the given class.
+        """
+        self._wallTimes[jobClass].append(wallTime)
+
+    def addCompletedJob(self, jobNode, wallTime):
+        """
+        Record the wall time of the given finished job.
+
+        :param toil.job.JobNode jobNode:
+        :param float wallTime: the wall time the job ran for, as reported by the batch system
+        """
+        self.addWallTime(jobNode.jobName, wallTime)
+
+    def getMedianWallTime(self, jobClass):
+        """
+        Returns the median wall time of the recently finished jobs of the given class, or None if
+        too few of them have finished.
+
+        :rtype: float|None
+        """
+        wallTimes = self._wallTimes.get(jobClass)
+        if wallTimes is None or len(wallTimes) < self.minimumJobs:
+            return None
+        wallTimes = sorted(wallTimes)
+        middle = len(wallTimes) // 2
+        if len(wallTimes) % 2:
+            return wallTimes[middle]
+        return (wallTimes[middle - 1] + wallTimes[middle]) / 2.0
+
+    def findStragglers(self, issuedJobs, runningJobs):
+        """
+        Returns the running jobs that are stragglers and have not been issued more than once.
+
+        :param dict issuedJobs: maps the batch system IDs of the issued jobs to their JobNodes
+        :param dict runningJobs: maps the batch system IDs of the running jobs to the number of
+               seconds they have been running for
+        :return: the batch system IDs of the stragglers
+        :rtype: list
+        """
+        self.lastCheckTime = time.time()
+        stragglers = []
+        for jobBatchSystemID, runningTime in runningJobs.items():
+            jobNode = issuedJobs.get(jobBatchSystemID)
+            # Services run until they are told to stop
+            if (jobNode is None or isinstance(jobNode, ServiceJobNode)
+                    or jobNode.jobStoreID in self._attempts):
+                continue
+            medianWallTime = self.getMedianWallTime(jobNode.jobName)
+            if medianWallTime is not None and runningTime > self.multiple * medianWallTime:
+                logger.debug('Job %s has been running for %.0f seconds, the median wall time of '
+                             'its class is %.0f seconds', jobNode, runningTime, medianWallTime)
+                stragglers.append(jobBatchSystemID)
+        return stragglers
+
+    def addAttempts(self, jobStoreID, jobBatchSystemIDs):
+        """
+        Record that the given batch system jobs are attempts of the same job.
+        """
+        self._attempts.setdefault(jobStoreID, set()).update(jobBatchSystemIDs)
+
+    def removeAttempt(self, jobStoreID, jobBatchSystemID):
+        """
+        Forget the given attempt of a job.
+
+        :return: the batch system IDs of the other attempts of the job that are still issued
+        :rtype: list
+        """
+        attempts = self._attempts.get(jobStoreID)
+        if attempts is None:
+            return []
+        attempts.discard(jobBatchSystemID)
+        if not attempts:
+            del self._attempts[jobStoreID]
+        return list(attempts)
@@ -36,7 +36,9 @@ from toil.batchSystems.singleMachine import SingleMachineBatchSystem
 from toil.batchSystems.abstractBatchSystem import (InsufficientSystemResources,
                                                    AbstractBatchSystem,
                                                    BatchSystemSupport)
+from toil.batchSystems.abstractGridEngineBatchSystem import AbstractGridEngineBatchSystem
 from toil.job import Job, JobNode
+from toil.lib.threading import Wakeup
 from toil.test import (ToilTest,
                        needs_mesos,
                        needs_parasol,
@@ -165,6 +167,48 @@ class hidden:
             # Make sure killBatchJobs can handle jobs that don't exist
             self.batchSystem.killBatchJobs([10])
 
+        def testGetUpdatedBatchJobs(self):
+            jobIDs = set()
+            for i in range(3):
+                jobNode = JobNode(command='true', jobName='test%i' % i, unitName=None,
+                                  jobStoreID=str(i), requirements=defaultRequirements)
+                jobIDs.add(self.batchSystem.issueBatchJob(jobNode))
+            updatedJobIDs = set()
+            while len(updatedJobIDs) < len(jobIDs):
+                updatedJobs = self.batchSystem.getUpdatedBatchJobs(maxWait=1000, maxCount=2)
+                self.assertTrue(1 <= len(updatedJobs) <= 2)
+                for jobID, exitStatus, wallTime in updatedJobs:
+                    self.assertEqual(exitStatus, 0)
+                    self.assertNotIn(jobID, updatedJobIDs)
+                    updatedJobIDs.add(jobID)
+            self.assertEqual(updatedJobIDs, jobIDs)
+            self.assertEqual(self.batchSystem.getUpdatedBatchJobs(0), [])
+
+        def testIssueBatchJobs(self):
+            jobNodes = [JobNode(command='true', jobName='test%i' % i, unitName=None,
+                                jobStoreID=str(i), requirements=defaultRequirements)
+                        for i in range(3)]
+            jobIDs = self.batchSystem.issueBatchJobs(jobNodes)
+            self.assertEqual(len(set(jobIDs)), len(jobNodes))
+            self.assertEqual(set(jobIDs), set(self.batchSystem.getIssuedBatchJobIDs()))
+            updatedJobIDs = set()
+            while len(updatedJobIDs) < len(jobIDs):
+                for jobID, exitStatus, wallTime in self.batchSystem.getUpdatedBatchJobs(maxWait=1000):
+                    self.assertEqual(exitStatus, 0)
+                    updatedJobIDs.add(jobID)
+            self.assertEqual(updatedJobIDs, set(jobIDs))
+
+        def testSetWakeup(self):
+            wakeup = Wakeup()
+            self.batchSystem.setWakeup(wakeup)
+            self.assertFalse(wakeup.wait(0))
+            jobNode = JobNode(command='true', jobName='test1', unitName=None,
+                              jobStoreID='1', requirements=defaultRequirements)
+            jobID = self.batchSystem.issueBatchJob(jobNode)
+            self.assertTrue(wakeup.wait(1000))
+            updatedJobs = self.batchSystem.getUpdatedBatchJobs(0)
+            self.assertEqual([(jobID, 0)], [updatedJob[:2] for updatedJob in updatedJobs])
+
         def testSetEnv(self):
             # Parasol disobeys shell rules and stupidly splits the command at the space character
             # before exec'ing it, whether the space is quoted, escaped or not. This means that we
@@ -654,6 +698,74 @@ class TorqueBatchSystemTest(hidden.AbstractGridEngineBatchSystemTest):
         for f in glob('toil_job_*.[oe]*'):
             os.unlink(f)
 
+class GridEngineArrayJobTest(ToilTest):
+    """
+    Tests the submission of jobs with the same requirements as array jobs by the grid engine
+    worker, without a grid engine
+    """
+
+    class Worker(AbstractGridEngineBatchSystem.Worker):
+        def __init__(self, boss):
+            super(GridEngineArrayJobTest.Worker, self).__init__(
+                newJobsQueue=None, updatedJobsQueue=None, killQueue=None,
+                killedJobsQueue=None, boss=boss)
+            self.submissions = []
+
+        def supportsArrayJobs(self):
+            return True
+
+        def prepareSubmission(self, cpu, memory, jobID, command):
+            return [command]
+
+        def submitJob(self, subLine):
+            self.submissions.append(subLine)
+            return len(self.submissions)
+
+        def prepareArraySubmission(self, cpu, memory, jobIDs, commands):
+            return commands, self.arrayJobScript('TASK_ID', commands)
+
+        def submitArrayJob(self, subLine, script):
+            self.submissions.append(subLine)
+            return len(self.submissions)
+
+        def getRunningJobIDs(self):
+            return {}
+
+        def killJob(self, jobID):
+            pass
+
+        def getJobExitCode(self, batchJobID):
+            return None
+
+    class Boss(object):
+        maxCores = 4
+
+        @classmethod
+        def maxArraySize(cls):
+            return 2
+
+    def testCreateJobs(self):
+        worker = self.Worker(self.Boss())
+        worker.createJobs([(0, 1, 100, 'a'), (1, 2, 100, 'b'), (2, 1, 100, 'c'), (3, 1, 100, 'd')])
+        # Jobs with the same requirements are grouped, up to the maximum array size, until the
+        # maximum number of cores is allocated
+        self.assertEqual(worker.submissions, [['a', 'c'], ['b']])
+        self.assertEqual(worker.getBatchSystemID(0), '1.1')
+        self.assertEqual(worker.getBatchSystemID(2), '1.2')
+        self.assertEqual(worker.getBatchSystemID(1), '2')
+        self.assertEqual(worker.waitingJobs, [(3, 1, 100, 'd')])
+
+    def testArrayJobScript(self):
+        script = AbstractGridEngineBatchSystem.Worker.arrayJobScript('TASK_ID', ['echo a', 'echo b'])
+        for task, output in ((1, 'a'), (2, 'b')):
+            env = dict(os.environ, TASK_ID=str(task))
+            process = subprocess.Popen(['bash'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                       env=env)
+            stdout, _ = process.communicate(script)
+            self.assertEqual(process.returncode, 0)
+            self.assertEqual(stdout.strip(), output)
+
+
 class SingleMachineBatchSystemJobTest(hidden.AbstractBatchSystemJobTest):
     """
     Tests Toil workflow against the SingleMachine batch system
@@ -0,0 +1,158 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures the time the single machine batch system spends on each short job with and without
+workers forked by the fork server. The unit tests run small workflows. Larger ones can be
+benchmarked from the command line, e.g.
+
+    python -m toil.test.batchSystems.forkServerTest --numJobs 500
+"""
+
+from __future__ import absolute_import, division
+
+import logging
+import os
+import tempfile
+import shutil
+import time
+from argparse import ArgumentParser
+
+from toil.common import Config, Toil
+from toil.job import Job
+from toil.test import ToilTest
+from toil.utils.toilStats import getStats, processData
+
+logger = logging.getLogger(__name__)
+
+# Set by the jobs of the test workflow, a job forked from a fresh server must never see it
+_jobRan = False
+
+
+def trivialFn(job, outputDir):
+    pass
+
+
+def isolationFn(job, outputDir):
+    global _jobRan
+    assert not _jobRan
+    _jobRan = True
+    assert os.environ['FORK_SERVER_TEST'] == 'set by the leader'
+    assert 'FORK_SERVER_TEST_JOB' not in os.environ
+    os.environ['FORK_SERVER_TEST_JOB'] = 'set by a job'
+    open(os.path.join(outputDir, str(os.getpid())), 'w').close()
+
+
+def delayedChildrenFn(job, seconds):
+    time.sleep(seconds)
+    for _ in range(2):
+        job.addChildJobFn(trivialFn, None)
+
+
+def runWorkflow(jobStore, numJobs, forkServer, jobFn=trivialFn, outputDir=None):
+    """
+    Runs a workflow of the given number of jobs that each run in their own worker.
+
+    :return: the number of seconds the workflow took
+    :rtype: float
+    """
+    options = Job.Runner.getDefaultOptions(jobStore)
+    options.singleMachineForkServer = forkServer
+    options.environment = ['FORK_SERVER_TEST=set by the leader']
+    options.logLevel = 'WARNING'
+    root = Job()
+    for _ in range(numJobs):
+        root.addChildJobFn(jobFn, outputDir)
+    start = time.time()
+    with Toil(options) as toil:
+        toil.start(root)
+    return time.time() - start
+
+
+def compareOverhead(numJobs, tempDir):
+    """
+    Runs the same workflow with and without the fork server.
+
+    :return: the seconds per job taken without and with the fork server
+    :rtype: tuple
+    """
+    secondsPerJob = []
+    for forkServer in (False, True):
+        duration = runWorkflow(os.path.join(tempDir, 'jobStore%s' % forkServer), numJobs,
+                               forkServer)
+        secondsPerJob.append(duration / numJobs)
+    withoutServer, withServer = secondsPerJob
+    logger.warn('Ran %i jobs in %.3fs per job without the fork server and %.3fs per job with it, '
+                'saving %.3fs per job.', numJobs, withoutServer, withServer,
+                withoutServer - withServer)
+    return withoutServer, withServer
+
+
+class ForkServerTest(ToilTest):
+    """
+    Tests running workflows with workers forked by the fork server of the single machine batch
+    system.
+    """
+
+    def testIsolation(self):
+        outputDir = self._createTempDir()
+        runWorkflow(self._getTestJobStorePath(), numJobs=5, forkServer=True, jobFn=isolationFn,
+                    outputDir=outputDir)
+        # Each job ran in a worker process of its own
+        self.assertEqual(len(os.listdir(outputDir)), 5)
+
+    def testStartupStats(self):
+        """
+        Tests that the startup of a forked worker is measured from the fork, not from the time
+        the fork server imported the worker.
+        """
+        options = Job.Runner.getDefaultOptions(self._getTestJobStorePath())
+        options.singleMachineForkServer = True
+        options.clean = 'never'
+        options.stats = True
+        options.profileWorkerStartup = True
+        options.logLevel = 'WARNING'
+        # The children are forked long after the server imported the worker
+        Job.Runner.startToil(Job.wrapJobFn(delayedChildrenFn, 5), options)
+        config = Config()
+        config.setOptions(options)
+        jobStore = Toil.resumeJobStore(config.jobStore)
+        try:
+            collatedStats = processData(jobStore.config, getStats(jobStore))
+        finally:
+            jobStore.destroy()
+        self.assertLess(collatedStats.worker_startup.imports, 1)
+
+    def testOverhead(self):
+        # Only checks that the benchmark runs, wall clock times are too noisy to compare here
+        withoutServer, withServer = compareOverhead(numJobs=5, tempDir=self._createTempDir())
+        self.assertGreater(withoutServer, 0)
+        self.assertGreater(withServer, 0)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--numJobs', type=int, default=100,
+                        help='The number of jobs in each workflow.')
+    options = parser.parse_args()
+    logging.basicConfig(level=logging.WARN)
+    tempDir = tempfile.mkdtemp()
+    try:
+        compareOverhead(options.numJobs, tempDir)
+    finally:
+        shutil.rmtree(tempDir)
+
+
+if __name__ == '__main__':
+    main()
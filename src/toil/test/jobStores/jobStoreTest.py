@@ -263,6 +263,11 @@ class AbstractJobStoreTest:
             self.assertUrl(master.getSharedPublicUrl('nonEncrypted'))
             self.assertRaises(NoSuchFileException, master.getSharedPublicUrl, 'missing')
 
+            # Delete a shared file, deleting a missing one is a no-op
+            master.deleteSharedFile('foo')
+            self.assertRaises(NoSuchFileException, worker.readSharedFileStream('foo').__enter__)
+            master.deleteSharedFile('missing')
+
             # Test per-job files: Create empty file on master, ...
             #
             # First recreate job
@@ -620,6 +625,66 @@ class AbstractJobStoreTest:
                 self.assertEquals(f.read(), "")
             self.master.delete(job.jobStoreID)
 
+        def testBatchedJobsAndFiles(self):
+            master = self.master
+            rootJob = master.createRootJob(self.arbitraryJob)
+            # More than fit into a single batch of any job store
+            numJobs = 120
+            jobNodes = [JobNode(command='child%i' % i, jobStoreID=None, jobName='child',
+                                unitName=None, requirements=self.arbitraryRequirements)
+                        for i in range(numJobs)]
+            children = master.createMany(jobNodes)
+            self.assertEqual([child.command for child in children],
+                             ['child%i' % i for i in range(numJobs)])
+            self.assertEqual(len(set(child.jobStoreID for child in children)), numJobs)
+            for child in children:
+                self.assertEqual(master.load(child.jobStoreID), child)
+            for child in children:
+                child.command = child.command.replace('child', 'updated')
+            master.updateMany(children)
+            self.assertEqual([master.load(child.jobStoreID).command for child in children],
+                             ['updated%i' % i for i in range(numJobs)])
+            # Including a file that is too large to be written in one piece
+            contents = ['content%i' % i for i in range(numJobs)]
+            contents += [os.urandom(self._partSize() + 1), '']
+            fileIDs = master.writeFilesMany(contents, rootJob.jobStoreID)
+            self.assertEqual(len(set(fileIDs)), len(contents))
+            for fileID, content in zip(fileIDs, contents):
+                with master.readFileStream(fileID) as f:
+                    self.assertEqual(f.read(), content)
+            self.assertEqual(master.writeFilesMany([]), [])
+            # The files are associated with the job
+            master.delete(rootJob.jobStoreID)
+            for fileID in fileIDs:
+                self.assertFalse(master.fileExists(fileID))
+
+        def testBatchedFileReadsAndUpdates(self):
+            master = self.master
+            # More than fit into a single request of any job store, including a file that is too
+            # large to be written in one piece
+            contents = ['content%i' % i for i in range(50)] + [os.urandom(self._partSize() + 1)]
+            fileIDs = master.writeFilesMany(contents)
+            self.assertEqual(master.readFilesMany(fileIDs), contents)
+            self.assertEqual(master.readFilesMany([]), [])
+            master.deleteFile(fileIDs[0])
+            self.assertRaises(NoSuchFileException, master.readFilesMany, fileIDs)
+            # Files that don't exist are skipped
+            updates = {fileID: 'updated' + content[:8] for fileID, content in zip(fileIDs, contents)}
+            master.updateFilesMany(updates)
+            self.assertFalse(master.fileExists(fileIDs[0]))
+            self.assertEqual(master.readFilesMany(fileIDs[1:]),
+                             [updates[fileID] for fileID in fileIDs[1:]])
+
+        def testCompressedJobs(self):
+            master = self.master
+            for compression in ('none', 'zlib'):
+                master.config.serialisationCompression = compression
+                master.config.serialisationCompressionThreshold = 0
+                job = master.create(self.arbitraryJob)
+                job.command = 'command ' * 10000
+                master.update(job)
+                self.assertEqual(master.load(job.jobStoreID).command, job.command)
+
         def testLargeFile(self):
             dirPath = self._createTempDir()
             filePath = os.path.join(dirPath, 'large')
@@ -789,6 +854,19 @@ class FileJobStoreTest(AbstractJobStoreTest.Test):
         assert isinstance(self.master, FileJobStore)  # type hint
         shutil.rmtree(self.master.jobStoreDir)
 
+    def testJobCommitClaims(self):
+        master = self.master
+        worker = self._createJobStore()
+        worker.resume()
+        self.assertTrue(master.supportsJobCommitClaims())
+        job = master.create(self.arbitraryJob)
+        self.assertTrue(worker.claimJobCommit(job.jobStoreID, 'a'))
+        self.assertFalse(master.claimJobCommit(job.jobStoreID, 'a'))
+        # Each issue of the job has its own token
+        self.assertTrue(master.claimJobCommit(job.jobStoreID, 'b'))
+        master.delete(job.jobStoreID)
+        self.assertFalse(worker.claimJobCommit(job.jobStoreID, 'c'))
+
     def _prepareTestFile(self, dirPath, size=None):
         fileName = 'testfile_%s' % uuid.uuid4()
         localFilePath = dirPath + fileName
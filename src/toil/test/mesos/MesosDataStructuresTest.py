@@ -76,3 +76,16 @@ class DataStructuresTest(ToilTest):
         self.assertEqual(len(jobQueue.jobIDs()), testJobs)
         # Ensure FIFO
         self.assertIs(testJob, tmpJob)
+
+    def testJobQueuePriority(self):
+        from toil.batchSystems.mesos import JobQueue
+        jobQueue = JobQueue()
+        lowJob, highJob, otherLowJob = (self._getJob() for _ in range(3))
+        jobType = lowJob.resources
+        jobQueue.insertJob(lowJob, jobType, priority=1)
+        jobQueue.insertJob(highJob, jobType, priority=10)
+        jobQueue.insertJob(otherLowJob, jobType, priority=1)
+        self.assertIs(jobQueue.nextJobOfType(jobType), highJob)
+        self.assertIs(jobQueue.nextJobOfType(jobType), lowJob)
+        self.assertIs(jobQueue.nextJobOfType(jobType), otherLowJob)
+        self.assertTrue(jobQueue.typeEmpty(jobType))
@@ -0,0 +1,95 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import os
+
+from toil.common import Toil
+from toil.job import Job
+from toil.test import ToilTest
+from toil.utils.toilStats import getStats, processData
+
+
+class CallCacheTest(ToilTest):
+    """
+    Tests skipping jobs whose return values are in the call cache.
+    """
+
+    def setUp(self):
+        super(CallCacheTest, self).setUp()
+        self.cacheLocator = 'file:' + self._getTestJobStorePath()
+        self.counterFile = os.path.join(self._createTempDir(), 'counter')
+
+    def tearDown(self):
+        Toil.resumeJobStore(self.cacheLocator).destroy()
+        super(CallCacheTest, self).tearDown()
+
+    def _runWorkflow(self, text):
+        """
+        Runs a workflow passing a file with the given text to a job that is counted and returns
+        the return value of the workflow and the call cache hits and misses of its stats.
+        """
+        options = Job.Runner.getDefaultOptions(self._getTestJobStorePath())
+        options.logLevel = 'DEBUG'
+        options.callCache = self.cacheLocator
+        options.stats = True
+        with Toil(options) as toil:
+            returnValue = toil.start(Job.wrapJobFn(parentFn, self.counterFile, text))
+        jobStore = Toil.resumeJobStore(toil.config.jobStore)
+        try:
+            stats = processData(jobStore.config, getStats(jobStore))
+        finally:
+            jobStore.destroy()
+        return returnValue, stats.call_cache_hits, stats.call_cache_misses
+
+    def _runCount(self):
+        with open(self.counterFile) as f:
+            return len(f.readlines())
+
+    def testCallCache(self):
+        # The parent adds successors, so it is never cached
+        self.assertEqual(self._runWorkflow('foo'), ('FOO', 0, 3))
+        self.assertEqual(self._runCount(), 1)
+        # The parent writes the same input to a new file, the counted job and the job reading
+        # its output file are taken from the cache
+        self.assertEqual(self._runWorkflow('foo'), ('FOO', 2, 1))
+        self.assertEqual(self._runCount(), 1)
+        # A changed input file is a miss
+        self.assertEqual(self._runWorkflow('bar'), ('BAR', 0, 3))
+        self.assertEqual(self._runCount(), 2)
+
+
+def parentFn(job, counterFile, text):
+    inputFile = os.path.join(job.fileStore.getLocalTempDir(), 'input')
+    with open(inputFile, 'w') as f:
+        f.write(text)
+    child = job.addChildJobFn(countedFn, counterFile, job.fileStore.writeGlobalFile(inputFile))
+    return job.addFollowOnJobFn(readFn, child.rv()).rv()
+
+
+def countedFn(job, counterFile, inputFileID):
+    with open(counterFile, 'a') as f:
+        f.write('run\n')
+    with job.fileStore.readGlobalFileStream(inputFileID) as f:
+        text = f.read()
+    outputFile = os.path.join(job.fileStore.getLocalTempDir(), 'output')
+    with open(outputFile, 'w') as f:
+        f.write(text.upper())
+    return job.fileStore.writeGlobalFile(outputFile)
+
+
+def readFn(job, outputFileID):
+    with job.fileStore.readGlobalFileStream(outputFileID) as f:
+        return f.read()
@@ -0,0 +1,89 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import os
+
+from toil.common import Config
+from toil.job import Job, JobException
+from toil.jobStores.fileJobStore import FileJobStore
+from toil.test import ToilTest
+
+
+class ChildMapTest(ToilTest):
+    """
+    Tests adding the children of a job with Job.addChildMap().
+    """
+
+    def testSerialisation(self):
+        config = Config()
+        config.jobStore = self._getTestJobStorePath()
+        jobStore = FileJobStore(config.jobStore)
+        jobStore.initialize(config)
+        try:
+            root = Job()
+            childMap = root.addChildMap(addFn, range(10), chunkSize=4, y=2, cores=0.5)
+            self.assertEqual(len(childMap.children), 10)
+            rootJobGraph = root._serialiseFirstJob(jobStore)
+            jobNodes = rootJobGraph.stack[-1]
+            self.assertEqual(len(jobNodes), 10)
+            self.assertTrue(all(jobNode.cores == 0.5 for jobNode in jobNodes))
+            commands = [jobStore.load(jobNode.jobStoreID).command for jobNode in jobNodes]
+            commandTokens = [command.split() for command in commands]
+            # One file shared by all children and one file for each chunk of elements
+            self.assertEqual(len({tokens[2] for tokens in commandTokens}), 1)
+            self.assertEqual(len({tokens[3] for tokens in commandTokens}), 3)
+            values = set()
+            for command in commands:
+                job = Job._loadJob(command, jobStore)
+                values.add(job.run(None))
+            self.assertEqual(values, set(range(2, 12)))
+        finally:
+            jobStore.destroy()
+
+    def testMappedChildrenDontPromise(self):
+        childMap = Job().addChildMap(addFn, range(3), y=1)
+        self.assertRaises(JobException, childMap.children[0].rv)
+        self.assertRaises(JobException, childMap.rv)
+
+    def testGather(self):
+        options = Job.Runner.getDefaultOptions(self._getTestJobStorePath())
+        outputFile = os.path.join(self._createTempDir(), 'output')
+        Job.Runner.startToil(Job.wrapJobFn(parentFn, 25, outputFile), options)
+        with open(outputFile) as f:
+            # The promised value of the shared argument is read by every child, the promised
+            # element by the first one only
+            self.assertEqual(f.read(), str([3 + x for x in [4] + list(range(1, 25))]))
+
+
+def addFn(job, x, y):
+    return x + y
+
+
+def producerFn(job, value):
+    return value
+
+
+def parentFn(job, n, outputFile):
+    first = job.addChildJobFn(producerFn, 3)
+    second = first.addChildJobFn(producerFn, 4)
+    elements = [second.rv()] + list(range(1, n))
+    childMap = second.addChildMap(addFn, elements, chunkSize=7, gather=True, y=first.rv())
+    job.addFollowOnJobFn(writeFn, childMap.rv(), outputFile)
+
+
+def writeFn(job, results, outputFile):
+    with open(outputFile, 'w') as f:
+        f.write(str(results))
@@ -0,0 +1,98 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import os
+
+from bd2k.util.expando import Expando
+
+from toil.fanOutRunner import FanOutRunner
+from toil.job import Job, JobNode
+from toil.test import ToilTest
+
+
+class FanOutRunnerTest(ToilTest):
+    """
+    Tests running the children of a job in the job's worker.
+    """
+
+    numChildren = 6
+
+    def _runWorkflow(self, workerFanOut):
+        """
+        :return: maps the names of the jobs to the PIDs of the parents of their processes
+        """
+        outputDir = self._createTempDir()
+        options = Job.Runner.getDefaultOptions(self._getTestJobStorePath())
+        options.workerFanOut = workerFanOut
+        Job.Runner.startToil(Job.wrapJobFn(parentFn, outputDir, self.numChildren,
+                                           cores=1, memory='100M', disk='100M'), options)
+        parentPIDs = {}
+        for name in os.listdir(outputDir):
+            with open(os.path.join(outputDir, name)) as f:
+                parentPIDs[name] = int(f.read())
+        return parentPIDs
+
+    def testWorkerFanOut(self):
+        parentPIDs = self._runWorkflow(workerFanOut=4)
+        parentPID = parentPIDs.pop('parent')
+        self.assertEqual(parentPIDs.pop('sum'), sum(range(self.numChildren)))
+        # The checkpoint was issued by the leader
+        self.assertNotEqual(parentPIDs.pop('checkpoint'), parentPID)
+        # The successor of a child was run by the child's worker
+        self.assertEqual(parentPIDs.pop('grandchild'), parentPIDs['0'])
+        # Every other child was run by the worker of the parent
+        self.assertEqual(set(parentPIDs.values()), {parentPID})
+
+    def testFanOutDisabled(self):
+        parentPIDs = self._runWorkflow(workerFanOut=0)
+        parentPID = parentPIDs.pop('parent')
+        self.assertNotIn(parentPID, set(parentPIDs[str(i)] for i in range(self.numChildren)))
+
+    def testCanRunWithinIssuedResources(self):
+        children = [JobNode(requirements=dict(memory=10, cores=1, disk=10, preemptable=False),
+                            jobName='child', unitName=None, jobStoreID=str(i), command=None)
+                    for i in range(2)]
+        jobGraph = Expando(stack=[children], preemptable=False, memory=100, cores=4, disk=100)
+        runner = FanOutRunner(jobStore=None, jobStoreLocator=None, maxChildren=2)
+        self.assertTrue(runner.canRun(jobGraph, dict(memory=10, cores=1, disk=10)))
+        # The job was issued with less than the children need, e.g. with learned requirements
+        self.assertFalse(runner.canRun(jobGraph, dict(memory=5, cores=4, disk=100)))
+
+
+def _record(outputDir, name, value):
+    with open(os.path.join(outputDir, name), 'w') as f:
+        f.write(str(value))
+
+
+def parentFn(job, outputDir, numChildren):
+    # The PID of the worker, which is the parent of the processes of the children it runs
+    _record(outputDir, 'parent', os.getpid())
+    rvs = [job.addChildJobFn(childFn, outputDir, i, cores=0.25, memory='10M', disk='10M').rv()
+           for i in range(numChildren)]
+    job.addChildJobFn(childFn, outputDir, 'checkpoint', checkpoint=True,
+                      cores=0.25, memory='10M', disk='10M')
+    job.addFollowOnJobFn(sumFn, outputDir, rvs, cores=0.25, memory='10M', disk='10M')
+
+
+def childFn(job, outputDir, name):
+    _record(outputDir, str(name), os.getppid())
+    if name == 0:
+        job.addChildJobFn(childFn, outputDir, 'grandchild', cores=0.25, memory='10M', disk='10M')
+    return name if name != 'checkpoint' else 0
+
+
+def sumFn(job, outputDir, values):
+    _record(outputDir, 'sum', sum(values))
@@ -0,0 +1,130 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import time
+from threading import Event
+
+from bd2k.util.expando import Expando
+
+from toil.common import Config
+from toil.finishedJobLoader import FinishedJobLoader
+from toil.jobStores.abstractJobStore import NoSuchJobException
+from toil.test import ToilTest
+
+
+class StubJobStore(object):
+    """
+    The part of a job store used by the finished job loader. Loading a job blocks until the
+    job is released.
+    """
+
+    def __init__(self, jobStoreIDs, concurrentAccess=True):
+        self.released = {jobStoreID: Event() for jobStoreID in jobStoreIDs}
+        self.concurrentAccess = concurrentAccess
+
+    def supportsConcurrentAccess(self):
+        return self.concurrentAccess
+
+    def exists(self, jobStoreID):
+        return True
+
+    def load(self, jobStoreID):
+        assert self.released[jobStoreID].wait(10)
+        if jobStoreID == 'missing':
+            raise NoSuchJobException(jobStoreID)
+        return Expando(jobStoreID=jobStoreID, logJobStoreFileID=None)
+
+
+class FinishedJobLoaderTest(ToilTest):
+    """
+    Tests loading the jobs reported as finished by the batch system in background threads.
+    """
+
+    def setUp(self):
+        super(FinishedJobLoaderTest, self).setUp()
+        self.config = Config()
+        self.config.leaderIOThreads = 3
+
+    def _startLoader(self, jobStore, jobStoreIDs):
+        loader = FinishedJobLoader(jobStore, self.config)
+        loader.start()
+        for jobStoreID in jobStoreIDs:
+            loader.loadFinishedJob(Expando(jobStoreID=jobStoreID), 0)
+        return loader
+
+    def _waitForLoadedJobs(self, loader, numJobs):
+        loadedJobs = []
+        deadline = time.time() + 10
+        while len(loadedJobs) < numJobs and time.time() < deadline:
+            loadedJobs.extend(loader.getLoadedJobs())
+            time.sleep(0.01)
+        return loadedJobs
+
+    def testSubmissionOrder(self):
+        jobStoreIDs = ['a', 'b', 'c']
+        jobStore = StubJobStore(jobStoreIDs)
+        loader = self._startLoader(jobStore, jobStoreIDs)
+        try:
+            # Jobs loaded before the first one are held back until it is loaded
+            jobStore.released['c'].set()
+            jobStore.released['b'].set()
+            time.sleep(0.1)
+            self.assertEqual(loader.getLoadedJobs(), [])
+            self.assertEqual(loader.getNumberOfFinishedJobs(), 3)
+            jobStore.released['a'].set()
+            loadedJobs = self._waitForLoadedJobs(loader, 3)
+            self.assertEqual([job.jobGraph.jobStoreID for job in loadedJobs], jobStoreIDs)
+            self.assertEqual(loader.getNumberOfFinishedJobs(), 0)
+        finally:
+            loader.shutdown()
+
+    def testLoadErrorIsReraised(self):
+        jobStoreIDs = ['missing', 'a']
+        jobStore = StubJobStore(jobStoreIDs)
+        loader = self._startLoader(jobStore, jobStoreIDs)
+        try:
+            for released in jobStore.released.values():
+                released.set()
+            deadline = time.time() + 10
+            while loader.getNumberOfFinishedJobs() == 2 and time.time() < deadline:
+                try:
+                    loader.getLoadedJobs()
+                except NoSuchJobException:
+                    break
+                time.sleep(0.01)
+            else:
+                self.fail('The load error was not re-raised')
+            # The threads survive the error and the following job is returned
+            loader.check()
+            self.assertEqual([job.jobGraph.jobStoreID
+                              for job in self._waitForLoadedJobs(loader, 1)], ['a'])
+        finally:
+            loader.shutdown()
+
+    def testShutdown(self):
+        jobStoreIDs = ['a']
+        jobStore = StubJobStore(jobStoreIDs)
+        loader = self._startLoader(jobStore, jobStoreIDs)
+        jobStore.released['a'].set()
+        self._waitForLoadedJobs(loader, 1)
+        loader.shutdown()
+        self.assertRaises(RuntimeError, loader.check)
+
+    def testSingleThreadForNonConcurrentJobStores(self):
+        self.assertEqual(FinishedJobLoader.numLoaderThreads(StubJobStore([]), self.config), 3)
+        self.assertEqual(FinishedJobLoader.numLoaderThreads(
+            StubJobStore([], concurrentAccess=False), self.config), 1)
+
@@ -0,0 +1,92 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import os
+
+from toil.job import Job
+from toil.leader import FailedJobsException
+from toil.test import ToilTest
+
+
+class JobChainingTest(ToilTest):
+    """
+    Tests running chains of jobs in a single worker.
+    """
+
+    chainLength = 4
+
+    def _runChain(self, chainCheckpointInterval, lastJobFailures=0):
+        """
+        :param int lastJobFailures: the number of times the last job of the chain fails
+        :return: the number of times each job of the chain ran, and whether the job store held
+                 the state of the chain after the next to last job when the last job ran
+        """
+        outputDir = self._createTempDir()
+        options = Job.Runner.getDefaultOptions(self._getTestJobStorePath())
+        options.chainCheckpointInterval = chainCheckpointInterval
+        options.retryCount = 1
+        rootJob = Job.wrapJobFn(chainFn, outputDir, self.chainLength, lastJobFailures)
+        try:
+            Job.Runner.startToil(rootJob, options)
+        except FailedJobsException:
+            if lastJobFailures <= options.retryCount:
+                raise
+        runs = [len(open(os.path.join(outputDir, str(i))).read())
+                for i in range(self.chainLength + 1)]
+        with open(os.path.join(outputDir, 'updated')) as f:
+            updated = f.read() == 'True'
+        return runs, updated
+
+    def testCheckpointEveryJob(self):
+        runs, updated = self._runChain(chainCheckpointInterval=0)
+        self.assertEqual(runs, [1] * (self.chainLength + 1))
+        self.assertTrue(updated)
+
+    def testCoalescedUpdates(self):
+        runs, updated = self._runChain(chainCheckpointInterval=3600)
+        self.assertEqual(runs, [1] * (self.chainLength + 1))
+        self.assertFalse(updated)
+
+    def testFailureRerunsChain(self):
+        runs, _ = self._runChain(chainCheckpointInterval=3600, lastJobFailures=1)
+        # The updates of the jobs before the failed one were never made
+        self.assertEqual(runs, [2] * (self.chainLength + 1))
+
+    def testFailureRerunsFailedJob(self):
+        runs, _ = self._runChain(chainCheckpointInterval=0, lastJobFailures=1)
+        self.assertEqual(runs, [2] + [1] * self.chainLength)
+
+    def testFailureIsChargedToFailedJob(self):
+        # The failures of the last job use up its own retries, not those of the job before it
+        for chainCheckpointInterval in (0, 3600):
+            runs, _ = self._runChain(chainCheckpointInterval, lastJobFailures=2)
+            self.assertEqual(runs[0], 2)
+
+
+def chainFn(job, outputDir, n, lastJobFailures):
+    with open(os.path.join(outputDir, str(n)), 'a') as f:
+        f.write('x')
+    if n > 0:
+        job.addChildJobFn(chainFn, outputDir, n - 1, lastJobFailures)
+    else:
+        # Wait for the update of the job after the previous job in the chain, if any was made
+        job.fileStore.inputBlockFn()
+        jobGraph = job.fileStore.jobStore.load(job.fileStore.jobGraph.jobStoreID)
+        with open(os.path.join(outputDir, 'updated'), 'w') as f:
+            f.write(str(jobGraph.command is None))
+        with open(os.path.join(outputDir, str(n))) as f:
+            if len(f.read()) <= lastJobFailures:
+                raise RuntimeError('Failing the last job of the chain')
@@ -13,13 +13,18 @@
 # limitations under the License.
 
 from __future__ import absolute_import
+import logging
 import os
+import sys
 from argparse import ArgumentParser
+from six.moves import cPickle
 from toil.common import Toil
-from toil.job import Job
+from toil.job import Job, JobNode
 from toil.test import ToilTest
 from toil.jobGraph import JobGraph
 
+logger = logging.getLogger(__name__)
+
 class JobGraphTest(ToilTest):
     
     def setUp(self):
@@ -80,3 +85,102 @@ class JobGraphTest(ToilTest):
         self.assertNotEquals(j, j2)
         
         ###TODO test other functionality
+
+    @staticmethod
+    def _makeJobGraph(i, successors=2):
+        jobGraph = JobGraph(command='_toil %i' % i, memory=2 ** 30, cores=1, disk=2 ** 30,
+                            preemptable=False, jobStoreID='job%i' % i, remainingRetryCount=5,
+                            predecessorNumber=1, jobName='testJobGraph', unitName='noName')
+        jobGraph.stack.append([JobNode(requirements=dict(memory=2 ** 30, cores=1, disk=2 ** 30,
+                                                         preemptable=False),
+                                       jobName='testJobNode', unitName=None,
+                                       jobStoreID='job%i.%i' % (i, j), command=None)
+                               for j in range(successors)])
+        return jobGraph
+
+    def testPickling(self):
+        """
+        Tests that job graphs survive pickling and can be restored from the state of instances
+        pickled before their attributes were stored in slots.
+        """
+        j = self._makeJobGraph(0)
+        j.predecessorsFinished = {'1'}
+        for protocol in range(cPickle.HIGHEST_PROTOCOL + 1):
+            j2 = cPickle.loads(cPickle.dumps(j, protocol=protocol))
+            self.assertEquals(j, j2)
+            self.assertEquals(j.stack, j2.stack)
+            self.assertEquals(j.memory, j2.memory)
+            self.assertEquals(j.chainedJobs, j2.chainedJobs)
+        state = j.__getstate__()
+        self.assertEquals(state['jobStoreID'], 'job0')
+        self.assertEquals(state['stack'][0][0].__getstate__()['jobStoreID'], 'job0.0')
+        j3 = JobGraph.__new__(JobGraph)
+        j3.__setstate__(dict(state, obsoleteAttribute=None))
+        self.assertEquals(j, j3)
+
+    def testPicklingNonStrNames(self):
+        """
+        Tests that job nodes and jobs whose name or other attributes are instances of subclasses
+        of str or unicode survive pickling.
+        """
+        jobNode = JobNode(requirements=dict(memory=1, cores=1, disk=1, preemptable=False),
+                          jobName=Name('name'), unitName=None, jobStoreID='job', command=None)
+        job = UserJob()
+        job.label = Name('label')
+        job.description = u'description'
+        for protocol in range(cPickle.HIGHEST_PROTOCOL + 1):
+            jobNode2 = cPickle.loads(cPickle.dumps(jobNode, protocol=protocol))
+            self.assertEquals(jobNode2.jobName, 'name')
+            self.assertIs(type(jobNode2.jobName), Name)
+            job2 = cPickle.loads(cPickle.dumps(job, protocol=protocol))
+            self.assertIs(type(job2.label), Name)
+            self.assertEquals(job2.description, u'description')
+        jobNode3 = JobNode.__new__(JobNode)
+        jobNode3.__setstate__(dict(jobNode.__getstate__(), jobName=u'name'))
+        self.assertEquals(jobNode3.jobName, u'name')
+
+    def testMemoryPerJob(self):
+        """
+        Measures the memory used by the job graphs the leader tracks, each with a stack of two
+        successor job nodes, compared to storing their attributes in instance dicts.
+        """
+        class LegacyJobNode(object):
+            def __init__(self, jobNode):
+                self.__dict__.update(jobNode.__getstate__())
+
+        def trackedBytes(obj):
+            # The object itself, its instance dict and its containers, not the shared values
+            size = sys.getsizeof(obj)
+            attributes = getattr(obj, '__dict__', None)
+            if attributes is not None:
+                size += sys.getsizeof(attributes)
+            else:
+                attributes = obj.__getstate__()
+            for value in attributes.values():
+                if isinstance(value, (list, set)):
+                    size += sys.getsizeof(value)
+            return size
+
+        numJobs = 1000
+        compactBytes = legacyBytes = 0
+        for i in range(numJobs):
+            jobGraph = self._makeJobGraph(i)
+            self.assertFalse(hasattr(jobGraph, '__dict__'))
+            jobNodes = jobGraph.stack[0]
+            compactBytes += trackedBytes(jobGraph) + sum(map(trackedBytes, jobNodes))
+            legacyJobGraph = LegacyJobNode(jobGraph)
+            legacyJobGraph.stack = [list(map(LegacyJobNode, jobNodes))]
+            legacyBytes += (trackedBytes(legacyJobGraph)
+                            + sum(map(trackedBytes, legacyJobGraph.stack[0])))
+        logger.info('Tracking a job graph with two successors takes %i bytes, %i bytes with '
+                    'instance dicts', compactBytes // numJobs, legacyBytes // numJobs)
+        self.assertLess(compactBytes, legacyBytes)
+
+
+class Name(str):
+    pass
+
+
+class UserJob(Job):
+    def run(self, fileStore):
+        pass
@@ -0,0 +1,139 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures the time taken to validate large synthetic job graphs before they are serialised.
+
+Graphs of various shapes are built in memory and checked by
+:meth:`toil.job.Job.checkJobGraphForDeadlocks`. The unit tests validate graphs large enough to
+expose validation that is not linear in the size of the graph. Larger ones can be benchmarked
+from the command line, e.g.
+
+    python -m toil.test.src.jobGraphValidationTest --numJobs 100000 --shapes fanOut tree
+"""
+
+from __future__ import absolute_import, division
+
+import logging
+import time
+from argparse import ArgumentParser
+
+# Python 3 compatibility imports
+from six.moves import xrange
+
+from toil.job import Job, JobGraphDeadlockException
+from toil.test import ToilTest, timeLimit
+
+logger = logging.getLogger(__name__)
+
+
+class JobGraphShapes(object):
+    """
+    Builders of job graphs of roughly the given number of jobs, returning the root job.
+    """
+    names = ('fanOut', 'tree', 'ladder')
+
+    @staticmethod
+    def fanOut(numJobs):
+        # Scatter and gather: a root with many children and a follow-on
+        rootJob = Job()
+        for _ in xrange(numJobs - 2):
+            rootJob.addChild(Job())
+        rootJob.addFollowOn(Job())
+        return rootJob
+
+    @staticmethod
+    def tree(numJobs):
+        # A binary tree in which every inner job has a follow-on
+        rootJob = Job()
+        level = [rootJob]
+        count = 1
+        while count < numJobs:
+            nextLevel = []
+            for job in level:
+                nextLevel.extend(job.addChild(Job()) for _ in range(2))
+                job.addFollowOn(Job())
+                count += 3
+            level = nextLevel
+        return rootJob
+
+    @staticmethod
+    def ladder(numJobs):
+        # A chain of children in which every job has a follow-on, so that each follow-on must
+        # wait for the whole rest of the chain
+        rootJob = job = Job()
+        for _ in xrange(numJobs // 2):
+            job.addFollowOn(Job())
+            job = job.addChild(Job())
+        return rootJob
+
+
+def benchmark(shape, numJobs):
+    """
+    :return: the number of seconds taken to validate a graph of the given shape and size
+    :rtype: float
+    """
+    rootJob = getattr(JobGraphShapes, shape)(numJobs)
+    start = time.time()
+    rootJob.checkJobGraphForDeadlocks()
+    return time.time() - start
+
+
+class JobGraphValidationTest(ToilTest):
+    """
+    Validates synthetic job graphs of every shape. Validation that is quadratic in the size of
+    the graph would take hours on the ladder, linear validation takes well below a second.
+    """
+    numJobs = 20000
+
+    def testFanOut(self):
+        with timeLimit(60):
+            benchmark('fanOut', self.numJobs)
+
+    def testTree(self):
+        with timeLimit(60):
+            benchmark('tree', self.numJobs)
+
+    def testLadder(self):
+        with timeLimit(60):
+            benchmark('ladder', self.numJobs)
+
+    def testCyclicLadder(self):
+        rootJob = JobGraphShapes.ladder(self.numJobs)
+        job = rootJob
+        while job._children:
+            job = job._children[0]
+        # The first follow-on must run after the end of the chain, which can't run before it
+        rootJob._followOns[0].addChild(job)
+        with timeLimit(60):
+            self.assertRaises(JobGraphDeadlockException, rootJob.checkJobGraphForDeadlocks)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--numJobs', type=int, nargs='+', default=[10000, 100000],
+                        help='The approximate numbers of jobs in the graphs.')
+    parser.add_argument('--shapes', nargs='+', choices=JobGraphShapes.names,
+                        default=list(JobGraphShapes.names),
+                        help='The shapes of the graphs to validate.')
+    options = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    for numJobs in options.numJobs:
+        for shape in options.shapes:
+            logger.info('Validated a %s graph of %i jobs in %.3fs', shape, numJobs,
+                        benchmark(shape, numJobs))
+
+
+if __name__ == '__main__':
+    main()
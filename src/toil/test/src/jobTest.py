@@ -20,10 +20,11 @@ import random
 # Python 3 compatibility imports
 from six.moves import xrange
 
-from toil.common import Toil
+from toil.common import Config, Toil
 from toil.leader import FailedJobsException
 from toil.lib.bioio import getTempFile
 from toil.job import Job, JobGraphDeadlockException, JobFunctionWrappingJob
+from toil.jobStores.fileJobStore import FileJobStore
 from toil.test import ToilTest
 
 logger = logging.getLogger(__name__)
@@ -261,6 +262,40 @@ class JobTest(ToilTest):
                 and (fNode, tNode) not in childEdges and (fNode, tNode) not in followOnEdges):
                 checkFollowOnEdgeCycleDetection(fNode, tNode)
 
+    def testDeepJobGraphValidation(self):
+        """
+        Validates a chain of jobs deeper than the recursion limit, then makes it cyclic through
+        an implied edge: the follow-on of the root must run after the end of the chain, which
+        is its child.
+        """
+        rootJob = Job()
+        followOn = rootJob.addFollowOn(Job())
+        job = rootJob
+        for _ in xrange(5000):
+            job = job.addChild(Job())
+        rootJob.checkJobGraphForDeadlocks()
+        self.assertEquals(rootJob.getRootJobs(), {rootJob})
+        followOn.addChild(job)
+        self.assertRaises(JobGraphDeadlockException, rootJob.checkJobGraphForDeadlocks)
+
+    def testDisableJobGraphValidation(self):
+        config = Config()
+        config.jobStore = self._getTestJobStorePath()
+        jobStore = FileJobStore(config.jobStore)
+        jobStore.initialize(config)
+        try:
+            for disableJobGraphValidation in (False, True):
+                config.disableJobGraphValidation = disableJobGraphValidation
+                rootJob = Job()
+                rootJob.addChild(Job(checkpoint=True)).addChild(Job())
+                if disableJobGraphValidation:
+                    rootJob._serialiseFirstJob(jobStore)
+                else:
+                    self.assertRaises(JobGraphDeadlockException,
+                                      rootJob._serialiseFirstJob, jobStore)
+        finally:
+            jobStore.destroy()
+
     def testNewCheckpointIsLeafVertexNonRootCase(self):
         """
         Test for issue #1465: Detection of checkpoint jobs that are not leaf vertices
@@ -0,0 +1,166 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import os
+import time
+
+# Python 3 compatibility imports
+from six.moves import cPickle
+
+from toil.common import Config, Toil
+from toil.job import Job, JobNode
+from toil.jobStores.fileJobStore import FileJobStore
+from toil.leader import FailedJobsException
+from toil.leaderSnapshot import LeaderSnapshot
+from toil.test import ToilTest
+from toil.toilState import ToilState
+
+
+class LeaderSnapshotTest(ToilTest):
+    """
+    Tests restoring the jobs of a workflow from snapshots of the leader's state.
+    """
+
+    def setUp(self):
+        super(LeaderSnapshotTest, self).setUp()
+        self.jobStorePath = self._getTestJobStorePath()
+        self.config = Config()
+        self.config.jobStore = 'file:' + self.jobStorePath
+        self.config.snapshotFrequency = 1
+        self.jobStore = FileJobStore(self.jobStorePath)
+        self.jobStore.initialize(self.config)
+
+    def tearDown(self):
+        self.jobStore.destroy()
+        super(LeaderSnapshotTest, self).tearDown()
+
+    def _createJob(self, command=None):
+        return self.jobStore.create(JobNode(requirements=dict(memory=1, cores=1, disk=1,
+                                                              preemptable=False),
+                                            jobName='job', unitName=None, jobStoreID=None,
+                                            command=command))
+
+    def _createState(self):
+        # A root job waiting for two successors
+        successors = [self._createJob(command='successor') for _ in range(2)]
+        root = self._createJob()
+        root.stack.append([JobNode.fromJobGraph(successor) for successor in successors])
+        self.jobStore.update(root)
+        return root, successors, ToilState(self.jobStore, root)
+
+    def _journalFiles(self):
+        return sorted(fileName for fileName in os.listdir(self.jobStorePath)
+                      if fileName.startswith('leaderJournal.'))
+
+    def testDisabledByDefault(self):
+        snapshot = LeaderSnapshot(self.jobStore, Config())
+        self.assertFalse(snapshot.isDue())
+
+    def testSnapshot(self):
+        root, successors, toilState = self._createState()
+        snapshot = LeaderSnapshot(self.jobStore, self.config)
+        self.assertTrue(snapshot.isDue())
+        snapshot.write(toilState, {successors[0].jobStoreID})
+        self.assertFalse(snapshot.isDue())
+        # The root is taken from the snapshot and the issued successor is re-read
+        jobs = LeaderSnapshot.loadJobs(self.jobStore)
+        self.assertEqual(set(jobs), {root.jobStoreID, successors[0].jobStoreID})
+        self.assertEqual(jobs[root.jobStoreID].stack[-1], root.stack[-1])
+        # The snapshot can only be used once
+        self.assertIsNone(LeaderSnapshot.loadJobs(self.jobStore))
+
+    def testJournal(self):
+        root, successors, toilState = self._createState()
+        snapshot = LeaderSnapshot(self.jobStore, self.config)
+        snapshot.write(toilState, set())
+        snapshot.journal([root.jobStoreID, successors[0].jobStoreID])
+        # Jobs that are journaled again are not written to the journal again
+        snapshot.journal([root.jobStoreID])
+        self.assertEqual(snapshot.journalIndex, 1)
+        # The workers of the journaled jobs change and delete them
+        root.stack.pop()
+        self.jobStore.update(root)
+        self.jobStore.delete(successors[0].jobStoreID)
+        jobs = LeaderSnapshot.loadJobs(self.jobStore)
+        self.assertEqual(set(jobs), {root.jobStoreID})
+        self.assertEqual(jobs[root.jobStoreID].stack, [])
+
+    def testStaleJournal(self):
+        root, successors, toilState = self._createState()
+        snapshot = LeaderSnapshot(self.jobStore, self.config)
+        snapshot.write(toilState, set())
+        snapshot.journal([root.jobStoreID])
+        # Jobs that are not in the snapshot are not journaled
+        snapshot.journal([successors[0].jobStoreID])
+        self.assertEqual(self._journalFiles(), ['leaderJournal.0.pickle'])
+        # The journal of the previous snapshot is deleted with the next snapshot, and would be
+        # ignored if it was left behind
+        snapshot.write(toilState, set())
+        self.assertEqual(self._journalFiles(), [])
+        with self.jobStore.writeSharedFileStream(LeaderSnapshot.journalFileName % 0) as fileHandle:
+            cPickle.dump(('stale', [root.jobStoreID]), fileHandle, cPickle.HIGHEST_PROTOCOL)
+        jobs = LeaderSnapshot.loadJobs(self.jobStore)
+        self.assertEqual(set(jobs), {root.jobStoreID})
+        # Loading the snapshot invalidates it along with all journal files
+        self.assertEqual(self._journalFiles(), [])
+
+    def testCleanOrphans(self):
+        root, successors, toilState = self._createState()
+        orphan = self._createJob(command='orphan')
+        self.jobStore.setRootJob(root.jobStoreID)
+        LeaderSnapshot(self.jobStore, self.config).write(toilState, set())
+        jobs = LeaderSnapshot.loadJobs(self.jobStore)
+        self.assertNotIn(orphan.jobStoreID, jobs)
+        # Jobs that are neither in the snapshot nor reachable from the root are still removed
+        self.jobStore.clean(jobCache=jobs, partialJobCache=True)
+        self.assertFalse(self.jobStore.exists(orphan.jobStoreID))
+        for successor in successors:
+            self.assertTrue(self.jobStore.exists(successor.jobStoreID))
+
+    def testRestart(self):
+        """
+        Tests that a workflow restarts from the snapshot taken while the root job waits for its
+        children, one of which fails in the first run.
+        """
+        options = Job.Runner.getDefaultOptions(self._getTestJobStorePath())
+        options.logLevel = 'DEBUG'
+        options.retryCount = 0
+        options.snapshotFrequency = 1
+        options.clean = 'never'
+        fileName = os.path.join(self._createTempDir(), 'failed')
+        root = Job()
+        root.addChildJobFn(sleepFn, 5)
+        root.addChildJobFn(failOnceFn, fileName)
+        with Toil(options) as toil:
+            self.assertRaises(FailedJobsException, toil.start, root)
+        jobStore = Toil.resumeJobStore(options.jobStore)
+        with jobStore.readSharedFileStream(LeaderSnapshot.snapshotFileName) as fileHandle:
+            _, jobs, _ = cPickle.load(fileHandle)
+        self.assertIn(jobStore.loadRootJob().jobStoreID, jobs)
+        options.restart = True
+        options.clean = 'always'
+        with Toil(options) as toil:
+            toil.restart()
+
+
+def sleepFn(job, seconds):
+    time.sleep(seconds)
+
+
+def failOnceFn(job, fileName):
+    if not os.path.exists(fileName):
+        open(fileName, 'w').close()
+        raise RuntimeError('Failing on purpose')
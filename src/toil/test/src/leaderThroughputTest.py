@@ -0,0 +1,513 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures how many jobs per second the leader can schedule, independently of running any jobs.
+
+Synthetic workflows of various shapes are written straight into a job store and run by the
+leader against a mock batch system, which completes each job after a configurable delay by
+changing the job store like the worker would. The unit tests run small workflows. Larger ones
+can be benchmarked from the command line, e.g.
+
+    python -m toil.test.src.leaderThroughputTest --numJobs 100000 --shapes fanOut chain
+"""
+
+from __future__ import absolute_import, division
+
+import heapq
+import itertools
+import logging
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from threading import Condition, Event, Thread
+
+# Python 3 compatibility imports
+from six.moves import cPickle, xrange
+from six.moves.queue import Empty
+
+from toil.batchSystems.abstractBatchSystem import BatchSystemSupport
+from toil.common import Config
+from toil.job import JobNode, ServiceJobNode
+from toil.jobGraph import JobGraph
+from toil.jobStores.abstractJobStore import NoSuchJobException
+from toil.jobStores.fileJobStore import FileJobStore
+from toil.leader import Leader
+from toil.lib.threading import WakeupQueue
+from toil.test import ToilTest
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryJobStore(FileJobStore):
+    """
+    A job store that keeps its jobs in memory, pickled as the other job stores do, so that
+    benchmarks of the leader are not dominated by file system latency. Files are still stored in
+    a directory like in the file job store.
+    """
+
+    def __init__(self, path):
+        super(InMemoryJobStore, self).__init__(path)
+        self._jobs = {}
+        self._jobStoreIDs = itertools.count()
+
+    def create(self, jobNode):
+        job = JobGraph.fromJobNode(jobNode, jobStoreID='job%i' % next(self._jobStoreIDs),
+                                   tryCount=self._defaultTryCount())
+        self.update(job)
+        return job
+
+    def exists(self, jobStoreID):
+        return jobStoreID in self._jobs
+
+    def load(self, jobStoreID):
+        try:
+            return cPickle.loads(self._jobs[jobStoreID])
+        except KeyError:
+            raise NoSuchJobException(jobStoreID)
+
+    def update(self, job):
+        self._jobs[job.jobStoreID] = cPickle.dumps(job, cPickle.HIGHEST_PROTOCOL)
+
+    def delete(self, jobStoreID):
+        self._jobs.pop(jobStoreID, None)
+
+    def jobs(self):
+        for job in list(self._jobs.values()):
+            yield cPickle.loads(job)
+
+
+class MockBatchSystem(BatchSystemSupport):
+    """
+    A batch system that runs no jobs. Instead it completes every issued job after a fixed delay,
+    changing the job store like the worker would for a job that succeeds without adding any
+    successors. Service jobs signal that they have started and then run until they are told to
+    terminate. There is no limit on the number of jobs running at once.
+    """
+
+    @classmethod
+    def supportsHotDeployment(cls):
+        return False
+
+    @classmethod
+    def supportsWorkerCleanup(cls):
+        return False
+
+    def __init__(self, config, jobStore, delay=0.0):
+        """
+        :param toil.jobStores.abstractJobStore.AbstractJobStore jobStore: the job store of the
+               workflow, which is changed as the jobs complete
+        :param float delay: the number of seconds each job takes to complete
+        """
+        super(MockBatchSystem, self).__init__(config, config.maxCores, config.maxMemory,
+                                              config.maxDisk)
+        self.jobStore = jobStore
+        self.delay = delay
+        self.jobIndex = itertools.count()
+        # Guards the following and is notified when jobs are issued or the batch system shuts down
+        self.lock = Condition()
+        # Heap of (dueTime, jobID, jobStoreID) tuples of the jobs yet to be completed
+        self.pendingJobs = []
+        # Maps the jobID of issued jobs to the time they were issued
+        self.issuedJobs = {}
+        # Maps the jobID of running service jobs to their jobGraph
+        self.runningServices = {}
+        # The number of times the running jobs were queried
+        self.runningJobQueries = 0
+        self.terminate = False
+        self.updatedJobsQueue = WakeupQueue()
+        self.completer = Thread(target=self._completeJobs)
+        self.completer.start()
+
+    def setWakeup(self, wakeup):
+        self.updatedJobsQueue.wakeup = wakeup
+
+    def issueBatchJob(self, jobNode, priority=0):
+        return self.issueBatchJobs([jobNode])[0]
+
+    def issueBatchJobs(self, jobNodes, priorities=None):
+        now = time.time()
+        jobIDs = []
+        with self.lock:
+            for jobNode in jobNodes:
+                jobID = next(self.jobIndex)
+                heapq.heappush(self.pendingJobs, (now + self.delay, jobID, jobNode.jobStoreID))
+                self.issuedJobs[jobID] = now
+                jobIDs.append(jobID)
+            self.lock.notify()
+        return jobIDs
+
+    def killBatchJobs(self, jobIDs):
+        with self.lock:
+            for jobID in jobIDs:
+                self.issuedJobs.pop(jobID, None)
+                self.runningServices.pop(jobID, None)
+            self.pendingJobs = [job for job in self.pendingJobs if job[1] in self.issuedJobs]
+            heapq.heapify(self.pendingJobs)
+
+    def getIssuedBatchJobIDs(self):
+        with self.lock:
+            return list(self.issuedJobs)
+
+    def getRunningBatchJobIDs(self):
+        now = time.time()
+        with self.lock:
+            self.runningJobQueries += 1
+            return {jobID: now - issueTime for jobID, issueTime in self.issuedJobs.items()}
+
+    def getUpdatedBatchJob(self, maxWait):
+        try:
+            return self.updatedJobsQueue.get(timeout=maxWait)
+        except Empty:
+            return None
+
+    def shutdown(self):
+        with self.lock:
+            self.terminate = True
+            self.lock.notify()
+        self.completer.join()
+
+    @classmethod
+    def getRescueBatchJobFrequency(cls):
+        return 5400
+
+    def _completeJobs(self):
+        """
+        Thread that completes the issued jobs once they are due.
+        """
+        while True:
+            with self.lock:
+                while True:
+                    if self.terminate:
+                        return
+                    now = time.time()
+                    dueJobs = []
+                    while self.pendingJobs and self.pendingJobs[0][0] <= now:
+                        _, jobID, jobStoreID = heapq.heappop(self.pendingJobs)
+                        dueJobs.append((jobID, jobStoreID))
+                    if dueJobs or self.runningServices:
+                        break
+                    self.lock.wait(self.pendingJobs[0][0] - now if self.pendingJobs else None)
+                runningServices = list(self.runningServices.items())
+            for jobID, jobStoreID in dueJobs:
+                self._runJob(jobID, self.jobStore.load(jobStoreID))
+            for jobID, jobGraph in runningServices:
+                if not self.jobStore.fileExists(jobGraph.terminateJobStoreID):
+                    with self.lock:
+                        del self.runningServices[jobID]
+                    jobGraph.command = None
+                    self._finishJob(jobID, jobGraph)
+            if not dueJobs:
+                # Only services are running, poll them for their termination
+                time.sleep(0.01)
+
+    def _runJob(self, jobID, jobGraph):
+        """
+        Changes the job store like the worker does when running the given job.
+        """
+        if jobGraph.command is None:
+            # Remove the successors that have finished
+            def removeFinished(jobs):
+                jobs = [[jobNode for jobNode in jobNodes if self.jobStore.exists(jobNode.jobStoreID)]
+                        for jobNodes in jobs]
+                return [jobNodes for jobNodes in jobs if jobNodes]
+            jobGraph.stack = removeFinished(jobGraph.stack)
+            jobGraph.services = removeFinished(jobGraph.services)
+        elif jobGraph.startJobStoreID is not None:
+            # Start the service and keep it running until it is told to terminate
+            self.jobStore.deleteFile(jobGraph.startJobStoreID)
+            with self.lock:
+                self.runningServices[jobID] = jobGraph
+            return
+        else:
+            jobGraph.command = None
+        self._finishJob(jobID, jobGraph)
+
+    def _finishJob(self, jobID, jobGraph):
+        if len(jobGraph.stack) == 0 and len(jobGraph.services) == 0:
+            self.jobStore.delete(jobGraph.jobStoreID)
+        else:
+            self.jobStore.update(jobGraph)
+        with self.lock:
+            issueTime = self.issuedJobs.pop(jobID, None)
+        if issueTime is not None:
+            self.updatedJobsQueue.put((jobID, 0, time.time() - issueTime))
+
+
+class WorkflowShapes(object):
+    """
+    Writes synthetic workflows of about the given number of jobs into a job store, in the state
+    that a workflow is in after its jobs have been created but before any of them have run.
+    Each returns the root jobGraph of the workflow.
+    """
+
+    @staticmethod
+    def _createJob(jobStore, jobName, predecessorNumber=1):
+        return jobStore.create(JobNode(requirements=dict(memory=1, cores=1, disk=1,
+                                                         preemptable=False),
+                                       jobName=jobName, unitName=None, jobStoreID=None,
+                                       command='_toil benchmark',
+                                       predecessorNumber=predecessorNumber))
+
+    @staticmethod
+    def _addSuccessors(jobStore, jobGraph, successors):
+        jobGraph.stack.append([JobNode.fromJobGraph(successor) for successor in successors])
+        jobStore.update(jobGraph)
+
+    @classmethod
+    def fanOut(cls, jobStore, numJobs):
+        """
+        A root job with many children.
+        """
+        root = cls._createJob(jobStore, 'root')
+        children = [cls._createJob(jobStore, 'child') for _ in xrange(numJobs - 1)]
+        cls._addSuccessors(jobStore, root, children)
+        return root
+
+    @classmethod
+    def chain(cls, jobStore, numJobs):
+        """
+        A chain of jobs, each the only child of the previous one.
+        """
+        jobs = [cls._createJob(jobStore, 'link') for _ in xrange(numJobs)]
+        for parent, child in zip(jobs, jobs[1:]):
+            cls._addSuccessors(jobStore, parent, [child])
+        return jobs[0]
+
+    @classmethod
+    def diamond(cls, jobStore, numJobs):
+        """
+        A chain of diamonds, each a job with two children that share a follow-on, which is the
+        top of the next diamond.
+        """
+        root = top = cls._createJob(jobStore, 'top')
+        for _ in xrange(max(1, (numJobs - 1) // 3)):
+            left, right = cls._createJob(jobStore, 'left'), cls._createJob(jobStore, 'right')
+            bottom = cls._createJob(jobStore, 'top', predecessorNumber=2)
+            cls._addSuccessors(jobStore, top, [left, right])
+            cls._addSuccessors(jobStore, left, [bottom])
+            cls._addSuccessors(jobStore, right, [bottom])
+            top = bottom
+        return root
+
+    @classmethod
+    def gather(cls, jobStore, numJobs):
+        """
+        A root job with many children, all of which precede a single job.
+        """
+        root = cls._createJob(jobStore, 'root')
+        children = [cls._createJob(jobStore, 'child') for _ in xrange(max(1, numJobs - 2))]
+        gather = cls._createJob(jobStore, 'gather', predecessorNumber=len(children))
+        cls._addSuccessors(jobStore, root, children)
+        for child in children:
+            cls._addSuccessors(jobStore, child, [gather])
+        return root
+
+    @classmethod
+    def services(cls, jobStore, numJobs):
+        """
+        A root job with many children, each of which hosts a service.
+        """
+        root = cls._createJob(jobStore, 'root')
+        clients = [cls._createJob(jobStore, 'client') for _ in xrange(max(1, (numJobs - 1) // 2))]
+        for client in clients:
+            service = cls._createJob(jobStore, 'service')
+            service.startJobStoreID = jobStore.getEmptyFileStoreID()
+            service.terminateJobStoreID = jobStore.getEmptyFileStoreID()
+            service.errorJobStoreID = jobStore.getEmptyFileStoreID()
+            jobStore.update(service)
+            client.services.append([ServiceJobNode(jobStoreID=service.jobStoreID,
+                                                   memory=service.memory, cores=service.cores,
+                                                   disk=service.disk,
+                                                   startJobStoreID=service.startJobStoreID,
+                                                   terminateJobStoreID=service.terminateJobStoreID,
+                                                   errorJobStoreID=service.errorJobStoreID,
+                                                   jobName=service.jobName,
+                                                   unitName=service.unitName,
+                                                   command=service.command,
+                                                   predecessorNumber=1)])
+            jobStore.update(client)
+        cls._addSuccessors(jobStore, root, clients)
+        return root
+
+    names = ('fanOut', 'chain', 'diamond', 'gather', 'services')
+
+
+class TimedLeader(Leader):
+    """
+    A leader that records when its main loop finished, so that the time taken to shut down its
+    threads is not counted as scheduling time.
+    """
+    def innerLoop(self):
+        Leader.innerLoop(self)
+        self.mainLoopEndTime = time.time()
+        self.mainLoopEndUsage = resource.getrusage(resource.RUSAGE_SELF)
+
+
+def getResidentMemory():
+    """
+    :return: the current resident set size of this process in bytes, or its peak resident set
+             size if the current one cannot be determined on this platform
+    :rtype: int
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except IOError:
+        maxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Mac OS X reports bytes, other platforms kilobytes
+        return maxRSS if sys.platform == 'darwin' else maxRSS * 1024
+
+
+def runWorkflow(jobStoreClass, shape, numJobs, delay=0.0):
+    """
+    Runs a synthetic workflow with the leader and the mock batch system.
+
+    :param type jobStoreClass: FileJobStore or InMemoryJobStore
+    :param str shape: the name of a method of WorkflowShapes
+    :param int numJobs: the approximate number of jobs in the workflow
+    :param float delay: the number of seconds each job takes to complete
+
+    :return: the number of jobs, the number of jobs scheduled per second, the CPU seconds and
+             the bytes of resident memory used by the leader process per job, and the number of
+             times the leader queried the batch system for its running jobs. The time is
+             measured from building the leader's state to the end of its main loop. The CPU time
+             includes the mock batch system. The memory is the peak growth of the resident set
+             over the run, sampled every tenth of a second.
+    :rtype: dict
+    """
+    workDir = tempfile.mkdtemp()
+    try:
+        config = Config()
+        jobStorePath = os.path.join(workDir, 'jobStore')
+        config.jobStore = 'file:' + jobStorePath
+        config.workDir = workDir
+        jobStore = jobStoreClass(jobStorePath)
+        jobStore.initialize(config)
+        rootJob = getattr(WorkflowShapes, shape)(jobStore, numJobs)
+        with jobStore.writeSharedFileStream('rootJobReturnValue') as f:
+            cPickle.dump(None, f)
+        numJobs = sum(1 for _ in jobStore.jobs())
+
+        initialMemory = getResidentMemory()
+        peakMemory = [initialMemory]
+        stopSampling = Event()
+
+        def sampleMemory():
+            while not stopSampling.wait(0.1):
+                peakMemory[0] = max(peakMemory[0], getResidentMemory())
+        sampler = Thread(target=sampleMemory)
+        sampler.start()
+
+        batchSystem = MockBatchSystem(config, jobStore, delay=delay)
+        try:
+            startUsage = resource.getrusage(resource.RUSAGE_SELF)
+            startTime = time.time()
+            leader = TimedLeader(config=config, batchSystem=batchSystem, provisioner=None,
+                                 jobStore=jobStore, rootJob=rootJob)
+            leader.run()
+            wallTime = leader.mainLoopEndTime - startTime
+            endUsage = leader.mainLoopEndUsage
+        finally:
+            batchSystem.shutdown()
+            stopSampling.set()
+            sampler.join()
+        peakMemory[0] = max(peakMemory[0], getResidentMemory())
+        remainingJobs = sum(1 for _ in jobStore.jobs())
+        assert remainingJobs == 0, '%i jobs were left in the job store' % remainingJobs
+        cpuTime = (endUsage.ru_utime - startUsage.ru_utime
+                   + endUsage.ru_stime - startUsage.ru_stime)
+        return dict(numJobs=numJobs,
+                    jobsPerSecond=numJobs / wallTime,
+                    cpuPerJob=cpuTime / numJobs,
+                    memoryPerJob=(peakMemory[0] - initialMemory) / numJobs,
+                    runningJobQueries=batchSystem.runningJobQueries)
+    finally:
+        shutil.rmtree(workDir)
+
+
+def reportResults(jobStoreClass, shape, delay, results):
+    logger.warn('%s workflow of %i jobs on the %s with %.3fs per job: %.0f jobs/s, '
+                '%.2f ms of CPU and %.0f bytes of memory per job', shape, results['numJobs'],
+                jobStoreClass.__name__, delay, results['jobsPerSecond'],
+                results['cpuPerJob'] * 1000, results['memoryPerJob'])
+
+
+class LeaderThroughputTest(ToilTest):
+    """
+    Runs small synthetic workflows of every shape through the leader to check that the benchmark
+    harness works and to report the leader's scheduling throughput.
+    """
+    numJobs = 100
+
+    def _testShape(self, shape, numJobs=numJobs):
+        for jobStoreClass in (InMemoryJobStore, FileJobStore):
+            results = runWorkflow(jobStoreClass, shape, numJobs)
+            reportResults(jobStoreClass, shape, 0.0, results)
+            self.assertGreater(results['jobsPerSecond'], 0)
+            if shape != 'services':
+                # Without services the leader cannot deadlock, so it should not have to query
+                # the running jobs in every iteration of its main loop
+                self.assertEqual(results['runningJobQueries'], 0)
+
+    def testFanOut(self):
+        self._testShape('fanOut')
+
+    def testChain(self):
+        self._testShape('chain')
+
+    def testDiamond(self):
+        self._testShape('diamond')
+
+    def testGather(self):
+        self._testShape('gather')
+
+    def testServices(self):
+        # The service manager waits a second for each batch of services to start
+        self._testShape('services', numJobs=10)
+
+    def testDelay(self):
+        results = runWorkflow(InMemoryJobStore, 'fanOut', self.numJobs, delay=0.5)
+        self.assertEqual(results['numJobs'], self.numJobs)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--numJobs', type=int, default=10000,
+                        help='The approximate number of jobs in each workflow.')
+    parser.add_argument('--delay', type=float, default=0.0,
+                        help='The number of seconds each job takes to complete.')
+    parser.add_argument('--shapes', nargs='+', choices=WorkflowShapes.names,
+                        default=list(WorkflowShapes.names),
+                        help='The shapes of the workflows to run.')
+    parser.add_argument('--jobStores', nargs='+', choices=('memory', 'file'),
+                        default=['memory', 'file'],
+                        help='The job stores to run the workflows against.')
+    options = parser.parse_args()
+    # Logging every issued job would dominate the measurements
+    logging.basicConfig(level=logging.WARN)
+    jobStoreClasses = dict(memory=InMemoryJobStore, file=FileJobStore)
+    for jobStore in options.jobStores:
+        for shape in options.shapes:
+            jobStoreClass = jobStoreClasses[jobStore]
+            reportResults(jobStoreClass, shape, options.delay,
+                          runWorkflow(jobStoreClass, shape, options.numJobs, options.delay))
+
+
+if __name__ == '__main__':
+    main()
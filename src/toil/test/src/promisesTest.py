@@ -12,7 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 from __future__ import absolute_import
-from toil.job import Job
+
+from toil.common import Config
+from toil.job import Job, Promise
+from toil.jobStores.fileJobStore import FileJobStore
+from toil.serialiser import Serialiser
 from toil.test import ToilTest
 
 
@@ -84,3 +88,40 @@ def d(job):
 
 def e():
     return {'a': 'b', 42: 43, 'c': [1, 2, 3]}
+
+
+class PrefetchedPromisesTest(ToilTest):
+    """
+    Tests reading the promised values a job refers to all at once when the job is loaded.
+    """
+
+    def test(self):
+        config = Config()
+        config.jobStore = self._getTestJobStorePath()
+        jobStore = FileJobStore(config.jobStore)
+        jobStore.initialize(config)
+        try:
+            root = Job()
+            promising = root.addChildFn(e)
+            promising.addChildFn(f, promising.rv('a'), promising.rv(42))
+            rootJobGraph = root._serialiseFirstJob(jobStore)
+            promising._fulfillPromises(e(), jobStore)
+            promisingJobGraph = jobStore.load(rootJobGraph.stack[-1][0].jobStoreID)
+            command = jobStore.load(promisingJobGraph.stack[-1][0].jobStoreID).command
+            # The IDs of the promise files precede the job
+            with jobStore.readFileStream(command.split()[1]) as fileHandle:
+                promiseFileIDs = Serialiser.loads(fileHandle.read())
+            self.assertEqual(len(promiseFileIDs), 2)
+            readFilesMany = jobStore.readFilesMany
+            calls = []
+            jobStore.readFilesMany = lambda fileIDs: calls.append(fileIDs) or readFilesMany(fileIDs)
+            job = Job._loadJob(command, jobStore)
+            self.assertEqual(calls, [promiseFileIDs])
+            self.assertEqual(job._args, ('b', 43))
+        finally:
+            Promise.filesToDelete.clear()
+            jobStore.destroy()
+
+
+def f(x, y):
+    pass
@@ -0,0 +1,155 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import os
+
+from bd2k.util.expando import Expando
+
+from toil.common import Config, Toil
+from toil.job import Job, JobNode, ServiceJobNode
+from toil.jobGraph import JobGraph
+from toil.jobStores.fileJobStore import FileJobStore
+from toil.requirementsLearner import RequirementsLearner
+from toil.test import ToilTest
+
+
+class RequirementsLearnerTest(ToilTest):
+    """
+    Tests learning the requirements of jobs from the resources they use.
+    """
+
+    def setUp(self):
+        super(RequirementsLearnerTest, self).setUp()
+        self.jobStorePath = self._getTestJobStorePath()
+        self.config = Config()
+        self.config.jobStore = 'file:' + self.jobStorePath
+        self.config.learnRequirements = True
+        self.jobStore = FileJobStore(self.jobStorePath)
+        self.jobStore.initialize(self.config)
+
+    def tearDown(self):
+        self.jobStore.destroy()
+        super(RequirementsLearnerTest, self).tearDown()
+
+    def _createJobNode(self, jobName):
+        return JobNode(requirements=dict(memory=100000, cores=4, disk=1000, preemptable=False),
+                       jobName=jobName, unitName=None, jobStoreID='a', command=None)
+
+    def testRightSize(self):
+        learner = RequirementsLearner(self.jobStore)
+        for i in range(RequirementsLearner.minimumJobs):
+            learner.addJobStats(Expando(job_name='small', time='2.0', clock='1.0',
+                                        memory='10', disk='100'))
+            # Reported by a worker that did not measure the disk used by the job
+            learner.addJobStats(Expando(job_name='small', time='2.0', clock='1.0',
+                                        memory='10', disk='None'))
+            learner.addUsage('big', memory=1000000, cores=8, disk=10000)
+        jobNode = self._createJobNode('small')
+        rightSized = learner.rightSize(jobNode)
+        self.assertEqual((rightSized.memory, rightSized.cores, rightSized.disk), (12288, 0.6, 120))
+        # The requested requirements are left alone
+        self.assertEqual((jobNode.memory, jobNode.cores, jobNode.disk), (100000, 4, 1000))
+        # Requirements are never raised
+        jobNode = self._createJobNode('big')
+        self.assertIs(learner.rightSize(jobNode), jobNode)
+        jobNode = self._createJobNode('unknown')
+        self.assertIs(learner.rightSize(jobNode), jobNode)
+        service = ServiceJobNode(jobStoreID='service', memory=1000, cores=4, disk=1000,
+                                 startJobStoreID='start', terminateJobStoreID='terminate',
+                                 errorJobStoreID='error', unitName=None, jobName='small',
+                                 command=None, predecessorNumber=1)
+        self.assertIs(learner.rightSize(service), service)
+
+        # The learned usage survives a restart of the leader
+        learner.save()
+        learner = RequirementsLearner.load(self.jobStore)
+        self.assertEqual(learner.rightSize(self._createJobNode('small')).disk, 120)
+
+    def testFailedJobsUseRequestedRequirements(self):
+        jobGraph = self.jobStore.create(self._createJobNode('small'))
+        self.assertTrue(jobGraph.useLearnedRequirements)
+        jobGraph.setupJobAfterFailure(self.config)
+        self.jobStore.update(jobGraph)
+        self.assertFalse(self.jobStore.load(jobGraph.jobStoreID).useLearnedRequirements)
+        # Job graphs pickled before the flag was introduced may use learned requirements
+        state = jobGraph.__getstate__()
+        del state['useLearnedRequirements']
+        oldJobGraph = JobGraph.__new__(JobGraph)
+        oldJobGraph.__setstate__(state)
+        self.assertTrue(oldJobGraph.useLearnedRequirements)
+
+    def testLearnRequirements(self):
+        options = Job.Runner.getDefaultOptions(self._getTestJobStorePath())
+        options.learnRequirements = True
+        options.clean = 'never'
+        root = Job()
+        for _ in range(RequirementsLearner.minimumJobs):
+            root.addChildJobFn(usageFn, memory='1G', disk='1G')
+        with Toil(options) as toil:
+            toil.start(root)
+        jobStore = Toil.resumeJobStore(toil.config.jobStore)
+        try:
+            learner = RequirementsLearner.load(jobStore)
+        finally:
+            jobStore.destroy()
+        jobNode = JobNode(requirements=dict(memory=2 ** 40, cores=8, disk=2 ** 40,
+                                            preemptable=False),
+                          jobName='usageFn', unitName=None, jobStoreID='a', command=None)
+        rightSized = learner.rightSize(jobNode)
+        self.assertLess(rightSized.memory, 2 ** 30)
+        self.assertLess(rightSized.cores, 8)
+        self.assertLess(rightSized.disk, 2 ** 30)
+
+    def testChainingWithinLearnedRequirements(self):
+        """
+        Tests that the worker of a job issued with learned requirements doesn't chain a successor
+        that needs more than it was issued with.
+        """
+        outputDir = self._createTempDir()
+        options = Job.Runner.getDefaultOptions(self._getTestJobStorePath())
+        options.learnRequirements = True
+        root = Job.wrapJobFn(chainParentFn, outputDir, memory='100M', cores=1, disk='100M')
+        with Toil(options) as toil:
+            learner = RequirementsLearner(toil._jobStore)
+            for _ in range(RequirementsLearner.minimumJobs):
+                learner.addUsage('chainParentFn', memory=10 * 1024 * 1024, cores=1,
+                                 disk=10 * 1024 * 1024)
+            learner.save()
+            toil.start(root)
+        pids = {}
+        for name in os.listdir(outputDir):
+            with open(os.path.join(outputDir, name)) as f:
+                pids[name] = int(f.read())
+        self.assertNotEqual(pids['parent'], pids['child'])
+
+
+def chainParentFn(job, outputDir):
+    _recordPID(outputDir, 'parent')
+    job.addChildJobFn(chainChildFn, outputDir, memory='100M', cores=1, disk='100M')
+
+
+def chainChildFn(job, outputDir):
+    _recordPID(outputDir, 'child')
+
+
+def _recordPID(outputDir, name):
+    with open(os.path.join(outputDir, name), 'w') as f:
+        f.write(str(os.getpid()))
+
+
+def usageFn(job):
+    with open('usage', 'w') as f:
+        f.write('x' * 1024)
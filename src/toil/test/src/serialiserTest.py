@@ -0,0 +1,158 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Tests the serialiser of the objects kept in a job store, and measures how its compression affects
+the size of the stored job graphs and the time taken to update and load them. The unit tests run
+a small benchmark. Larger ones can be run from the command line, e.g.
+
+    python -m toil.test.src.serialiserTest --sizes 16384 4194304 --compressions none zlib
+"""
+
+from __future__ import absolute_import, division
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+from argparse import ArgumentParser
+
+# Python 3 compatibility imports
+from six.moves import cPickle, xrange
+
+from toil.common import Config
+from toil.job import JobNode
+from toil.jobStores.fileJobStore import FileJobStore
+from toil.serialiser import Serialiser
+from toil.test import ToilTest
+
+logger = logging.getLogger(__name__)
+
+
+class SerialiserTest(ToilTest):
+    """
+    Tests serialising the objects kept in a job store.
+    """
+
+    def testRoundTrip(self):
+        obj = {'small': 1, 'large': ['x' * 100] * 1000}
+        for compression in ('none', 'zlib'):
+            for compressionThreshold in (0, 1024, 1024 * 1024):
+                serialiser = Serialiser(compression, compressionThreshold)
+                data = serialiser.dumps(obj)
+                self.assertTrue(data.startswith(Serialiser.magic))
+                self.assertEqual(Serialiser.loads(data), obj)
+
+    def testThreshold(self):
+        pickled = cPickle.dumps('x' * 1000, cPickle.HIGHEST_PROTOCOL)
+        headerSize = len(Serialiser(compression='none').encode(b''))
+        self.assertEqual(len(Serialiser('zlib', len(pickled) + 1).encode(pickled)),
+                         len(pickled) + headerSize)
+        self.assertLess(len(Serialiser('zlib', len(pickled)).encode(pickled)), len(pickled))
+
+    def testIncompressibleData(self):
+        pickled = cPickle.dumps(os.urandom(1024), cPickle.HIGHEST_PROTOCOL)
+        data = Serialiser('zlib', compressionThreshold=0).encode(pickled)
+        self.assertEqual(data[len(data) - len(pickled):], pickled)
+        self.assertEqual(Serialiser.decode(data), pickled)
+
+    def testPlainPickles(self):
+        for protocol in (0, cPickle.HIGHEST_PROTOCOL):
+            self.assertEqual(Serialiser.loads(cPickle.dumps([1, 'a'], protocol)), [1, 'a'])
+
+    def testUnknownFormat(self):
+        self.assertRaises(ValueError, Serialiser, compression='bz2')
+        data = Serialiser(compression='none').dumps(1)
+        newer = Serialiser.magic + chr(Serialiser.version + 1) + data[len(Serialiser.magic) + 1:]
+        self.assertRaises(RuntimeError, Serialiser.loads, newer)
+
+    def testDefaultCompression(self):
+        config = Config()
+        self.assertEqual(Serialiser.fromConfig(config).compression, 'none')
+        # Remote job stores compress by default, unless the workflow says otherwise
+        self.assertEqual(Serialiser.fromConfig(config, defaultCompression='zlib').compression,
+                         'zlib')
+        config.serialisationCompression = 'none'
+        self.assertEqual(Serialiser.fromConfig(config, defaultCompression='zlib').compression,
+                         'none')
+        self.assertEqual(FileJobStore.defaultCompression, 'none')
+
+    def testBenchmark(self):
+        storedSizes = {compression: benchmark(compression, 64 * 1024, numRepeats=2)[0]
+                       for compression in ('none', 'zlib')}
+        self.assertLess(storedSizes['zlib'], storedSizes['none'] // 2)
+
+
+def benchmark(compression, commandSize, numRepeats):
+    """
+    Updates and loads a job graph with a command of the given size in a file job store.
+
+    :param str compression: the compression method of the job store's serialiser
+    :param int commandSize: the approximate size of the job graph's command in bytes
+    :param int numRepeats: the number of times the job graph is updated and loaded
+    :return: the size of the stored job graph in bytes, and the average number of seconds taken
+             to update and to load it
+    :rtype: tuple
+    """
+    tempDir = tempfile.mkdtemp()
+    try:
+        config = Config()
+        config.jobStore = os.path.join(tempDir, 'jobStore')
+        config.serialisationCompression = compression
+        jobStore = FileJobStore(config.jobStore)
+        jobStore.initialize(config)
+        jobGraph = jobStore.create(JobNode(requirements=dict(memory=1, cores=1, disk=1,
+                                                             preemptable=False),
+                                           jobName='job', unitName=None, jobStoreID=None,
+                                           command=None))
+        # A somewhat repetitive command, like the ones of real workflows
+        jobGraph.command = ' '.join('_toil %08x toil/test/module.py' % i
+                                    for i in xrange(commandSize // 35))
+        start = time.time()
+        for _ in xrange(numRepeats):
+            jobStore.update(jobGraph)
+        updateTime = (time.time() - start) / numRepeats
+        start = time.time()
+        for _ in xrange(numRepeats):
+            jobStore.load(jobGraph.jobStoreID)
+        loadTime = (time.time() - start) / numRepeats
+        storedSize = os.path.getsize(jobStore._getJobFileName(jobGraph.jobStoreID))
+        return storedSize, updateTime, loadTime
+    finally:
+        shutil.rmtree(tempDir)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--sizes', nargs='+', type=int,
+                        default=[1024, 16 * 1024, 256 * 1024, 4 * 1024 * 1024],
+                        help='The approximate sizes in bytes of the commands of the job graphs.')
+    parser.add_argument('--compressions', nargs='+', choices=sorted(Serialiser.compressions),
+                        default=['none', 'zlib'],
+                        help='The compression methods to measure.')
+    parser.add_argument('--repeats', type=int, default=20,
+                        help='The number of times each job graph is updated and loaded.')
+    options = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    for commandSize in options.sizes:
+        for compression in options.compressions:
+            storedSize, updateTime, loadTime = benchmark(compression, commandSize, options.repeats)
+            logger.info('Job graph of %i bytes with %s compression: %i bytes stored, %.2f ms per '
+                        'update, %.2f ms per load', commandSize, compression, storedSize,
+                        updateTime * 1000, loadTime * 1000)
+
+
+if __name__ == '__main__':
+    main()
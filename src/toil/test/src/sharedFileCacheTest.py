@@ -0,0 +1,149 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import os
+
+# Python 3 compatibility imports
+from six.moves import cPickle
+
+from toil.batchSystems.gridengine import GridEngineBatchSystem
+from toil.common import Config, Toil
+from toil.job import Job
+from toil.jobStores.fileJobStore import FileJobStore
+from toil.sharedFileCache import SharedFileCache
+from toil.test import ToilTest
+
+
+class SharedFileCacheTest(ToilTest):
+    """
+    Tests caching the configuration and the environment of a workflow on the worker nodes.
+    """
+
+    def setUp(self):
+        super(SharedFileCacheTest, self).setUp()
+        self.workDir = self._createTempDir()
+        self.locator = self._getTestJobStorePath()
+        config = Config()
+        config.jobStore = self.locator
+        config.workDir = self.workDir
+        config.maxCores = 3
+        self.leaderJobStore = FileJobStore(self.locator)
+        self.leaderJobStore.initialize(config)
+        self._writeEnvironment({'FOO': 'bar'})
+
+    def tearDown(self):
+        self.leaderJobStore.destroy()
+        super(SharedFileCacheTest, self).tearDown()
+
+    def _writeEnvironment(self, environment):
+        with self.leaderJobStore.writeSharedFileStream('environment.pickle') as f:
+            cPickle.dump(environment, f, cPickle.HIGHEST_PROTOCOL)
+
+    def _resumeWorkerJobStore(self, sharedFileCache):
+        jobStore = FileJobStore(self.locator)
+        jobStore.useSharedFileCache(sharedFileCache)
+        jobStore.resume()
+        return jobStore
+
+    def _readEnvironment(self, jobStore):
+        with jobStore.readCachedSharedFileStream('environment.pickle') as f:
+            return cPickle.load(f)
+
+    def _cachedFiles(self):
+        workflowID = self.leaderJobStore.config.workflowID
+        dirPath = os.path.join(Toil.getWorkflowDir(workflowID, self.workDir),
+                               SharedFileCache.dirName(workflowID))
+        return set(os.listdir(dirPath)) if os.path.exists(dirPath) else set()
+
+    def testCache(self):
+        sharedFileCache = SharedFileCache.create(self.leaderJobStore)
+        sharedFileCache = SharedFileCache.unpickle(sharedFileCache.pickle())
+        jobStore = self._resumeWorkerJobStore(sharedFileCache)
+        self.assertEqual(jobStore.config.maxCores, 3)
+        self.assertEqual(self._readEnvironment(jobStore), {'FOO': 'bar'})
+        self.assertEqual(self._cachedFiles(), set(sharedFileCache.contentHashes.values()))
+        # Later workers don't read the files from the job store
+        self.leaderJobStore.config.maxCores = 4
+        self.leaderJobStore.writeConfig()
+        self._writeEnvironment({'FOO': 'baz'})
+        jobStore = self._resumeWorkerJobStore(sharedFileCache)
+        self.assertEqual(jobStore.config.maxCores, 3)
+        self.assertEqual(self._readEnvironment(jobStore), {'FOO': 'bar'})
+
+    def testChangedFilesAreNotCached(self):
+        sharedFileCache = SharedFileCache.create(self.leaderJobStore)
+        self._writeEnvironment({'FOO': 'baz'})
+        jobStore = self._resumeWorkerJobStore(sharedFileCache)
+        self.assertEqual(self._readEnvironment(jobStore), {'FOO': 'baz'})
+        self.assertEqual(self._cachedFiles(), {sharedFileCache.contentHashes['config.pickle']})
+
+    def testLookup(self):
+        sharedFileCache = SharedFileCache.create(self.leaderJobStore)
+        os.environ[SharedFileCache.environmentVariable] = sharedFileCache.pickle()
+        try:
+            self.assertEqual(SharedFileCache.lookup(self.locator).contentHashes,
+                             sharedFileCache.contentHashes)
+            self.assertIsNone(SharedFileCache.lookup(self.locator + '-nested'))
+        finally:
+            del os.environ[SharedFileCache.environmentVariable]
+        self.assertIsNone(SharedFileCache.lookup(self.locator))
+
+    def testRegisterWithGridEngine(self):
+        # Grid engine batch systems don't allow commas in the environment they pass to jobs
+        sharedFileCache = SharedFileCache.create(self.leaderJobStore)
+        batchSystem = GridEngineTestBatchSystem(config=self.leaderJobStore.config, maxCores=1,
+                                                maxMemory=1e9, maxDisk=1e9)
+        try:
+            sharedFileCache.register(batchSystem)
+            value = batchSystem.environment[SharedFileCache.environmentVariable]
+            self.assertNotIn(',', value)
+            self.assertNotIn(' ', value)
+            self.assertEqual(SharedFileCache.unpickle(value).contentHashes,
+                             sharedFileCache.contentHashes)
+        finally:
+            batchSystem.shutdown()
+
+    def testWorkflow(self):
+        options = Job.Runner.getDefaultOptions(self._getTestJobStorePath())
+        options.workDir = self._createTempDir()
+        options.cleanWorkDir = 'never'
+        Job.Runner.startToil(Job.wrapJobFn(parentFn), options)
+        workflowDirs = os.listdir(options.workDir)
+        self.assertEqual(len(workflowDirs), 1)
+        workflowID = workflowDirs[0][len('toil-'):]
+        # Both files were read by the workers, each was cached once
+        dirPath = os.path.join(options.workDir, workflowDirs[0],
+                               SharedFileCache.dirName(workflowID))
+        self.assertEqual(len(os.listdir(dirPath)), 2)
+
+
+class GridEngineTestBatchSystem(GridEngineBatchSystem):
+    """
+    A grid engine batch system that can be created without a grid engine, as long as it isn't
+    given any jobs.
+    """
+    @classmethod
+    def obtainSystemConstants(cls):
+        return 1, 1e9
+
+
+def parentFn(job):
+    for _ in range(3):
+        job.addChildFn(childFn)
+
+
+def childFn():
+    pass
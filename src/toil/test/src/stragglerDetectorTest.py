@@ -0,0 +1,90 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import os
+import time
+
+from toil.job import Job, JobNode, ServiceJobNode
+from toil.stragglerDetector import StragglerDetector
+from toil.test import ToilTest
+
+
+class StragglerDetectorTest(ToilTest):
+    """
+    Tests finding straggling jobs and running a second attempt of them.
+    """
+
+    def _createJobNode(self, jobName, jobStoreID):
+        return JobNode(requirements=dict(memory=1, cores=1, disk=1, preemptable=False),
+                       jobName=jobName, unitName=None, jobStoreID=jobStoreID, command=None)
+
+    def testFindStragglers(self):
+        detector = StragglerDetector(multiple=3)
+        for wallTime in (1, 2, 3, 4):
+            detector.addWallTime('short', wallTime)
+        self.assertEqual(detector.getMedianWallTime('short'), 2.5)
+        service = ServiceJobNode(jobStoreID='service', memory=1, cores=1, disk=1,
+                                 startJobStoreID='start', terminateJobStoreID='terminate',
+                                 errorJobStoreID='error', unitName=None, jobName='short',
+                                 command=None, predecessorNumber=1)
+        issuedJobs = {1: self._createJobNode('short', 'a'),
+                      2: self._createJobNode('short', 'b'),
+                      3: self._createJobNode('unknown', 'c'),
+                      4: service}
+        runningJobs = {1: 7, 2: 8, 3: 100, 4: 100}
+        self.assertEqual(detector.findStragglers(issuedJobs, runningJobs), [2])
+        self.assertFalse(detector.isDue())
+        # A job is only issued a second time once
+        detector.addAttempts('b', [2, 5])
+        issuedJobs[5] = issuedJobs[2]
+        runningJobs.update({2: 100, 5: 100})
+        self.assertEqual(detector.findStragglers(issuedJobs, runningJobs), [])
+        self.assertEqual(detector.removeAttempt('b', 5), [2])
+        self.assertEqual(detector.removeAttempt('b', 2), [])
+        self.assertEqual(detector.removeAttempt('a', 1), [])
+
+    def testSpeculativeExecution(self):
+        """
+        Runs a workflow in which the first attempt of a job gets stuck and checks that a second
+        attempt of it finishes the workflow.
+        """
+        options = Job.Runner.getDefaultOptions(self._getTestJobStorePath())
+        options.logLevel = 'DEBUG'
+        options.speculativeExecution = 2
+        markerFile = os.path.join(self._createTempDir(), 'marker')
+        start = time.time()
+        result = Job.Runner.startToil(Job.wrapJobFn(rootFn, markerFile), options)
+        self.assertEqual(result, 'second')
+        # The first attempt would have taken much longer
+        self.assertLess(time.time() - start, 200)
+
+
+def rootFn(job, markerFile):
+    # Let the leader learn how long the job takes usually
+    for _ in range(StragglerDetector.minimumJobs):
+        job.addChildJobFn(attemptFn, None, cores=0.1)
+    return job.addFollowOnJobFn(attemptFn, markerFile, cores=0.1).rv()
+
+
+def attemptFn(job, markerFile):
+    if markerFile is None:
+        return None
+    elif os.path.exists(markerFile):
+        return 'second'
+    else:
+        open(markerFile, 'w').close()
+        time.sleep(300)
+        return 'first'
@@ -0,0 +1,117 @@
+# Copyright (C) 2015-2016 Regents of the University of California
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+
+import sys
+
+from toil.job import JobNode
+from toil.jobGraph import JobGraph
+from toil.jobStores.abstractJobStore import NoSuchJobException
+from toil.leader import Leader
+from toil.test import ToilTest
+from toil.toilState import ToilState
+
+
+class ToilStateTest(ToilTest):
+    """
+    Tests building the leader's state from the jobs in a job store.
+    """
+
+    class DictJobStore(object):
+        """
+        Just enough of a job store to load jobs from a dict, counting the loads.
+        """
+        def __init__(self, jobs):
+            self.jobs = jobs
+            self.loads = 0
+
+        def load(self, jobStoreID):
+            self.loads += 1
+            try:
+                return self.jobs[jobStoreID]
+            except KeyError:
+                raise NoSuchJobException(jobStoreID)
+
+    @staticmethod
+    def _makeJob(jobStoreID, successors=(), predecessorNumber=1, command=None):
+        jobGraph = JobGraph(command=command, memory=1, cores=1, disk=1, unitName=None,
+                            jobName=jobStoreID, preemptable=False, jobStoreID=jobStoreID,
+                            remainingRetryCount=1, predecessorNumber=predecessorNumber)
+        if successors:
+            jobGraph.stack.append([JobNode(requirements=dict(memory=1, cores=1, disk=1,
+                                                             preemptable=False),
+                                           jobName=successor.jobName, unitName=None,
+                                           jobStoreID=successor.jobStoreID, command=None,
+                                           predecessorNumber=successor.predecessorNumber)
+                                   for successor in successors])
+        return jobGraph
+
+    def testLongChain(self):
+        # Longer than the recursion limit, which the state must not be bounded by
+        length = sys.getrecursionlimit() * 2
+        jobs = {}
+        successor = self._makeJob('job%i' % length, command='leaf')
+        jobs[successor.jobStoreID] = successor
+        for i in reversed(range(length)):
+            successor = self._makeJob('job%i' % i, successors=[successor])
+            jobs[successor.jobStoreID] = successor
+        jobStore = self.DictJobStore(jobs)
+        toilState = ToilState(jobStore, jobs['job0'])
+        self.assertEqual(toilState.updatedJobs, {(jobs['job%i' % length], 0)})
+        self.assertEqual(len(toilState.successorCounts), length)
+        self.assertEqual(jobStore.loads, length)
+
+    def testMultiplePredecessors(self):
+        # A diamond, whose last job must only be considered once both of its predecessors are
+        last = self._makeJob('last', predecessorNumber=2, command='last')
+        left = self._makeJob('left', successors=[last])
+        right = self._makeJob('right', successors=[last])
+        root = self._makeJob('root', successors=[left, right])
+        jobs = {job.jobStoreID: job for job in (root, left, right, last)}
+        # Serve the root's successors from the cache and everything else from the job store
+        jobCache = {job.jobStoreID: job for job in (left, right)}
+        jobStore = self.DictJobStore(jobs)
+        toilState = ToilState(jobStore, root, jobCache=jobCache)
+        self.assertEqual(toilState.updatedJobs, {(last, 0)})
+        self.assertEqual(set(toilState.successorCounts), {'root', 'left', 'right'})
+        self.assertEqual(toilState.successorJobStoreIDToPredecessorJobs['last'], [left, right])
+        self.assertEqual(last.predecessorsFinished, {'left', 'right'})
+        self.assertEqual(toilState.jobsToBeScheduledWithMultiplePredecessors, {})
+        self.assertEqual(jobStore.loads, 1)
+
+    def testFailedSuccessors(self):
+        # A chain longer than the recursion limit with a job missing from the job store part
+        # way down, as if it had already completed, and a job that was already seen
+        length = sys.getrecursionlimit() * 2
+        jobs = {}
+        successor = self._makeJob('job%i' % length, command='leaf')
+        jobs[successor.jobStoreID] = successor
+        for i in reversed(range(length)):
+            successor = self._makeJob('job%i' % i, successors=[successor])
+            jobs[successor.jobStoreID] = successor
+        missing = length // 2
+        del jobs['job%i' % missing]
+        jobStore = self.DictJobStore(jobs)
+        alreadySeenSuccessors = {'other'}
+        successors = Leader.getSuccessors(jobs['job0'], alreadySeenSuccessors, jobStore,
+                                          loadThreads=4)
+        # The walk stops at the missing job, which is still reported as a successor
+        self.assertEqual(successors, {'job%i' % i for i in range(1, missing + 1)})
+        self.assertEqual(alreadySeenSuccessors, successors | {'other'})
+        self.assertEqual(jobStore.loads, missing)
+        # Successors that were already seen are neither reported nor loaded again
+        self.assertEqual(Leader.getSuccessors(jobs['job0'], alreadySeenSuccessors, jobStore),
+                         set())
+        self.assertEqual(jobStore.loads, missing)
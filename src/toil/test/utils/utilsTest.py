@@ -279,6 +279,24 @@ class UtilsTest(ToilTest):
         self.assertTrue(len(collatedStats.job_types) == 2,
                         "Some jobs are not represented in the stats")
 
+    def testWorkerStartupStats(self):
+        options = Job.Runner.getDefaultOptions(self._getTestJobStorePath())
+        options.clean = 'never'
+        options.stats = True
+        options.profileWorkerStartup = True
+        Job.Runner.startToil(RunTwoJobsPerWorker(), options)
+        config = Config()
+        config.setOptions(options)
+        jobStore = Toil.resumeJobStore(config.jobStore)
+        try:
+            collatedStats = processData(jobStore.config, getStats(jobStore))
+        finally:
+            jobStore.destroy()
+        self.assertEqual(set(collatedStats.worker_startup),
+                         {'imports', 'resumeJobStore', 'environment', 'workerSetup',
+                          'jobGraphLoad', 'jobUnpickle', 'fileStoreSetup'})
+        self.assertTrue(all(seconds >= 0 for seconds in collatedStats.worker_startup.values()))
+
 def printUnicodeCharacter():
     # We want to get a unicode character to stdout but we can't print it directly because of
     # Python encoding issues. To work around this we print in a separate Python process. See
@@ -15,6 +15,14 @@
 from __future__ import absolute_import
 
 import logging
+import sys
+from threading import Thread
+
+# Python 3 compatibility imports
+from six import reraise
+from six.moves.queue import Empty, Queue
+
+from toil.jobStores.abstractJobStore import NoSuchJobException
 
 logger = logging.getLogger( __name__ )
 
@@ -22,7 +30,7 @@ class ToilState( object ):
     """
     Represents a snapshot of the jobs in the jobStore. Used by the leader to manage the batch.
     """
-    def __init__( self, jobStore, rootJob, jobCache=None):
+    def __init__( self, jobStore, rootJob, jobCache=None, loadThreads=8):
         """
         Loads the state from the jobStore, using the rootJob 
         as the source of the job graph.
@@ -32,6 +40,8 @@ class ToilState( object ):
         
         :param toil.jobStores.abstractJobStore.AbstractJobStore jobStore 
         :param toil.jobWrapper.JobGraph rootJob
+        :param int loadThreads: the maximum number of threads used to load jobs from the
+               jobStore concurrently
         """
         # This is a hash of jobs, referenced by jobStoreID, to their predecessor jobs.
         self.successorJobStoreIDToPredecessorJobs = { }
@@ -69,33 +79,58 @@ class ToilState( object ):
         
         ##Algorithm to build this information
         logger.info("(Re)building internal scheduler state")
-        self._buildToilState(rootJob, jobStore, jobCache)
+        self._buildToilState(rootJob, jobStore, jobCache, loadThreads)
 
-    def _buildToilState(self, jobGraph, jobStore, jobCache=None):
+    def _buildToilState(self, rootJob, jobStore, jobCache=None, loadThreads=8):
         """
         Traverses tree of jobs from the root jobGraph (rootJob) building the
         ToilState class.
 
+        The traversal is breadth first and iterative, so that arbitrarily long chains of jobs
+        do not exhaust the stack. The successors of each level of the traversal are loaded
+        from the job store concurrently before the level is processed.
+
         If jobCache is passed, it must be a dict from job ID to JobGraph
         object. Jobs will be loaded from the cache (which can be downloaded from
-        the jobStore in a batch) instead of piecemeal when recursed into.
+        the jobStore in a batch) instead of piecemeal when traversed.
         """
+        jobsToProcess = [rootJob]
+        while jobsToProcess:
+            # Load the successors that will be considered for the first time by this level
+            loadedJobs = self.loadJobs(jobStore,
+                                       {successorJobNode.jobStoreID
+                                        for jobGraph in jobsToProcess
+                                        if not self._isReady(jobGraph)
+                                        for successorJobNode in jobGraph.stack[-1]
+                                        if successorJobNode.jobStoreID not in
+                                        self.successorJobStoreIDToPredecessorJobs},
+                                       jobCache, loadThreads)
+            successorJobs = []
+            for jobGraph in jobsToProcess:
+                self._processJob(jobGraph, loadedJobs, successorJobs)
+            assert len(loadedJobs) == 0
+            jobsToProcess = successorJobs
 
-        def getJob(jobId):
-            if jobCache is not None:
-                try:
-                    return jobCache[jobId]
-                except ValueError:
-                    return jobStore.load(jobId)
-            else:
-                return jobStore.load(jobId)
-
-        # If the jobGraph has a command, is a checkpoint, has services or is ready to be
-        # deleted it is ready to be processed
-        if (jobGraph.command is not None
-            or jobGraph.checkpoint is not None
-            or len(jobGraph.services) > 0
-            or len(jobGraph.stack) == 0):
+    @staticmethod
+    def _isReady(jobGraph):
+        """
+        If the jobGraph has a command, is a checkpoint, has services or is ready to be
+        deleted it is ready to be processed.
+        """
+        return (jobGraph.command is not None
+                or jobGraph.checkpoint is not None
+                or len(jobGraph.services) > 0
+                or len(jobGraph.stack) == 0)
+
+    def _processJob(self, jobGraph, loadedJobs, successorJobs):
+        """
+        Adds the given jobGraph to the state.
+
+        :param dict loadedJobs: map from jobStoreID to the JobGraph of the successors that are
+               seen for the first time, from which the successors are popped once considered
+        :param list successorJobs: the list to append the successors to that must be traversed
+        """
+        if self._isReady(jobGraph):
             logger.debug('Found job to run: %s, with command: %s, with checkpoint: %s, '
                          'with  services: %s, with stack: %s', jobGraph.jobStoreID,
                          jobGraph.command is not None, jobGraph.checkpoint is not None,
@@ -125,8 +160,8 @@ class ToilState( object ):
                     # It is ready to be run, so remove it from the cache
                     self.jobsToBeScheduledWithMultiplePredecessors.pop(successorJobStoreID)
                     
-                    # Recursively consider the successor
-                    self._buildToilState(successorJobGraph, jobStore, jobCache=jobCache)
+                    # Consider the successor
+                    successorJobs.append(successorJobGraph)
             
             # For each successor
             for successorJobNode in jobGraph.stack[-1]:
@@ -139,12 +174,12 @@ class ToilState( object ):
                     # Add the job as a predecessor
                     self.successorJobStoreIDToPredecessorJobs[successorJobStoreID] = [jobGraph]
                     
+                    # The successor job was loaded with the rest of this level
+                    successorJobGraph = loadedJobs.pop(successorJobStoreID)
+
                     # If predecessor number > 1 then the successor has multiple predecessors
                     if successorJobNode.predecessorNumber > 1:
                         
-                        # We load the successor job
-                        successorJobGraph =  getJob(successorJobStoreID)
-                        
                         # We put the successor job in the cache of successor jobs with multiple predecessors
                         assert successorJobStoreID not in self.jobsToBeScheduledWithMultiplePredecessors
                         self.jobsToBeScheduledWithMultiplePredecessors[successorJobStoreID] = successorJobGraph
@@ -154,8 +189,8 @@ class ToilState( object ):
                             
                     else:
                         # The successor has only the jobGraph as a predecessor so
-                        # recursively consider the successor
-                        self._buildToilState(getJob(successorJobStoreID), jobStore, jobCache=jobCache)
+                        # consider the successor
+                        successorJobs.append(successorJobGraph)
                 
                 else:
                     # We've already seen the successor
@@ -171,4 +206,64 @@ class ToilState( object ):
                         successorJobGraph = self.jobsToBeScheduledWithMultiplePredecessors[successorJobStoreID]
                         
                         # Process successor
-                        processSuccessorWithMultiplePredecessors(successorJobGraph)
\ No newline at end of file
+                        processSuccessorWithMultiplePredecessors(successorJobGraph)
+
+    @staticmethod
+    def loadJobs(jobStore, jobStoreIDs, jobCache=None, loadThreads=8, ignoreMissing=False):
+        """
+        Loads the given jobs, from the jobCache if they are in it and otherwise from the job
+        store, using up to the given number of threads concurrently.
+
+        :param set[str] jobStoreIDs:
+        :param bool ignoreMissing: if True, jobs that don't exist in the job store are left out
+               of the result instead of raising NoSuchJobException
+        :return: map from jobStoreID to JobGraph
+        :rtype: dict
+        """
+        loadedJobs = {}
+        jobStoreIDsToLoad = Queue()
+        for jobStoreID in jobStoreIDs:
+            if jobCache is not None and jobStoreID in jobCache:
+                loadedJobs[jobStoreID] = jobCache[jobStoreID]
+            else:
+                jobStoreIDsToLoad.put(jobStoreID)
+        if jobStoreIDsToLoad.empty():
+            return loadedJobs
+
+        def loadJob(jobStoreID):
+            try:
+                loadedJobs[jobStoreID] = jobStore.load(jobStoreID)
+            except NoSuchJobException:
+                if not ignoreMissing:
+                    raise
+
+        if (jobStoreIDsToLoad.qsize() == 1 or loadThreads <= 1
+                or not jobStore.supportsConcurrentAccess()):
+            # Not worth starting any threads
+            while not jobStoreIDsToLoad.empty():
+                loadJob(jobStoreIDsToLoad.get())
+            return loadedJobs
+
+        excInfos = []
+
+        def loadJobs():
+            while True:
+                try:
+                    jobStoreID = jobStoreIDsToLoad.get_nowait()
+                except Empty:
+                    break
+                try:
+                    loadJob(jobStoreID)
+                except:
+                    excInfos.append(sys.exc_info())
+                    break
+
+        loaders = [Thread(target=loadJobs)
+                   for _ in range(min(loadThreads, jobStoreIDsToLoad.qsize()))]
+        for loader in loaders:
+            loader.start()
+        for loader in loaders:
+            loader.join()
+        if excInfos:
+            reraise(*excInfos[0])
+        return loadedJobs
@@ -396,6 +396,11 @@ def reportPrettyData(root, worker, job, job_types, options):
         reportTime(get(root, "total_clock"), options),
         reportTime(get(root, "total_run_time"), options),
         ))
+    if "call_cache_hits" in root:
+        out_str += ("Call Cache Hits: %s  Call Cache Misses: %s\n" % (
+            reportNumber(get(root, "call_cache_hits"), options),
+            reportNumber(get(root, "call_cache_misses"), options),
+            ))
     job_types = sortJobs(job_types, options)
     columnWidths = computeColumnWidths(job_types, worker, job, options)
     out_str += "Worker\n"
@@ -561,6 +566,18 @@ def processData(config, stats):
             return []
 
     buildElement(collatedStatsTag, worker, "worker")
+    # Workers only report call cache counts if the workflow used a call cache
+    if any('callCacheHits' in w for w in worker):
+        collatedStatsTag.call_cache_hits = sum(int(w.get('callCacheHits', 0)) for w in worker)
+        collatedStatsTag.call_cache_misses = sum(int(w.get('callCacheMisses', 0)) for w in worker)
+    # Workers only report the phases of their startup if asked to
+    startups = [w.startup for w in worker if 'startup' in w]
+    if startups:
+        phases = set(phase for startup in startups for phase in startup)
+        collatedStatsTag.worker_startup = Expando(
+            (phase, sum(float(startup[phase]) for startup in startups if phase in startup) /
+             sum(1 for startup in startups if phase in startup))
+            for phase in phases)
     createSummary(buildElement(collatedStatsTag, jobs, "jobs"),
                   stats.workers, "worker", fn4)
     # Get info for each job
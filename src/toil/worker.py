@@ -22,6 +22,10 @@ import json
 import tempfile
 import traceback
 import time
+
+# The time the worker started importing modules, see --profileWorkerStartup
+_importStartTime = time.time()
+
 import socket
 import logging
 import shutil
@@ -32,7 +36,9 @@ from six.moves import cPickle
 
 from bd2k.util.expando import Expando, MagicExpando
 from toil.common import Toil
-from toil.fileStore import FileStore
+from toil.fanOutRunner import FanOutRunner
+from toil.fileStore import FileStore, JobCommitClaim, JobCommitClaimedException
+from toil.sharedFileCache import SharedFileCache
 from toil import logProcessContext
 import signal
 
@@ -78,20 +84,35 @@ def main():
     from toil.lib.bioio import getTotalCpuTime
     from toil.lib.bioio import getTotalCpuTimeAndMemoryUsage
     from toil.job import Job
-    try:
-        import boto
-    except ImportError:
-        pass
-    else:
-        # boto is installed, monkey patch it now
-        from bd2k.util.ec2.credentials import enable_metadata_credential_caching
-        enable_metadata_credential_caching()
+    from toil.callCache import CallCache
+
+    # The times at which the phases of the worker's startup ended, in order
+    startupPhases = []
+
+    def endStartupPhase(phase):
+        # Phases in the loop running the jobs end with the first job
+        if not any(phase == name for name, _ in startupPhases):
+            startupPhases.append((phase, time.time()))
+
+    endStartupPhase('imports')
     ##########################################
     #Input args
     ##########################################
     
     jobStoreLocator = sys.argv[1]
     jobStoreID = sys.argv[2]
+    # The leader passes a token identifying this issue of the job
+    issueToken = sys.argv[3] if len(sys.argv) > 3 else None
+    # The leader also passes the resources it issued the job with, which are less than the job
+    # requests if it was issued with the requirements learned from its class. Jobs are only
+    # chained or fanned out within them.
+    if len(sys.argv) > 4:
+        memory, cores, disk = sys.argv[4].split(':')
+        issuedResources = dict(memory=int(memory), cores=float(cores), disk=int(disk))
+    else:
+        issuedResources = None
+    # Set if the worker of the job's parent started this worker to run the job
+    isFanOutChild = FanOutRunner.isChild()
     # we really want a list of job names but the ID will suffice if the job graph can't
     # be loaded. If we can discover the name, we will replace this initial entry
     listOfJobs = [jobStoreID]
@@ -100,8 +121,28 @@ def main():
     #Load the jobStore/config file
     ##########################################
     
-    jobStore = Toil.resumeJobStore(jobStoreLocator)
+    jobStore = Toil.getJobStore(jobStoreLocator)
+    # Read the config and the environment from the node, unless this is the first worker on it
+    sharedFileCache = SharedFileCache.lookup(jobStoreLocator)
+    if sharedFileCache is not None:
+        jobStore.useSharedFileCache(sharedFileCache)
+    jobStore.resume()
     config = jobStore.config
+    endStartupPhase('resumeJobStore')
+
+    # If the leader runs jobs speculatively, other attempts to run this issue of the job may be
+    # running. All of them share the issue token and the first to claim the job wins.
+    if (config.speculativeExecution > 0 and issueToken is not None
+            and jobStore.supportsJobCommitClaims()):
+        commitClaim = JobCommitClaim(jobStore, jobStoreID, issueToken)
+    else:
+        commitClaim = None
+
+    # The children of a job must not be run by two attempts at running the job
+    if config.workerFanOut > 0 and commitClaim is None:
+        fanOutRunner = FanOutRunner(jobStore, jobStoreLocator, config.workerFanOut)
+    else:
+        fanOutRunner = None
     
     ##########################################
     #Create the worker killer, if requested
@@ -131,7 +172,7 @@ def main():
     ##########################################
     
     #First load the environment for the jobGraph.
-    with jobStore.readSharedFileStream("environment.pickle") as fileHandle:
+    with jobStore.readCachedSharedFileStream("environment.pickle") as fileHandle:
         environment = cPickle.load(fileHandle)
     for i in environment:
         if i not in ("TMPDIR", "TMP", "HOSTNAME", "HOSTTYPE"):
@@ -143,6 +184,7 @@ def main():
                 sys.path.append(e)
 
     setLogLevel(config.logLevel)
+    endStartupPhase('environment')
 
     toilWorkflowDir = Toil.getWorkflowDir(config.workflowID, config.workDir)
 
@@ -192,6 +234,7 @@ def main():
     
     #Close the descriptor we used to open the file
     os.close(logFh)
+    endStartupPhase('workerSetup')
 
     debugging = logging.getLogger().isEnabledFor(logging.DEBUG)
     ##########################################
@@ -199,6 +242,12 @@ def main():
     ##########################################
 
     workerFailed = False
+    # Set if another attempt to run the job claimed it first
+    commitLost = False
+    # The first chained successor the job store doesn't know to be part of the job yet, and the
+    # job as it was when the successor was transplanted into it. If a job of the chain fails,
+    # the failure is recorded against this state.
+    uncommittedSuccessorID, uncommittedJobGraph = None, None
     statsDict = MagicExpando()
     statsDict.jobs = []
     statsDict.workers.logsToMaster = []
@@ -223,6 +272,10 @@ def main():
         
         jobGraph = jobStore.load(jobStoreID)
         listOfJobs[0] = str(jobGraph)
+        if issuedResources is None:
+            issuedResources = dict(memory=jobGraph.memory, cores=jobGraph.cores,
+                                   disk=jobGraph.disk)
+        endStartupPhase('jobGraphLoad')
         logger.debug("Parsed jobGraph")
         
         ##########################################
@@ -241,6 +294,8 @@ def main():
         #have been left if the job is being retried after a job failure.
         oldLogFile = jobGraph.logJobStoreFileID
         if oldLogFile != None:
+            if commitClaim is not None:
+                commitClaim.acquire()
             jobGraph.logJobStoreFileID = None
             jobStore.update(jobGraph) #Update first, before deleting any files
             jobStore.deleteFile(oldLogFile)
@@ -252,6 +307,8 @@ def main():
         # The job is a checkpoint, and is being restarted after previously completing
         if jobGraph.checkpoint != None:
             logger.debug("Job is a checkpoint")
+            if commitClaim is not None:
+                commitClaim.acquire()
             if len(jobGraph.stack) > 0 or len(jobGraph.services) > 0 or jobGraph.command != None:
                 if jobGraph.command != None:
                     assert jobGraph.command == jobGraph.checkpoint
@@ -312,7 +369,21 @@ def main():
         #Make a temporary file directory for the jobGraph
         #localTempDir = makePublicDir(os.path.join(localWorkerTempDir, "localTempDir"))
 
+        callCache = None if config.callCache is None else CallCache.open(config.callCache)
+
         startTime = time.time()
+        # Set once this worker ran the children of the job
+        ranChildren = False
+        # The file store of the last job run, whose update of the job may have been deferred
+        fileStore = None
+        # The next job in the chain, unpickled when it was chained
+        successorJob = None
+        # Chained jobs don't update the job in the job store before this time, leaving the update
+        # to the jobs chained after them
+        nextJobUpdateTime = startTime + config.chainCheckpointInterval
+        # The chained successors and the files deleted by the jobs of the chain since the last
+        # update of the job, which the next update deletes from the job store
+        jobsToDelete, filesToDelete = set(), set()
         while True:
             ##########################################
             #Run the jobGraph, if there is one
@@ -321,32 +392,54 @@ def main():
             if jobGraph.command is not None:
                 assert jobGraph.command.startswith( "_toil " )
                 logger.debug("Got a command to run: %s" % jobGraph.command)
-                #Load the job
-                job = Job._loadJob(jobGraph.command, jobStore)
+                #Load the job, unless it was loaded when it was chained
+                if successorJob is None:
+                    job = Job._loadJob(jobGraph.command, jobStore)
+                else:
+                    job, successorJob = successorJob, None
+                endStartupPhase('jobUnpickle')
+                # The leader restarts checkpoints, so it must issue them. The children a fan-out
+                # runner gives to a worker have not run before, so this is the only check needed.
+                if job.checkpoint and isFanOutChild:
+                    logger.debug("Leaving the checkpoint job to the leader")
+                    break
                 # If it is a checkpoint job, save the command
                 if job.checkpoint:
                     jobGraph.checkpoint = jobGraph.command
 
                 # Create a fileStore object for the job
                 fileStore = FileStore.createFileStore(jobStore, jobGraph, localWorkerTempDir, blockFn,
-                                                      caching=not config.disableCaching)
+                                                      caching=not config.disableCaching,
+                                                      commitClaim=commitClaim)
+                fileStore.jobsToDelete.update(jobsToDelete)
+                fileStore.filesToDelete.update(filesToDelete)
+                fileStore.deferJobUpdate = time.time() < nextJobUpdateTime
+                endStartupPhase('fileStoreSetup')
                 with job._executor(jobGraph=jobGraph,
-                                   stats=statsDict if config.stats else None,
+                                   stats=statsDict if config.stats or config.learnRequirements else None,
                                    fileStore=fileStore):
                     with fileStore.open(job):
                         # Get the next block function and list that will contain any messages
                         blockFn = fileStore._blockFn
 
-                        job._runner(jobGraph=jobGraph, jobStore=jobStore, fileStore=fileStore)
+                        job._runner(jobGraph=jobGraph, jobStore=jobStore, fileStore=fileStore,
+                                    callCache=callCache)
+                if fileStore.deferJobUpdate:
+                    # The next update of the job, whichever job makes it, deletes these as well
+                    jobsToDelete, filesToDelete = fileStore.jobsToDelete, fileStore.filesToDelete
+                else:
+                    jobsToDelete, filesToDelete = set(), set()
+                    nextJobUpdateTime = time.time() + config.chainCheckpointInterval
 
                 # Accumulate messages from this job & any subsequent chained jobs
                 statsDict.workers.logsToMaster += fileStore.loggingMessages
 
-            else:
+            elif not ranChildren:
                 #The command may be none, in which case
                 #the jobGraph is either a shell ready to be deleted or has
                 #been scheduled after a failure to cleanup
                 break
+            ranChildren = False
             
             if FileStore._terminateEvent.isSet():
                 raise RuntimeError("The termination flag is set")
@@ -365,6 +458,23 @@ def main():
             jobs = jobGraph.stack[-1]
             assert len(jobs) > 0
             
+            #If there are 2 or more jobs to run in parallel we may run them in this worker
+            if (len(jobs) >= 2 and fanOutRunner is not None
+                    and fanOutRunner.canRun(jobGraph, issuedResources)):
+                # The children may read the files the job wrote
+                if fileStore is not None:
+                    fileStore._commitDeferredJobUpdate()
+                    jobsToDelete, filesToDelete = set(), set()
+                blockFn()
+                if FileStore._terminateEvent.isSet():
+                    raise RuntimeError("The termination flag is set")
+                if fanOutRunner.run(jobGraph, issuedResources):
+                    # Go on with the next successors of the job
+                    ranChildren = True
+                    continue
+                logger.debug("Stopping running chain of jobs: children are left")
+                break
+
             #If there are 2 or more jobs to run in parallel we quit
             if len(jobs) >= 2:
                 logger.debug("No more jobs can run in series by this worker,"
@@ -372,15 +482,15 @@ def main():
                 break
             
             #We check the requirements of the jobGraph to see if we can run it
-            #within the current worker
+            #within the resources the current worker was issued with
             successorJobNode = jobs[0]
-            if successorJobNode.memory > jobGraph.memory:
+            if successorJobNode.memory > issuedResources['memory']:
                 logger.debug("We need more memory for the next job, so finishing")
                 break
-            if successorJobNode.cores > jobGraph.cores:
+            if successorJobNode.cores > issuedResources['cores']:
                 logger.debug("We need more cores for the next job, so finishing")
                 break
-            if successorJobNode.disk > jobGraph.disk:
+            if successorJobNode.disk > issuedResources['disk']:
                 logger.debug("We need more disk for the next job, so finishing")
                 break
             if successorJobNode.preemptable != jobGraph.preemptable:
@@ -416,11 +526,10 @@ def main():
             #wholly incorporated into the current jobGraph.
             ##########################################
             
-            #Clone the jobGraph and its stack
-            jobGraph = copy.deepcopy(jobGraph)
-            
-            #Remove the successor jobGraph
-            jobGraph.stack.pop()
+            #Clone the jobGraph, so that the update of the previous job is not affected by the
+            #changes below. The lists of successors on its stack are shared, they are only ever
+            #replaced, not modified.
+            jobGraph = copy.copy(jobGraph)
 
             #These should all match up
             assert successorJobGraph.memory == successorJobNode.memory
@@ -430,34 +539,35 @@ def main():
             assert successorJobGraph.command is not None
             assert successorJobGraph.jobStoreID == successorJobNode.jobStoreID
 
-            #Transplant the command and stack to the current jobGraph
+            #Transplant the command and stack to the current jobGraph, removing the successor
             jobGraph.command = successorJobGraph.command
-            jobGraph.stack += successorJobGraph.stack
+            jobGraph.stack = jobGraph.stack[:-1] + successorJobGraph.stack
             # include some attributes for better identification of chained jobs in
             # logging output
             jobGraph.unitName = successorJobGraph.unitName
             jobGraph.jobName = successorJobGraph.jobName
             assert jobGraph.memory >= successorJobGraph.memory
             assert jobGraph.cores >= successorJobGraph.cores
-            
-            #Build a fileStore to update the job
-            fileStore = FileStore.createFileStore(jobStore, jobGraph, localWorkerTempDir, blockFn,
-                                                  caching=not config.disableCaching)
 
-            #Update blockFn
-            blockFn = fileStore._blockFn
+            #The update of the job after the successor ran deletes the successor jobGraph. Until
+            #then the job store holds the successor as it was before, which the leader issues
+            #if this worker dies.
+            jobsToDelete = set(jobsToDelete)
+            jobsToDelete.add(successorJobGraph.jobStoreID)
+            filesToDelete = set(filesToDelete)
+            if fileStore is None or not fileStore.deferJobUpdate:
+                # The successor is the first job of the chain the job store holds on its own.
+                # The runner of the successor modifies the stack in place.
+                uncommittedSuccessorID = successorJobGraph.jobStoreID
+                uncommittedJobGraph = copy.copy(jobGraph)
+                uncommittedJobGraph.stack = list(jobGraph.stack)
+                uncommittedJobGraph.remainingRetryCount = successorJobGraph.remainingRetryCount
 
-            #Add successorJobGraph to those to be deleted
-            fileStore.jobsToDelete.add(successorJobGraph.jobStoreID)
-            
-            #This will update the job once the previous job is done
-            fileStore._updateJobWhenDone()            
-            
-            #Clone the jobGraph and its stack again, so that updates to it do
-            #not interfere with this update
-            jobGraph = copy.deepcopy(jobGraph)
-            
             logger.debug("Starting the next job")
+
+        # The last job of the chain updates the job if no job after it did
+        if fileStore is not None:
+            fileStore._commitDeferredJobUpdate()
         
         ##########################################
         #Finish up the stats
@@ -467,6 +577,16 @@ def main():
             statsDict.workers.time = str(time.time() - startTime)
             statsDict.workers.clock = str(totalCPUTime - startClock)
             statsDict.workers.memory = str(totalMemoryUsage)
+            if callCache is not None:
+                statsDict.workers.callCacheHits = callCache.hits
+                statsDict.workers.callCacheMisses = callCache.misses
+        if config.profileWorkerStartup:
+            # The seconds each phase took, from the worker's first import to its first job
+            phaseStartTime = _importStartTime
+            statsDict.workers.startup = {}
+            for phase, phaseEndTime in startupPhases:
+                statsDict.workers.startup[phase] = str(phaseEndTime - phaseStartTime)
+                phaseStartTime = phaseEndTime
 
         # log the worker log path here so that if the file is truncated the path can still be found
         logger.info("Worker log can be found at %s. Set --cleanWorkDir to retain this log", localWorkerTempDir)
@@ -475,6 +595,11 @@ def main():
     ##########################################
     #Trapping where worker goes wrong
     ##########################################
+    except JobCommitClaimedException:
+        logger.info("Another attempt to run the job finished first, giving up")
+        commitLost = True
+        # Stops the threads of the file store
+        FileStore._terminateEvent.set()
     except: #Case that something goes wrong in worker
         traceback.print_exc()
         logger.error("Exiting the worker because of a failed job on host %s", socket.gethostname())
@@ -485,14 +610,34 @@ def main():
     ########################################## 
        
     blockFn() 
+
+    # An attempt that was not claimed by running a job claims it before it records a failure or
+    # deletes the job
+    if commitClaim is not None and not commitLost:
+        try:
+            commitClaim.acquire()
+        except JobCommitClaimedException:
+            logger.info("Another attempt to run the job finished first, giving up")
+            commitLost = True
     
     ##########################################
     #All the asynchronous worker/update threads must be finished now, 
     #so safe to test if they completed okay
     ########################################## 
     
-    if FileStore._terminateEvent.isSet():
+    if FileStore._terminateEvent.isSet() and not commitLost:
         jobGraph = jobStore.load(jobStoreID)
+        if (jobGraph.command is None and uncommittedSuccessorID is not None
+                and jobStore.exists(uncommittedSuccessorID)):
+            # A chained job failed after the job it was chained to was done. The job store holds
+            # the job without a command, and the successor to run next on its own. Transplant the
+            # successor into the job as if it had been chained before the failure, so that the
+            # failure is charged to the successor and the retry runs it.
+            logger.debug("Recording the failure against the chained job %s",
+                         uncommittedSuccessorID)
+            jobGraph = uncommittedJobGraph
+            jobStore.update(jobGraph)
+            jobStore.delete(uncommittedSuccessorID)
         jobGraph.setupJobAfterFailure(config)
         workerFailed = True
 
@@ -549,13 +694,20 @@ def main():
         statsDict.logs.names = listOfJobs
         statsDict.logs.messages = logMessages
 
-    if (debugging or config.stats or statsDict.workers.logsToMaster) and not workerFailed:  # We have stats/logging to report back
+    if ((debugging or config.stats or config.learnRequirements or config.profileWorkerStartup
+         or statsDict.workers.logsToMaster)
+            and not (workerFailed or commitLost)):  # We have stats/logging to report back
         jobStore.writeStatsAndLogging(json.dumps(statsDict))
 
     #Remove the temp dir
     cleanUp = config.cleanWorkDir
     if cleanUp == 'always' or (cleanUp == 'onSuccess' and not workerFailed) or (cleanUp == 'onError' and workerFailed):
         shutil.rmtree(localWorkerTempDir)
+
+    if commitLost:
+        # The job belongs to the attempt that claimed it, the leader only needs to learn that
+        # this one failed
+        return 1
     
     #This must happen after the log file is done with, else there is no place to put the log
     if (not workerFailed) and jobGraph.command == None and len(jobGraph.stack) == 0 and len(jobGraph.services) == 0: